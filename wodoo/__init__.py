@@ -1,3 +1,7 @@
+from .startup_profile import enable_if_requested
+
+enable_if_requested()
+
 import sys
 import subprocess
 from datetime import datetime
@@ -11,10 +15,6 @@ try:
     from .lib_clickhelpers import AliasedGroup
 except ImportError:
     click = None
-from .tools import _file2env
-
-from . import module_tools  # NOQA
-from . import odoo_config  # NOQA
 
 SCRIPT_DIRECTORY = Path(inspect.getfile(inspect.currentframe())).absolute().parent
 
@@ -24,22 +24,37 @@ os.environ["ODOO_HOME"] = str(SCRIPT_DIRECTORY)
 
 
 from .cli import cli
-from . import lib_clickhelpers  # NOQA
-from . import lib_composer  # NOQA
-from . import lib_backup  # NOQA
-from . import lib_control  # NOQA
-from . import lib_db  # NOQA
-from . import lib_db_snapshots  # NOQA
-from . import lib_lang  # NOQA
-from . import lib_module  # NOQA
-from . import lib_setup  # NOQA
-from . import lib_src  # NOQA
-from . import lib_docker_registry  # NOQA
-from . import lib_turnintodev  # NOQA
-from . import lib_talk  # NOQA
-from . import daddy_cleanup  # NOQA
-
-# import container specific commands
-from .tools import abort  # NOQA
-from .tools import __dcrun  # NOQA
-from .tools import __dc  # NOQA
+
+# the command modules (lib_*) are imported on demand by cli; see
+# LAZY_COMMANDS in cli.py
+
+
+def __getattr__(name):
+    # formerly imported here eagerly
+    import importlib
+
+    if name in ["module_tools", "odoo_config", "daddy_cleanup"]:
+        return importlib.import_module(f".{name}", __name__)
+    if name.startswith("lib_"):
+        return importlib.import_module(f".{name}", __name__)
+    if name in ["abort", "_file2env", "__dcrun", "__dc"]:
+        return getattr(importlib.import_module(".tools", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+if sys.version_info < (3, 7):
+    # a module __getattr__ (PEP 562) is not called before python 3.7;
+    # import everything like before
+    from .cli import LAZY_COMMANDS
+
+    for _name in sorted(set(x[0][1:] for x in LAZY_COMMANDS.values())) + [
+        "lib_clickhelpers",
+        "module_tools",
+        "odoo_config",
+        "abort",
+        "_file2env",
+        "__dcrun",
+        "__dc",
+    ]:
+        globals()[_name] = __getattr__(_name)
+    del _name
@@ -1,5 +1,6 @@
 import os
 import sys
+import subprocess
 import click
 from pathlib import Path
 try:
@@ -8,11 +9,182 @@ except ImportError:
     click = None
 from .click_config import Config
 from .click_global_commands import GlobalCommands
+from .startup_profile import profile
 
-Commands = GlobalCommands()
+# Modules of the commands are imported, when the command is used; keep in
+# sync with the commands of the modules (see tests/test_lazy_commands.py).
+LAZY_COMMANDS = {
+    "backup": (".lib_backup", ["all", "files", "odoo-db"]),
+    "composer": (".lib_composer", ["config", "reload", "toggle-settings"]),
+    "daddy-cleanup": (".daddy_cleanup", None),
+    "db": (
+        ".lib_db",
+        [
+            "anonymize",
+            "cleardb",
+            "db-health-check",
+            "db-size",
+            "drop-db",
+            "excel",
+            "pgactivity",
+            "pgcli",
+            "pghba-conf-wide-open",
+            "psql",
+            "reset-odoo-db",
+            "setname",
+            "show-table-sizes",
+        ],
+    ),
+    "dev-env": (
+        ".lib_turnintodev",
+        [
+            "hash-password",
+            "prolong",
+            "remove-settings",
+            "set-password-all-users",
+            "turn-into-dev",
+            "update-setting",
+        ],
+    ),
+    "docker": (
+        ".lib_control",
+        [
+            "attach",
+            "build",
+            "debug",
+            "dev",
+            "down",
+            "exec",
+            "force-kill",
+            "kill",
+            "ps",
+            "pull",
+            "rebuild",
+            "recreate",
+            "restart",
+            "rm",
+            "shell",
+            "show-volumes",
+            "stop",
+            "transfer-volume-content",
+            "up",
+            "wait-for-container-postgres",
+            "wait-for-port",
+        ],
+    ),
+    "docker-registry": (
+        ".lib_docker_registry",
+        ["login", "regpull", "regpush", "self-sign-hub-certificate"],
+    ),
+    "keep-last-file-of-day": (".daddy_cleanup", None),
+    "lang": (".lib_lang", ["export", "import", "list"]),
+    "logs": (".lib_control", None),
+    "odoo-module": (
+        ".lib_module",
+        [
+            "abort-upgrade",
+            "download-openupgrade",
+            "generate-update-command",
+            "list-changed-files",
+            "list-changed-modules",
+            "list-deps",
+            "list-modules",
+            "list-robot-test-files",
+            "list-unit-test-files",
+            "migrate",
+            "pretty-print-manifest",
+            "progress",
+            "recompute-parent-store",
+            "restore-web-icons",
+            "robotest",
+            "run-tests",
+            "set-ribbon",
+            "show-addons-paths",
+            "show-conflicting-modules",
+            "show-install-state",
+            "uninstall",
+            "unittest",
+            "update",
+            "update-i18n",
+            "update-module-file",
+        ],
+    ),
+    "restore": (
+        ".lib_backup",
+        ["files", "list", "list-file-generations", "odoo-db", "show-dump-type"],
+    ),
+    "run": (".lib_control", None),
+    "runbash": (".lib_control", None),
+    "setup": (
+        ".lib_setup",
+        [
+            "produce-test-lines",
+            "remove-web-assets",
+            "show-effective-settings",
+            "status",
+            "upgrade",
+        ],
+    ),
+    "snapshot": (
+        ".lib_db_snapshots",
+        [
+            "clear",
+            "list",
+            "purge-inactive-subvolumes",
+            "remove",
+            "remove-postgres-volume",
+            "restore",
+            "save",
+        ],
+    ),
+    "src": (
+        ".lib_src",
+        [
+            "goto-inherited",
+            "init",
+            "make-module",
+            "make-modules",
+            "make-odoo-sh-compatible",
+            "setup-venv",
+            "show-addons-paths",
+            "update-ast",
+            "watch",
+        ],
+    ),
+    "talk": (".lib_talk", ["xmlids"]),
+}
+
+# commands called by other commands with Commands.invoke
+LAZY_GLOBAL_COMMANDS = {
+    "backup_db": ".lib_backup",
+    "build": ".lib_control",
+    "debug": ".lib_control",
+    "down": ".lib_control",
+    "kill": ".lib_control",
+    "odoo-shell": ".lib_control",
+    "pghba_conf_wide_open": ".lib_db",
+    "progress": ".lib_module",
+    "recreate": ".lib_control",
+    "reload": ".lib_composer",
+    "remove_postgres_volume": ".lib_db_snapshots",
+    "reset-db": ".lib_db",
+    "restart": ".lib_control",
+    "restore_db": ".lib_backup",
+    "rm": ".lib_control",
+    "run": ".lib_control",
+    "runbash": ".lib_control",
+    "show_install_state": ".lib_module",
+    "status": ".lib_setup",
+    "stop": ".lib_control",
+    "up": ".lib_control",
+    "update": ".lib_module",
+    "wait_for_container_postgres": ".lib_control",
+}
+
+Commands = GlobalCommands(LAZY_GLOBAL_COMMANDS)
 pass_config = click.make_pass_decorator(Config, ensure=True)
 
-@click.group(cls=AliasedGroup)
+@click.group(cls=AliasedGroup, lazy_commands=LAZY_COMMANDS)
 @click.option("-f", "--force", is_flag=True)
 @click.option("-v", "--verbose", is_flag=True)
 @click.option("--version", is_flag=True)
@@ -30,6 +202,11 @@ pass_config = click.make_pass_decorator(Config, ensure=True)
 )
 @click.option("-p", "--project-name", help="Set Project-Name")
 @click.option("--chdir", help="Set Working Directory")
+@click.option(
+    "--profile-startup",
+    is_flag=True,
+    help="Prints import times and timings of the cli setup at the end.",
+)
 @pass_config
 def cli(
     config,
@@ -40,6 +217,7 @@ def cli(
     restrict_docker_compose,
     chdir,
     version,
+    profile_startup,
 ):
     config.force = force
     config.verbose = verbose
@@ -47,17 +225,21 @@ def cli(
         os.chdir(chdir)
         config.WORKING_DIR = chdir
 
-    from .tools import _get_default_project_name
+    with profile.phase("import tools"):
+        from .tools import _get_default_project_name
 
     if not project_name:
-        try:
-            project_name = _get_default_project_name(restrict_setting)
-        except Exception:
-            project_name = ""
+        with profile.phase("_get_default_project_name"):
+            try:
+                project_name = _get_default_project_name(restrict_setting)
+            except Exception:
+                project_name = ""
 
-    config.set_restrict('settings', restrict_setting)
-    config.set_restrict('docker-compose', restrict_docker_compose)
-    config.project_name = project_name
+    with profile.phase("set_restrict"):
+        config.set_restrict('settings', restrict_setting)
+        config.set_restrict('docker-compose', restrict_docker_compose)
+    with profile.phase("project setup (files, folders, dynamic modules)"):
+        config.project_name = project_name
 
 @cli.command()
 @click.option(
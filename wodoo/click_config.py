@@ -21,6 +21,12 @@ class Config(object):
     def __init__(
         self, quiet=False, project_name=None, force=False, verbose=False, version=None
     ):
+        from .startup_profile import profile
+
+        with profile.phase("Config()"):
+            self._init(quiet, project_name, force, verbose)
+
+    def _init(self, quiet, project_name, force, verbose):
         from .consts import YAML_VERSION
         from . import odoo_config  # NOQA
 
@@ -1,7 +1,12 @@
+import importlib
+
+
 class GlobalCommands(object):
     # so commands can call other commands
-    def __init__(self):
+    def __init__(self, lazy_commands=None):
         self.commands = {}
+        # name: module which registers the command on import
+        self.lazy_commands = lazy_commands or {}
 
     def register(self, cmd, force_name=None):
         name = force_name or cmd.callback.__name__
@@ -10,6 +15,8 @@ class GlobalCommands(object):
         self.commands[name] = cmd
 
     def invoke(self, ctx, cmd, missing_ok=False, *args, **kwargs):
+        if cmd not in self.commands and cmd in self.lazy_commands:
+            importlib.import_module(self.lazy_commands[cmd], __package__)
         if cmd not in self.commands:
             if not missing_ok:
                 raise Exception("CMD not found: {}".format(cmd))
@@ -0,0 +1,181 @@
+"""
+Cache for the stages of reload: building the docker-compose file and
+compiling the settings.
+
+Every stage of the build is stored with a fingerprint of its inputs; an
+unchanged reload neither parses the templates again nor calls
+docker-compose config, a changed one redoes only the stages behind the
+change:
+
+    template files --parse--> contents --variables--> prepared
+                   --docker-compose config--> complete config
+"""
+import hashlib
+import json
+import os
+import pickle
+from pathlib import Path
+from .tools import __concurrent_safe_write_file as concurrent_safe_write_file
+from .tools import whoami
+from .tools import __try_to_set_owner as try_to_set_owner
+
+# docker compose v2 is a plugin of the docker cli
+COMPOSE_PLUGINS = [
+    "~/.docker/cli-plugins/docker-compose",
+    "/usr/local/lib/docker/cli-plugins/docker-compose",
+    "/usr/libexec/docker/cli-plugins/docker-compose",
+    "/usr/lib/docker/cli-plugins/docker-compose",
+]
+
+
+def fingerprint(*parts):
+    data = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha1(data.encode("utf8")).hexdigest()
+
+
+def file_key(path):
+    path = Path(path)
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return (str(path), None, None)
+    return (str(path), st.st_size, st.st_mtime_ns)
+
+
+def compose_binary_key(binary):
+    """
+    Identifies the installed docker-compose version without starting it.
+    """
+    paths = [Path(binary).resolve()] if binary else []
+    paths += [Path(os.path.expanduser(x)) for x in COMPOSE_PLUGINS]
+    return [file_key(x) for x in paths if x.exists()]
+
+
+def _dir_mtime(path):
+    try:
+        return path, os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return path, None
+
+
+def walk_tree(root, collect, prune=(".git",), prune_paths=()):
+    """
+    Returns the mtimes of the directories below root and the files for
+    which collect(filename) is true; directories named like prune and
+    the paths prune_paths relative to root are skipped. Like
+    Path.glob("**") symlinked directories are not followed.
+    """
+    dirs, files = [], []
+    prune_paths = set(os.path.join(str(root), x) for x in prune_paths)
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [
+            x
+            for x in dirnames
+            if x not in prune and os.path.join(dirpath, x) not in prune_paths
+        ]
+        dirs.append(_dir_mtime(dirpath))
+        files += [Path(dirpath) / x for x in filenames if collect(x)]
+    return dirs, files
+
+
+class StageCache(object):
+    """
+    Values are kept pickled; every get returns a fresh copy which the
+    later stages may modify.
+    """
+
+    VERSION = 1
+
+    def __init__(self, cache_file):
+        self.cache_file = Path(cache_file)
+        self.files = {}
+        self.stages = {}
+        self._dirty = False
+        self._load()
+
+    @classmethod
+    def for_project(cls, project_name, kind="compose"):
+        return cls(
+            os.path.expanduser(f"~/.local/cache/wodoo/{kind}/{project_name}.bin")
+        )
+
+    def _load(self):
+        if not self.cache_file.exists():
+            return
+        try:
+            data = pickle.loads(self.cache_file.read_bytes())
+        except Exception:
+            return
+        if data.get("version") != self.VERSION:
+            return
+        self.files = data["files"]
+        self.stages = data["stages"]
+
+    def save(self):
+        if not self._dirty:
+            return
+        if not self.cache_file.parent.exists():
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            try_to_set_owner(whoami(), self.cache_file.parent)
+        data = {"version": self.VERSION, "files": self.files, "stages": self.stages}
+        concurrent_safe_write_file(self.cache_file, pickle.dumps(data), as_string=False)
+        self._dirty = False
+
+    def file(self, path, compute):
+        """
+        compute(path) for a template file, cached by path, size and mtime.
+        """
+        key = file_key(path)
+        cached = self.files.get(key[0])
+        if cached and cached[0] == key:
+            return pickle.loads(cached[1])
+        value = compute(path)
+        self.files[key[0]] = (key, pickle.dumps(value))
+        self._dirty = True
+        return value
+
+    def get(self, name):
+        """
+        Returns (key, value) of the last run of the stage or None.
+        """
+        cached = self.stages.get(name)
+        if not cached:
+            return None
+        return cached[0], pickle.loads(cached[1])
+
+    def put(self, name, key, value):
+        self.stages[name] = (key, pickle.dumps(value))
+        self._dirty = True
+
+    def stage(self, name, key, compute):
+        """
+        Returns (value, hit); only the last key of a stage is kept.
+        """
+        cached = self.stages.get(name)
+        if cached and cached[0] == key:
+            return pickle.loads(cached[1]), True
+        value = compute()
+        self.put(name, key, value)
+        return value, False
+
+    def tree(self, name, root, collect, prune=(".git",), prune_paths=()):
+        """
+        walk_tree with the files kept; the tree is only walked again, if
+        the mtime of one of its directories changed, as adding or removing
+        a file changes the mtime of the directory.
+        """
+        key = (str(root), list(prune), list(prune_paths))
+        cached = self.get(name)
+        if cached and cached[0] == key:
+            dirs, files = cached[1]
+            if all(_dir_mtime(x[0]) == x for x in dirs):
+                return files
+        dirs, files = walk_tree(root, collect, prune, prune_paths)
+        self.put(name, key, (dirs, files))
+        return files
+
+    def forget_files(self, keep):
+        keep = set(str(x) for x in keep)
+        for path in set(self.files) - keep:
+            del self.files[path]
+            self._dirty = True
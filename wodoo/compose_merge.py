@@ -0,0 +1,364 @@
+"""
+What 'docker-compose -f file1 -f file2 ... config' does, in process:
+
+- ${VAR} interpolation of all values; supports $VAR, ${VAR}, ${VAR:-default},
+  ${VAR-default}, ${VAR:+other}, ${VAR+other}, ${VAR:?error}, ${VAR?error}
+  and $$ for a literal $; unset variables are an empty string
+- merging the files in order by the rules of the compose override files:
+  mappings are merged, environment and labels by key, volumes and devices
+  by the path in the container; ports, expose, dns and the like are
+  appended; everything else is replaced
+- env_file contents are read into the environment
+
+The output is escaped again ($ becomes $$) like docker-compose config
+prints it, so it can be given to docker-compose again.
+
+Relative build contexts and relative or ~ sources of bind mounts are made
+absolute against base_dir (default the current directory), as
+docker-compose config does. Unlike docker-compose config, volumes, ports
+and the like stay in the form they were written in: docker-compose v1
+and v2 print different long forms there. Scripts after the compose
+build (__after_compose.py) have to accept both forms, or the setting
+COMPOSE_CONFIG_SUBPROCESS=1 uses docker-compose config again.
+"""
+import os
+import re
+from copy import deepcopy
+from pathlib import Path
+
+RE_NAME = re.compile(r"[_a-zA-Z][_a-zA-Z0-9]*")
+
+TOP_LEVEL_MAPPINGS = ["services", "networks", "volumes", "secrets", "configs"]
+TOP_LEVEL_KEYS = TOP_LEVEL_MAPPINGS + ["version", "name"]
+APPEND_UNIQUE = [
+    "ports",
+    "expose",
+    "external_links",
+    "dns",
+    "dns_search",
+    "tmpfs",
+    "env_file",
+    "cap_add",
+    "cap_drop",
+    "extra_hosts",
+    "security_opt",
+]
+KEY_VALUE_LISTS = ["environment", "labels"]
+MERGE_BY_TARGET = ["volumes", "devices"]
+REPLACE = ["command", "entrypoint"]
+
+
+class Interpolator(object):
+    def __init__(self, environment):
+        self.environment = environment
+        self.missing = set()
+
+    def __call__(self, value, path=""):
+        if isinstance(value, dict):
+            return {k: self(v, f"{path}.{k}") for k, v in value.items()}
+        if isinstance(value, list):
+            return [self(v, path) for v in value]
+        if isinstance(value, str) and "$" in value:
+            try:
+                return self.interpolate(value)
+            except ValueError as ex:
+                raise Exception(f"Invalid interpolation format for {path}: {ex}")
+        return value
+
+    def _lookup(self, name):
+        value = self.environment.get(name)
+        if value is None:
+            self.missing.add(name)
+        return value
+
+    def interpolate(self, text):
+        result = []
+        i = 0
+        while i < len(text):
+            c = text[i]
+            if c != "$" or i + 1 == len(text):
+                result.append(c)
+                i += 1
+                continue
+            following = text[i + 1]
+            if following == "$":
+                result.append("$")
+                i += 2
+            elif following == "{":
+                end = self._closing_brace(text, i + 2)
+                result.append(self._braced(text[i + 2 : end], text))
+                i = end + 1
+            else:
+                match = RE_NAME.match(text, i + 1)
+                if not match:
+                    raise ValueError(text)
+                result.append(self._lookup(match.group()) or "")
+                i = match.end()
+        return "".join(result)
+
+    def _closing_brace(self, text, start):
+        depth = 1
+        for i in range(start, len(text)):
+            if text[i] == "{":
+                depth += 1
+            elif text[i] == "}":
+                depth -= 1
+                if not depth:
+                    return i
+        raise ValueError(text)
+
+    def _braced(self, expression, text):
+        match = RE_NAME.match(expression)
+        if not match:
+            raise ValueError(text)
+        name, rest = match.group(), expression[match.end() :]
+        if not rest:
+            return self._lookup(name) or ""
+
+        value = self.environment.get(name)
+        for operator in [":-", "-", ":+", "+", ":?", "?"]:
+            if rest.startswith(operator):
+                argument = rest[len(operator) :]
+                break
+        else:
+            raise ValueError(text)
+
+        unset = value is None or (operator.startswith(":") and not value)
+        if operator.endswith("-"):
+            return self.interpolate(argument) if unset else value
+        if operator.endswith("+"):
+            return "" if unset else self.interpolate(argument)
+        if unset:
+            raise Exception(
+                f"Missing mandatory value for {name}: {self.interpolate(argument)}"
+            )
+        return value
+
+
+def _as_string(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if value is None or isinstance(value, str):
+        return value
+    return str(value)
+
+
+def _key_values(value):
+    """
+    [A=1, B] or {A: 1, B: null} --> {A: '1', B: None}
+    """
+    if not value:
+        return {}
+    if isinstance(value, dict):
+        return {k: _as_string(v) for k, v in value.items()}
+    result = {}
+    for item in value:
+        if "=" in item:
+            key, item = item.split("=", 1)
+        else:
+            key, item = item, None
+        result[key] = item
+    return result
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, (str, dict)):
+        return [value]
+    return list(value)
+
+
+def _target(volume):
+    if isinstance(volume, dict):
+        return volume.get("target")
+    parts = volume.split(":")
+    return parts[1] if len(parts) > 1 else parts[0]
+
+
+def _merge_by_target(base, override):
+    result = {_target(x): x for x in _as_list(base)}
+    for volume in _as_list(override):
+        result[_target(volume)] = volume
+    return list(result.values())
+
+
+def _append_unique(base, override):
+    result = _as_list(base)
+    for item in _as_list(override):
+        if item not in result:
+            result.append(item)
+    return result
+
+
+def _as_mapping(value):
+    if isinstance(value, list):
+        return {x: None for x in value}
+    return value or {}
+
+
+def _normalize_build(build):
+    if isinstance(build, str):
+        build = {"context": build}
+    if "args" in build:
+        build["args"] = _key_values(build["args"])
+    return build
+
+
+def _absolute(path, base_dir):
+    return os.path.normpath(os.path.join(str(base_dir), os.path.expanduser(path)))
+
+
+def _absolute_context(build, base_dir):
+    context = build.get("context")
+    # urls of git repositories are given to docker as they are
+    if context and "://" not in context and not context.startswith("git@"):
+        build["context"] = _absolute(context, base_dir)
+
+
+def _absolute_volume(volume, base_dir):
+    if isinstance(volume, dict):
+        if volume.get("type") == "bind" and volume.get("source"):
+            volume["source"] = _absolute(volume["source"], base_dir)
+        return volume
+    parts = volume.split(":")
+    # names of volumes and container paths only stay
+    if len(parts) > 1 and parts[0].startswith((".", "~")):
+        parts[0] = _absolute(parts[0], base_dir)
+    return ":".join(parts)
+
+
+def _merge_mapping(base, override):
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            _merge_mapping(base[key], value)
+        else:
+            base[key] = deepcopy(value)
+    return base
+
+
+def merge_service(base, override):
+    """
+    Merges override into base like a docker-compose override file.
+    """
+    for key, value in override.items():
+        if key not in base:
+            value = deepcopy(value)
+            if key in KEY_VALUE_LISTS:
+                value = _key_values(value)
+            elif key == "build":
+                value = _normalize_build(value)
+            base[key] = value
+        elif key in KEY_VALUE_LISTS:
+            base[key] = _key_values(base[key])
+            base[key].update(_key_values(value))
+        elif key in MERGE_BY_TARGET:
+            base[key] = _merge_by_target(base[key], value)
+        elif key in APPEND_UNIQUE:
+            base[key] = _append_unique(base[key], value)
+        elif key in REPLACE:
+            base[key] = deepcopy(value)
+        elif key == "build":
+            base[key] = _merge_mapping(
+                _normalize_build(base[key]), _normalize_build(deepcopy(value))
+            )
+        elif key in ["networks", "depends_on"]:
+            if isinstance(base[key], list) and isinstance(value, list):
+                base[key] = _append_unique(base[key], value)
+            else:
+                base[key] = _merge_mapping(_as_mapping(base[key]), _as_mapping(value))
+        elif isinstance(base[key], dict) and isinstance(value, dict):
+            _merge_mapping(base[key], value)
+        else:
+            base[key] = deepcopy(value)
+    return base
+
+
+def merge(contents):
+    """
+    Merges the already interpolated contents of the compose files.
+    """
+    result = {}
+    for content in contents:
+        for key, value in (content or {}).items():
+            if key not in TOP_LEVEL_KEYS and not key.startswith("x-"):
+                continue
+            if key not in TOP_LEVEL_MAPPINGS:
+                result[key] = deepcopy(value)
+                continue
+            section = result.setdefault(key, {})
+            for name, item in (value or {}).items():
+                if key == "services":
+                    if not isinstance(item, dict):
+                        raise Exception(f"Service {name} must be a mapping")
+                    merge_service(section.setdefault(name, {}), item)
+                elif isinstance(item, dict) and isinstance(section.get(name), dict):
+                    _merge_mapping(section[name], item)
+                else:
+                    section[name] = deepcopy(item)
+    return result
+
+
+def read_env_file(path):
+    result = {}
+    for line in Path(path).read_text().splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if "=" in line:
+            key, value = line.split("=", 1)
+        else:
+            key, value = line, None
+        result[key.strip()] = value
+    return result
+
+
+def _resolve_environment(service, environment, base_dir):
+    result = {}
+    for env_file in _as_list(service.pop("env_file", None)):
+        if isinstance(env_file, dict):
+            env_file = env_file["path"]
+        path = Path(env_file)
+        if not path.is_absolute():
+            path = base_dir / path
+        if not path.exists():
+            raise Exception(f"Couldn't find env file: {path}")
+        result.update(read_env_file(path))
+    result.update(_key_values(service.get("environment")))
+    for key, value in result.items():
+        if value is None:
+            result[key] = environment.get(key)
+    service["environment"] = result
+
+
+def escape(value):
+    if isinstance(value, dict):
+        return {k: escape(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [escape(v) for v in value]
+    if isinstance(value, str):
+        return value.replace("$", "$$")
+    return value
+
+
+def compose_config(contents, environment, base_dir=None):
+    """
+    Returns (complete config, names of unset variables).
+    """
+    interpolate = Interpolator(environment)
+    contents = [interpolate(x) for x in contents]
+    result = merge(contents)
+    base_dir = Path(base_dir or Path.cwd())
+    for service in result.get("services", {}).values():
+        _resolve_environment(service, environment, base_dir)
+        for key in KEY_VALUE_LISTS:
+            if key in service:
+                service[key] = _key_values(service[key])
+        if "build" in service:
+            service["build"] = _normalize_build(service["build"])
+            _absolute_context(service["build"], base_dir)
+        if "volumes" in service:
+            service["volumes"] = [
+                _absolute_volume(x, base_dir) for x in _as_list(service["volumes"])
+            ]
+    return escape(result), sorted(interpolate.missing)
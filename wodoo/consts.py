@@ -39,6 +39,7 @@ default_files = {
     'debugging_template_onlyloop': 'config/template_onlyloop.yml',
     'debugging_composer': '${run}/debugging.yml',
     'settings': '${run}/settings',
+    'settings_origins': '${run}/settings.origins',
     'odoo_instances': '${run}/odoo_instances',
     'config/default_network': 'config/default_network',
     'config/cicd_network': 'config/cicd_network_for_project.yml',
@@ -52,6 +53,8 @@ default_files = {
     'start-dev': '~/.odoo/start-dev',
     'cicd_delegator_registry': '${cicd_delegator}/registry.json',
     'pgcli_history': '${run}/pgcli_history',
+    'test_durations': '${run}/test_durations.json',
+    'robot_durations': '${run}/robot_durations.json',
 }
 
 default_commands = {
@@ -0,0 +1,124 @@
+"""
+Pool of template databases: the databases with all modules of the
+manifest installed are kept by the hash of the modules (like list-deps)
+and the settings changing the installed database, so a test run clones
+a template in seconds instead of installing the same modules again.
+
+The filestore of the database is kept next to it with the name of the
+template. The last use of a template is kept in the comment of the
+database.
+"""
+import json
+import arrow
+import click
+from .compose_cache import fingerprint
+from .tools import _copy_db, _copy_filestore, _execute_sql, _remove_filestore
+from .tools import _remove_postgres_connections
+
+PREFIX = "wodoo_template_"
+
+
+class TemplatePool(object):
+    def __init__(self, conn, filestores, max_templates=3, max_bytes=None):
+        """
+        filestores: the directory with the filestores of the databases
+        """
+        self.conn = conn
+        self.filestores = filestores
+        self.max_templates = max_templates
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key(modules_hash, settings):
+        return fingerprint(modules_hash, settings)
+
+    @staticmethod
+    def name(hash):
+        # database names are limited to 63 characters
+        return PREFIX + hash[:32]
+
+    def _sql(self, sql, params=None, **kwargs):
+        return _execute_sql(
+            self.conn.clone(dbname="postgres"),
+            sql,
+            params=params,
+            notransaction=True,
+            **kwargs,
+        )
+
+    def templates(self):
+        """
+        [(name, bytes, last used)], least recently used first
+        """
+        rows = self._sql(
+            (
+                "select datname, pg_database_size(datname), "
+                "shobj_description(oid, 'pg_database') "
+                "from pg_database where datname like %s"
+            ),
+            params=(PREFIX.replace("_", "\\_") + "%",),
+            fetchall=True,
+        )
+        result = []
+        for name, size, comment in rows:
+            try:
+                used = json.loads(comment or "{}").get("used") or ""
+            except ValueError:
+                used = ""
+            result.append((name, size, used))
+        return sorted(result, key=lambda x: x[2])
+
+    def _touch(self, name):
+        comment = json.dumps({"used": arrow.utcnow().isoformat()})
+        self._sql(f"comment on database \"{name}\" is '{comment}'")
+
+    def get(self, hash):
+        """
+        The template of the hash, if its database and filestore exist.
+        """
+        name = self.name(hash)
+        if not (self.filestores / name).exists():
+            return None
+        if any(x[0] == name for x in self.templates()):
+            return name
+        return None
+
+    def clone(self, hash, dbname):
+        name = self.name(hash)
+        click.secho(f"Cloning template {name} to {dbname}", fg="green")
+        self._touch(name)
+        _copy_db(self.conn, name, dbname)
+        _copy_filestore(self.filestores, name, dbname)
+
+    def add(self, hash, dbname):
+        """
+        Keeps a copy of the database as template of the hash.
+        """
+        name = self.name(hash)
+        click.secho(f"Keeping {dbname} as template {name}", fg="green")
+        _copy_db(self.conn, dbname, name)
+        _copy_filestore(self.filestores, dbname, name)
+        self._touch(name)
+        self.evict(keep=name)
+
+    def evict(self, keep=None):
+        """
+        Drops the least recently used templates above the count and
+        disk budget.
+        """
+        templates = self.templates()
+        used = sum(x[1] for x in templates)
+        templates = [x for x in templates if x[0] != keep]
+        count = len(templates) + (1 if keep else 0)
+        for name, size, _ in templates:
+            too_many = self.max_templates and count > self.max_templates
+            too_big = self.max_bytes and used > self.max_bytes
+            if not too_many and not too_big:
+                break
+            click.secho(f"Dropping template {name}", fg="yellow")
+            _remove_postgres_connections(
+                self.conn.clone(dbname=name), f'drop database if exists "{name}"'
+            )
+            _remove_filestore(self.filestores, name)
+            count -= 1
+            used -= size
@@ -11,6 +11,16 @@ import importlib.util
 from retrying import retry
 import traceback
 from threading import Thread
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import tempfile
+import functools
+import io
+import zipfile
+import zlib
+import gzip
+import hashlib
+import re
 import subprocess
 import shutil
 from datetime import datetime
@@ -22,6 +32,7 @@ from .tools import put_appendix_into_file
 from .tools import _dropdb
 from .tools import remove_webassets
 from .tools import __dc
+from .tools import __dc_popen
 from .tools import _execute_sql
 from .tools import __rename_db_drop_target
 from .tools import _remove_postgres_connections
@@ -33,11 +44,14 @@ from .cli import cli, pass_config, Commands
 from .lib_clickhelpers import AliasedGroup
 from .tools import ensure_project_name
 from .tools import _get_filestore_folder
+from .restore_tools import ParallelRestore, is_custom_dump
 
 import inspect
 import os
 from pathlib import Path
 
+RE_SHA1 = re.compile(r"^[0-9a-f]{40}$")
+
 current_dir = Path(
     os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
 )
@@ -62,9 +76,10 @@ def restore(config):
 
 @backup.command(name="all")
 @click.argument("filename", required=False)
+@click.option("-j", "--worker", default=0, help="Compressing threads; default: cpus")
+@click.option("-Z", "--compression", default=6)
 @pass_config
-@click.pass_context
-def backup_all(ctx, config, filename):
+def backup_all(config, filename, worker, compression):
     """
     Runs backup-db and backup-files in odoo-sh format.
     """
@@ -75,38 +90,180 @@ def backup_all(ctx, config, filename):
     )
     if len(filename.parts) == 1:
         filename = Path(config.dumps_path) / filename
-    with autocleanpaper(Path(config.dumps_path) / str(uuid.uuid4())) as tmppath:
-        tmppath.mkdir(exist_ok=True, parents=True)
-        subprocess.check_output(["chown", str(config.owner_uid), tmppath])
-        filepath_db = ctx.invoke(
-            backup_db, filename=tmppath / "dump.sql", dumptype="plain"
-        )
-        with autocleanpaper(tmppath / filename.name, strict=True) as tmpfile:
-            folder = _get_filestore_folder(config)
-            with autocleanpaper() as fake_filestore:
-                symlink_file = fake_filestore / 'filestore'
-                symlink_file.parent.mkdir(exist_ok=True, parents=True)
-                os.symlink(folder, symlink_file)
-
-                with autocleanpaper(folder / 'zipped.zip', strict=True) as folderzip:
-                    subprocess.check_call(
-                        ["zip", "-r", folderzip, 'filestore'],
-                        cwd=fake_filestore,
-                    )
-                    shutil.move(folderzip, tmpfile)
-            subprocess.check_call(
-                [
-                    "zip",
-                    "-u",
-                    tmpfile,
-                    filepath_db.relative_to(tmppath),
-                ],
-                cwd=tmppath,
-            )
+    worker = worker or os.cpu_count()
+
+    # pg_dump streams into a compressed spool, while the filestore is
+    # compressed in parallel directly into the zip file
+    proc = _pg_dump_plain(config)
+    try:
+        tmpfile = filename.parent / f".{filename.name}.{uuid.uuid4()}"
+        with autocleanpaper(tmpfile, strict=True), ThreadPoolExecutor(
+            worker + 1
+        ) as pool:
+            dump = pool.submit(_deflate_to_spool, proc.stdout, compression, filename)
+            try:
+                with zipfile.ZipFile(tmpfile, "w", allowZip64=True) as zf:
+                    _zip_filestore(config, zf, pool, worker, compression)
+
+                    spool, crc, size = dump.result()
+                    if proc.wait():
+                        raise Exception("Backup failed!")
+                    zinfo = zipfile.ZipInfo("dump.sql", time.localtime()[:6])
+                    zinfo.external_attr = 0o644 << 16
+                    _zip_add_deflated(zf, zinfo, spool, crc, size)
+            except BaseException:
+                # otherwise leaving the pool waits for the complete dump
+                proc.kill()
+                raise
             shutil.move(tmpfile, filename)
+        __apply_dump_permissions(filename)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
     click.secho(f"Created dump-file {filename}", fg="green")
 
 
+def _zip_filestore(config, zf, pool, worker, compression):
+    folder = _get_filestore_folder(config)
+    jobs = deque()
+    for path in _iterate_files(folder):
+        zinfo = zipfile.ZipInfo.from_file(
+            path, str("filestore" / path.relative_to(folder))
+        )
+        jobs.append((zinfo, pool.submit(_deflate_file, path, compression)))
+        while len(jobs) > worker * 2:
+            zinfo, job = jobs.popleft()
+            _zip_add_deflated(zf, zinfo, *job.result())
+    for zinfo, job in jobs:
+        _zip_add_deflated(zf, zinfo, *job.result())
+
+
+def _pg_dump_plain(config):
+    """
+    Streams a plain sql dump (like odoo.sh) of the database on stdout.
+    """
+    return __dc_popen(
+        config,
+        [
+            "run",
+            "-T",
+            "--rm",
+            "-e",
+            f"PGPASSWORD={config.DB_PWD}",
+            "--entrypoint",
+            "pg_dump",
+            "cronjobshell",
+            "-h",
+            config.DB_HOST,
+            "-p",
+            str(config.DB_PORT),
+            "-U",
+            config.DB_USER,
+            "--no-owner",
+            config.DBNAME,
+        ],
+        stdout=subprocess.PIPE,
+    )
+
+
+def _iterate_files(folder):
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        for file in sorted(files):
+            yield Path(root) / file
+
+
+def _deflate(src, dest, compression):
+    """
+    Writes raw deflate stream of src to dest; returns crc and size of
+    the uncompressed data.
+    """
+    compressor = zlib.compressobj(compression, zlib.DEFLATED, -15)
+    crc, size = 0, 0
+    while True:
+        chunk = src.read(1024 * 1024)
+        if not chunk:
+            break
+        crc = zlib.crc32(chunk, crc)
+        size += len(chunk)
+        dest.write(compressor.compress(chunk))
+    dest.write(compressor.flush())
+    return crc, size
+
+
+def _deflate_to_spool(src, compression, filename):
+    spool = tempfile.TemporaryFile(dir=filename.parent)
+    crc, size = _deflate(src, spool, compression)
+    return spool, crc, size
+
+
+def _deflate_file(path, compression):
+    spool = tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024)
+    with open(path, "rb") as file:
+        crc, size = _deflate(file, spool, compression)
+    return spool, crc, size
+
+
+def _zip_add_deflated(zf, zinfo, spool, crc, size):
+    """
+    Appends already deflated data to the zipfile; zipfile itself can only
+    compress one member after the other.
+
+    Writing the member directly needs internals of zipfile; if they
+    changed in this python version, the data is inflated and compressed
+    again by zipfile.
+    """
+    with spool:
+        zinfo.compress_type = zipfile.ZIP_DEFLATED
+        if _raw_members_supported():
+            _write_raw_member(zf, zinfo, spool, crc, size)
+            return
+        spool.seek(0)
+        inflater = zlib.decompressobj(-15)
+        with zf.open(zinfo, "w", force_zip64=size > 0x7FFFFFFF) as dest:
+            while True:
+                chunk = spool.read(1024 * 1024)
+                if not chunk:
+                    break
+                dest.write(inflater.decompress(chunk))
+            dest.write(inflater.flush())
+
+
+def _write_raw_member(zf, zinfo, spool, crc, size):
+    zinfo.CRC = crc
+    zinfo.file_size = size
+    zinfo.compress_size = spool.tell()
+    spool.seek(0)
+    zinfo.header_offset = zf.fp.tell()
+    zf.fp.write(zinfo.FileHeader())
+    shutil.copyfileobj(spool, zf.fp, 1024 * 1024)
+    zf.filelist.append(zinfo)
+    zf.NameToInfo[zinfo.filename] = zinfo
+    zf.start_dir = zf.fp.tell()
+    zf._didModify = True
+
+
+@functools.lru_cache(maxsize=None)
+def _raw_members_supported():
+    """
+    Writes a small zipfile with _write_raw_member and reads it back.
+    """
+    data = b"wodoo" * 100
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    spool = io.BytesIO(compressor.compress(data) + compressor.flush())
+    spool.seek(0, io.SEEK_END)
+    buffer = io.BytesIO()
+    try:
+        with zipfile.ZipFile(buffer, "w") as zf:
+            zinfo = zipfile.ZipInfo("test", time.localtime()[:6])
+            zinfo.compress_type = zipfile.ZIP_DEFLATED
+            _write_raw_member(zf, zinfo, spool, zlib.crc32(data), len(data))
+        with zipfile.ZipFile(buffer) as zf:
+            return zf.namelist() == ["test"] and zf.read("test") == data
+    except Exception:  # pylint: disable=broad-except
+        return False
+
+
 @backup.command(name="odoo-db")
 @pass_config
 @click.pass_context
@@ -174,25 +331,128 @@ def backup_db(
 
 @backup.command(name="files")
 @click.argument("filename", required=False, default="")
+@click.option(
+    "--incremental",
+    is_flag=True,
+    help=(
+        "Stores only new blobs in a content addressed directory and "
+        "a manifest per backup"
+    ),
+)
 @pass_config
-def backup_files(config, filename):
-    filepath = Path(filename or f"{config.project_name}.files.tar.gz")
+def backup_files(config, filename, incremental):
+    if incremental:
+        filepath = Path(filename or f"{config.project_name}.files")
+    else:
+        filepath = Path(filename or f"{config.project_name}.files.tar.gz")
     if len(filepath.parts) == 1:
         filepath = Path(config.dumps_path) / filepath
 
-    if filepath.exists():
+    if filepath.exists() and not incremental:
         # dont loose files
         __do_restore_files(config, filepath)
 
     files_dir = _get_filestore_folder(config)
     if not files_dir.exists():
         return
-    subprocess.check_call(["tar", "cfz", filepath, "."], cwd=files_dir)
-    __apply_dump_permissions(filepath)
+    if incremental:
+        _backup_files_incremental(files_dir, filepath)
+    else:
+        subprocess.check_call(["tar", "cfz", filepath, "."], cwd=files_dir)
+        __apply_dump_permissions(filepath)
     click.secho(f"Backup files done to {filepath}", fg="green")
     return filepath
 
 
+def _backup_files_incremental(files_dir, repo):
+    """
+    Odoo names the filestore objects by the sha1 of their content, so
+    they never change. Only objects not yet in the repo are copied.
+    """
+    objects = repo / "objects"
+    manifest = {}
+    copied, size = 0, 0
+    created = [] if repo.exists() else [repo]
+    for path in _iterate_files(files_dir):
+        if RE_SHA1.match(path.name):
+            sha1 = path.name
+        else:
+            sha1 = _sha1_file(path)
+        manifest[str(path.relative_to(files_dir))] = sha1
+        dest = objects / sha1[:2] / sha1
+        if dest.exists():
+            continue
+        for parent in [objects, dest.parent]:
+            if not parent.exists():
+                parent.mkdir(parents=True)
+                created.append(parent)
+        tmp = dest.with_suffix(".tmp")
+        shutil.copyfile(path, tmp)
+        os.replace(tmp, dest)
+        created.append(dest)
+        copied += 1
+        size += dest.stat().st_size
+
+    manifests = repo / "manifests"
+    if not manifests.exists():
+        manifests.mkdir(parents=True)
+        created.append(manifests)
+    # microseconds; still sorted after the former names with seconds
+    generation = datetime.now().strftime("%Y%m%d%H%M%S%f")
+    while (manifests / f"{generation}.json.gz").exists():
+        generation = datetime.now().strftime("%Y%m%d%H%M%S%f")
+    tmp = manifests / f".{generation}.tmp"
+    with gzip.open(tmp, "wt") as file:
+        json.dump(manifest, file)
+    os.replace(tmp, manifests / f"{generation}.json.gz")
+    created.append(manifests / f"{generation}.json.gz")
+    __apply_dump_permissions(*created)
+    click.secho(
+        (
+            f"Generation {generation}: {len(manifest)} files, "
+            f"{copied} new ({size / 1024 / 1024:.1f} MB)"
+        ),
+        fg="green",
+    )
+
+
+def _sha1_file(path):
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def _get_file_generations(repo):
+    return sorted(
+        x.name.split(".")[0] for x in (Path(repo) / "manifests").glob("*.json.gz")
+    )
+
+
+def _restore_files_incremental(config, repo, generation):
+    generations = _get_file_generations(repo)
+    if not generations:
+        abort(f"No backups found in {repo}")
+    generation = generation or generations[-1]
+    if generation not in generations:
+        abort(f"Generation {generation} not found in {repo}")
+    with gzip.open(repo / "manifests" / f"{generation}.json.gz", "rt") as file:
+        manifest = json.load(file)
+
+    files_dir = _get_filestore_destination(config)
+    for relpath, sha1 in manifest.items():
+        dest = files_dir / relpath
+        if dest.exists():
+            continue
+        dest.parent.mkdir(exist_ok=True, parents=True)
+        shutil.copyfile(repo / "objects" / sha1[:2] / sha1, dest)
+    click.secho(
+        f"Files of generation {generation} restored from {repo} to {files_dir}",
+        fg="green",
+    )
+
+
 def __get_default_backup_filename(config):
     return datetime.now().strftime(f"{config.project_name}.odoo.%Y%m%d%H%M%S.dump.gz")
 
@@ -214,9 +474,29 @@ def list_dumps(config):
 
 @restore.command(name="files")
 @click.argument("filename", required=True)
+@click.option(
+    "--generation", help="Incremental backups: restore this instead of the latest"
+)
 @pass_config
-def restore_files(config, filename):
-    __do_restore_files(config, filename)
+def restore_files(config, filename, generation=None):
+    filepath = Path(filename)
+    if len(filepath.parts) == 1:
+        filepath = Path(config.dumps_path) / filepath
+    if filepath.is_dir():
+        _restore_files_incremental(config, filepath, generation)
+    else:
+        __do_restore_files(config, filename)
+
+
+@restore.command(name="list-file-generations")
+@click.argument("filename", required=True)
+@pass_config
+def list_file_generations(config, filename):
+    filepath = Path(filename)
+    if len(filepath.parts) == 1:
+        filepath = Path(config.dumps_path) / filepath
+    for generation in _get_file_generations(filepath):
+        click.echo(generation)
 
 
 def _get_postgres_version(conn):
@@ -517,40 +797,52 @@ def _restore_dump(
                 Commands.invoke(ctx, "wait_for_container_postgres", missing_ok=True)
                 effective_host_name = postgres_name
 
-            cmd = [
-                "run",
-                "--rm",
-                "--entrypoint",
-                "python3 /usr/local/bin/postgres.py",
-            ]
+            if is_custom_dump(Path(dumps_path) / filename):
+                _parallel_restore(
+                    config,
+                    Path(dumps_path) / filename,
+                    DBNAME_RESTORING,
+                    effective_host_name,
+                    workers,
+                    exclude_tables,
+                    ignore_errors,
+                    verbose,
+                )
+            else:
+                cmd = [
+                    "run",
+                    "--rm",
+                    "--entrypoint",
+                    "python3 /usr/local/bin/postgres.py",
+                ]
 
-            parent_path_in_container = "/host/dumps2"
-            cmd += [
-                "-v",
-                f"{dumps_path}:{parent_path_in_container}",
-            ]
-            cmd += [
-                "cronjobshell",
-                "restore",
-                DBNAME_RESTORING,
-                effective_host_name,
-                config.DB_PORT,
-                config.DB_USER,
-                config.DB_PWD,
-                f"{parent_path_in_container}/{filename}",
-                "-j",
-                str(workers),
-            ]
-            if ignore_errors:
-                cmd += ["--ignore-errors"]
-            if exclude_tables:
+                parent_path_in_container = "/host/dumps2"
+                cmd += [
+                    "-v",
+                    f"{dumps_path}:{parent_path_in_container}",
+                ]
                 cmd += [
-                    "--exclude-tables",
-                    ",".join(exclude_tables),
+                    "cronjobshell",
+                    "restore",
+                    DBNAME_RESTORING,
+                    effective_host_name,
+                    config.DB_PORT,
+                    config.DB_USER,
+                    config.DB_PWD,
+                    f"{parent_path_in_container}/{filename}",
+                    "-j",
+                    str(workers),
                 ]
-            if verbose:
-                cmd += ["--verbose"]
-            __dc(config, cmd)
+                if ignore_errors:
+                    cmd += ["--ignore-errors"]
+                if exclude_tables:
+                    cmd += [
+                        "--exclude-tables",
+                        ",".join(exclude_tables),
+                    ]
+                if verbose:
+                    cmd += ["--verbose"]
+                __dc(config, cmd)
         else:
             _add_cronjob_scripts(config)["postgres"]._restore(
                 DBNAME_RESTORING,
@@ -579,6 +871,53 @@ def _restore_dump(
             subprocess.check_output(["docker", "rm", "-f", postgres_name])
 
 
+def _parallel_restore(
+    config, filepath, dbname, host, workers, exclude_tables, ignore_errors, verbose
+):
+    """
+    Restores custom format dumps with progress; biggest tables first and
+    indexes at the end.
+    """
+    parent_path_in_container = "/host/dumps2"
+
+    def pg_restore(args, **kwargs):
+        return __dc_popen(
+            config,
+            [
+                "run",
+                "--rm",
+                "-T",
+                "-v",
+                f"{filepath.parent}:{parent_path_in_container}",
+                "-e",
+                f"PGPASSWORD={config.DB_PWD}",
+                "--entrypoint",
+                "pg_restore",
+                "cronjobshell",
+                "-h",
+                host,
+                "-p",
+                str(config.DB_PORT),
+                "-U",
+                config.DB_USER,
+                "-d",
+                dbname,
+            ]
+            + args
+            + [f"{parent_path_in_container}/{filepath.name}"],
+            **kwargs,
+        )
+
+    ParallelRestore(
+        filepath,
+        pg_restore,
+        workers,
+        exclude_tables=exclude_tables,
+        ignore_errors=ignore_errors,
+        verbose=verbose,
+    ).run()
+
+
 def _add_cronjob_scripts(config):
     """
     Adds scripts from images/cronjobs/bin to sys path to be executed.
@@ -630,13 +969,14 @@ def __restore_check(filepath, config):
     pass
 
 
-def __apply_dump_permissions(filepath):
+def __apply_dump_permissions(*filepaths):
     def change(cmd, id):
-        subprocess.check_call(["sudo", cmd, id, filepath])
+        for i in range(0, len(filepaths), 1000):
+            subprocess.check_call(["sudo", cmd, id] + list(filepaths[i : i + 1000]))
 
     for x in [("DUMP_UID", "chown"), ("DUMP_GID", "chgrp")]:
         id = os.getenv(x[0])
-        if id:
+        if id and filepaths:
             change(x[1], id)
 
 
@@ -1,3 +1,4 @@
+import importlib
 from . import click
 
 if click:
@@ -5,37 +6,83 @@ if click:
     class AliasedGroup(click.Group):
         """
         Uses startswith to match command
+
+        lazy_commands: {name: (module, [subcommand names] or None)}; the
+        module is imported when the command is really needed, so not every
+        call of the cli pays for importing all command modules.
         """
 
+        def __init__(self, *args, lazy_commands=None, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.lazy_commands = lazy_commands or {}
+
+        def _load(self, cmd_name):
+            if cmd_name in self.commands or cmd_name not in self.lazy_commands:
+                return
+            importlib.import_module(self.lazy_commands[cmd_name][0], __package__)
+
+        def _get_command(self, ctx, cmd_name):
+            self._load(cmd_name)
+            return click.Group.get_command(self, ctx, cmd_name)
+
+        def _list_subcommands(self, ctx, cmd_name):
+            if cmd_name not in self.commands:
+                return self.lazy_commands[cmd_name][1] or []
+            cmd = self.commands[cmd_name]
+            if type(cmd) == type(self):
+                return cmd.list_commands(ctx)
+            return []
+
+        def list_commands(self, ctx):
+            return sorted(set(self.commands) | set(self.lazy_commands))
+
+        def shell_complete(self, ctx, incomplete):
+            # click would load every matching command for its help text
+            from click.shell_completion import CompletionItem
+
+            results = [
+                CompletionItem(name, help=cmd.get_short_help_str())
+                for name, cmd in self.commands.items()
+                if name.startswith(incomplete) and not cmd.hidden
+            ]
+            results += [
+                CompletionItem(name)
+                for name in self.lazy_commands
+                if name.startswith(incomplete) and name not in self.commands
+            ]
+            results.sort(key=lambda x: x.value)
+            return results + click.Command.shell_complete(self, ctx, incomplete)
+
         def get_command(self, ctx, cmd_name):
-            rv = click.Group.get_command(self, ctx, cmd_name)
+            rv = self._get_command(ctx, cmd_name)
             if rv is not None:
                 return rv
             matches = list(
-                filter(
-                    lambda x: x[1].startswith(cmd_name),
-                    map(
-                        lambda y: (click.Group.get_command(self, ctx, y), y),
-                        self.list_commands(ctx),
-                    ),
+                map(
+                    lambda y: (self._get_command(ctx, y), y),
+                    filter(lambda x: x.startswith(cmd_name), self.list_commands(ctx)),
                 )
             )
             # search recursivley
             for _cmd_name in self.list_commands(ctx):
-                cmd = click.Group.get_command(self, ctx, _cmd_name)
-                if type(cmd) == type(self):
-                    filtered = filter(
-                        lambda cmd: cmd.startswith(cmd_name), cmd.list_commands(ctx)
+                filtered = list(
+                    filter(
+                        lambda cmd: cmd.startswith(cmd_name),
+                        self._list_subcommands(ctx, _cmd_name),
                     )
-                    matches += list(
-                        map(
-                            lambda cmd_name: (
-                                cmd.get_command(ctx, cmd_name),
-                                _cmd_name,
-                            ),
-                            filtered,
-                        )
+                )
+                if not filtered:
+                    continue
+                cmd = self._get_command(ctx, _cmd_name)
+                matches += list(
+                    map(
+                        lambda cmd_name: (
+                            cmd.get_command(ctx, cmd_name),
+                            _cmd_name,
+                        ),
+                        filtered,
                     )
+                )
 
             if len(matches) > 1:
                 # try to reduce to exact match
@@ -20,6 +20,8 @@ import shutil
 import os
 import tempfile
 import copy
+import json
+import re
 import click
 from . import module_tools
 from . import tools
@@ -36,6 +38,8 @@ from .odoo_config import MANIFEST
 from .tools import execute_script
 from .tools import ensure_project_name
 
+RE_COMPOSE_VARIABLE = re.compile(r"\$\{?([A-Za-z_][A-Za-z0-9_]*)")
+
 
 @cli.group(cls=AliasedGroup)
 @pass_config
@@ -100,6 +104,14 @@ def _get_arch():
 @click.option("-cR", "--additional_config_raw", help="like ODOO_DEMO=1;RUN_PROXY=0")
 @click.option("--images-url", help="default: https://github.com/marcwimmer/odoo")
 @click.option("-I", "--no-update-images", is_flag=True)
+@click.option(
+    "--no-cache", is_flag=True, help="Build the docker-compose file from scratch."
+)
+@click.option(
+    "--verify-compose",
+    is_flag=True,
+    help="Compare the merged docker-compose file with docker-compose config.",
+)
 @pass_config
 @click.pass_context
 def do_reload(
@@ -115,6 +127,8 @@ def do_reload(
     additional_config_raw,
     images_url,
     no_update_images,
+    no_cache,
+    verify_compose,
 ):
     from .myconfigparser import MyConfigParser
 
@@ -125,6 +139,10 @@ def do_reload(
     if not no_update_images:
         _download_images(config, images_url)
     config.TARGETARCH = _get_arch()
+    if no_cache:
+        config.COMPOSE_CACHE = False
+    if verify_compose:
+        config.COMPOSE_VERIFY = True
 
     click.secho(f"Current Project Name: {config.project_name}", bold=True, fg="green")
     SETTINGS_FILE = config.files.get("settings")
@@ -442,19 +460,26 @@ def _execute_after_settings(config):
     execute local __oncompose.py scripts
     """
     from .myconfigparser import MyConfigParser
+    from .settings import get_origins, _write_origins
 
     settings = MyConfigParser(config.files["settings"])
-    for module in config.dirs["images"].glob("**/__after_settings.py"):
-        if module.is_dir():
+    origins = get_origins(config)
+    for path in config.dirs["images"].glob("**/__after_settings.py"):
+        if path.is_dir():
             continue
         spec = importlib.util.spec_from_file_location(
             "dynamic_loaded_module",
-            str(module),
+            str(path),
         )
         module = importlib.util.module_from_spec(spec)
         spec.loader.exec_module(module)
+        before = {k: settings[k] for k in settings.keys()}
         module.after_settings(settings)
         settings.write()
+        for key in settings.keys():
+            if before.get(key) != settings[key]:
+                origins[key] = str(path)
+    _write_origins(config, origins)
 
 
 def _prepare_yml_files_from_template_files(config):
@@ -529,24 +554,28 @@ def __resolve_custom_merge(whole_content, value):
     return whole_content
 
 
-def __get_sorted_contents(paths):
+def __parse_compose_file(path):
     import yaml
 
+    content = path.read_text()
+
+    # dont matter if written manage-order: or manage-order
+    if "manage-order" not in content:
+        order = "99999999"
+    else:
+        order = content.split("manage-order")[1].split("\n")[0].replace(":", "").strip()
+    order = int(order)
+    return order, yaml.safe_load(content)
+
+
+def __get_sorted_contents(paths, cache=None):
     contents = []
     for path in paths:
-        # now probably not needed anymore
-        content = path.read_text()
-
-        # dont matter if written manage-order: or manage-order
-        if "manage-order" not in content:
-            order = "99999999"
+        if cache:
+            order, content = cache.file(path, __parse_compose_file)
         else:
-            order = (
-                content.split("manage-order")[1].split("\n")[0].replace(":", "").strip()
-            )
-        order = int(order)
-
-        contents.append((order, yaml.safe_load(content), path))
+            order, content = __parse_compose_file(path)
+        contents.append((order, content, path))
 
     contents = list(map(lambda x: x[1], sorted(contents, key=lambda x: x[0])))
     return contents
@@ -574,8 +603,8 @@ def __set_environment_in_services(content):
 
 def post_process_complete_yaml_config(config, yml):
     """
-    This is after calling docker-compose config, which returns the
-    complete configuration.
+    This is after merging with docker-compose config semantics, which
+    returns the complete configuration.
     """
 
     yml["version"] = config.YAML_VERSION
@@ -616,6 +645,18 @@ def post_process_complete_yaml_config(config, yml):
     return yml
 
 
+def __compose_environment(env):
+    d = deepcopy(os.environ)
+    d.update(env)
+
+    # set current user id and docker group for probable dinds
+    try:
+        d["DOCKER_GROUP_ID"] = str(grp.getgrnam("docker").gr_gid)
+    except KeyError:
+        pass
+    return d
+
+
 def __run_docker_compose_config(config, contents, env):
     import yaml
 
@@ -638,13 +679,10 @@ def __run_docker_compose_config(config, contents, env):
                 file_path,
             ]
         cmdline += ["config"]
-        d = deepcopy(os.environ)
-        d.update(env)
-
-        # set current user id and docker group for probable dinds
-        d["DOCKER_GROUP_ID"] = str(grp.getgrnam("docker").gr_gid)
 
-        conf = subprocess.check_output(cmdline, cwd=temp_path, env=d)
+        conf = subprocess.check_output(
+            cmdline, cwd=temp_path, env=__compose_environment(env)
+        )
         conf = yaml.safe_load(conf)
         return conf
 
@@ -655,6 +693,125 @@ def __run_docker_compose_config(config, contents, env):
             shutil.rmtree(temp_path)
 
 
+def __diff_config(expected, value, path=""):
+    if isinstance(expected, dict) and isinstance(value, dict):
+        for key in sorted(set(expected) | set(value), key=str):
+            yield from __diff_config(
+                expected.get(key), value.get(key), f"{path}.{key}" if path else key
+            )
+    elif expected != value:
+        yield path, expected, value
+
+
+def __compose_config(config, contents, env):
+    """
+    docker-compose config in process; with COMPOSE_VERIFY=1 docker-compose
+    config is called as well and its output is used, if they differ.
+    COMPOSE_CONFIG_SUBPROCESS=1 only calls docker-compose config like
+    before; see compose_merge for the differences.
+    """
+    from .compose_merge import compose_config
+
+    if config.COMPOSE_CONFIG_SUBPROCESS:
+        return __run_docker_compose_config(config, contents, env)
+
+    content, missing = compose_config(contents, __compose_environment(env))
+    for name in missing:
+        click.secho(
+            f"WARNING: The {name} variable is not set. Defaulting to a blank string.",
+            fg="yellow",
+        )
+
+    if config.COMPOSE_VERIFY:
+        expected = __run_docker_compose_config(config, contents, env)
+        # the version is set afterwards anyway
+        differences = [
+            x for x in __diff_config(expected, content) if x[0] != "version"
+        ]
+        for path, left, right in differences:
+            click.secho(f"{path}:\n\tdocker-compose: {left}\n\twodoo: {right}", fg="red")
+        if differences:
+            click.secho(
+                "Merged compose config differs from docker-compose config.", fg="red"
+            )
+            return expected
+    return content
+
+
+def __prepare_contents(config, contents, env):
+    contents = list(_apply_variables(config, contents, env))
+    _explode_referenced_machines(contents)
+    _fix_contents(contents)
+    return contents
+
+
+def __get_complete_config(config, paths, env, cache=None):
+    """
+    Merges the templates to the complete config; with a cache the stages
+    are only run, if their inputs changed.
+    """
+    from .compose_cache import fingerprint, file_key, compose_binary_key
+    from .compose_merge import Interpolator
+
+    if not cache:
+        contents = __get_sorted_contents(paths)
+        contents = __prepare_contents(config, contents, env)
+        return __compose_config(config, contents, env)
+
+    cache.forget_files(paths)
+    prepare_key = fingerprint(
+        [file_key(x) for x in paths],
+        env,
+        config.files["config/default_network"].read_text(),
+        config.YAML_VERSION,
+    )
+
+    def prepare():
+        contents = __get_sorted_contents(paths, cache)
+        contents = __prepare_contents(config, contents, env)
+        dumped = json.dumps(contents, sort_keys=True)
+        # what docker-compose config still reads from outside
+        variables = sorted(set(RE_COMPOSE_VARIABLE.findall(dumped)))
+        env_files = sorted(
+            set(
+                str(env_file)
+                for content in contents
+                for service in (content.get("services") or {}).values()
+                for env_file in service.get("env_file") or []
+            )
+        )
+        return contents, variables, env_files, fingerprint(dumped)
+
+    (contents, variables, env_files, digest), hit = cache.stage(
+        "prepare", prepare_key, prepare
+    )
+
+    # touched but equal templates still hit the cached config
+    environment = __compose_environment(env)
+    interpolate = Interpolator(environment)
+    calls_binary = config.COMPOSE_VERIFY or config.COMPOSE_CONFIG_SUBPROCESS
+    config_key = fingerprint(
+        digest,
+        bool(config.COMPOSE_VERIFY),
+        bool(config.COMPOSE_CONFIG_SUBPROCESS),
+        (
+            compose_binary_key(config.files["docker_compose_bin"])
+            if calls_binary
+            else None
+        ),
+        {x: environment.get(x) for x in variables},
+        [file_key(interpolate(x)) for x in env_files],
+    )
+    content, hit = cache.stage(
+        "config",
+        config_key,
+        lambda: __compose_config(config, contents, env),
+    )
+    if hit:
+        click.secho("docker-compose files unchanged - using cached config", fg="green")
+    return content
+
+
 def dict_merge(dct, merge_dct):
     """Recursive dict merge. Inspired by :meth:``dict.update()``, instead of
     updating only top-level keys, dict_merge recurses down into dicts nested
@@ -724,17 +881,22 @@ def _prepare_docker_compose_files(config, dest_file, paths):
         click.secho(str(path), fg="green")
         del path
 
-    # make one big compose file
-    contents = __get_sorted_contents(paths)
-    contents = list(_apply_variables(config, contents, env))
-    _explode_referenced_machines(contents)
-    _fix_contents(contents)
+    cache = None
+    if config.COMPOSE_CACHE:
+        from .compose_cache import StageCache
 
-    # call docker compose config to get the complete config
-    content = __run_docker_compose_config(config, contents, env)
+        cache = StageCache.for_project(config.project_name)
+
+    # make one big compose file
+    content = __get_complete_config(config, paths, env, cache)
+    if cache:
+        cache.save()
     content = post_process_complete_yaml_config(config, content)
     content = _execute_after_compose(config, content)
-    dest_file.write_text(yaml.dump(content, default_flow_style=False))
+    content = yaml.dump(content, default_flow_style=False)
+    # keeps the mtime, if nothing changed
+    if not dest_file.exists() or dest_file.read_text() != content:
+        dest_file.write_text(content)
 
 
 def _fix_contents(contents):
@@ -113,41 +113,48 @@ def __get_snapshots(config):
 
 
 def _get_snapshots(config):
-    def _get_snaps():
-        for path in _get_possible_snapshot_paths(config):
-            for line in (
-                subprocess.check_output(
-                    ["sudo", zfs, "list", "-t", "snapshot", str(path)],
-                    encoding="utf8",
-                    stderr=subprocess.DEVNULL,  # ignore output of 'no datasets available'
-                )
-                .strip()
-                .splitlines()[1:]
-            ):
-                snapshotname = unify(line.split(" "))[0]
-                creation = unify(
-                    subprocess.check_output(
-                        ["sudo", zfs, "get", "-p", "creation", snapshotname],
-                        encoding="utf8",
-                    )
-                    .strip()
-                    .splitlines()[1]
-                )
-                _, _, timestamp, _ = creation.split(" ")
-                timestamp = arrow.get(int(timestamp)).datetime
-                info = {}
-                info["date"] = timestamp
-                info["fullpath"] = snapshotname
-                info["name"] = snapshotname.split("@")[1]
-                info["path"] = snapshotname.split("/")[-1]
-                yield info
-
-    yield from sorted(_get_snaps(), key=lambda x: x["date"], reverse=True)
+    paths = list(_get_possible_snapshot_paths(config))
+    snaps = _list_snapshots(config.ZFS_PATH_VOLUMES)
+    snaps = [x for x in snaps if x["fullpath"].split("@")[0] in paths]
+    yield from sorted(snaps, key=lambda x: x["date"], reverse=True)
 
 
 _cache = {}
 
 
+def _list_snapshots(root):
+    """
+    All snapshots below root (ZFS_PATH_VOLUMES) with one zfs call; kept
+    until a zfs command changes them.
+    """
+    if ("snapshots", root) not in _cache:
+        output = subprocess.check_output(
+            ["sudo", zfs, "list", "-H", "-p", "-o", "name,creation,used,referenced"]
+            + ["-t", "snapshot", "-r", root],
+            encoding="utf8",
+            stderr=subprocess.DEVNULL,  # ignore output of 'no datasets available'
+        )
+        snapshots = []
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            snapshotname, creation, used, referenced = line.split("\t")
+            info = {}
+            info["date"] = arrow.get(int(creation)).datetime
+            info["fullpath"] = snapshotname
+            info["name"] = snapshotname.split("@")[1]
+            info["path"] = snapshotname.split("/")[-1]
+            info["used"] = int(used)
+            info["referenced"] = int(referenced)
+            snapshots.append(info)
+        _cache[("snapshots", root)] = snapshots
+    return _cache[("snapshots", root)]
+
+
+def _zfs_changed():
+    _cache.clear()
+
+
 def _get_all_zfs():
     if "folders" not in _cache:
         output = subprocess.check_output(
@@ -193,6 +200,7 @@ def _turn_into_subvolume(config):
     shutil.move(fullpath, filename)
     try:
         subprocess.check_output(["sudo", zfs, "create", fullpath_zfs])
+        _zfs_changed()
         click.secho(
             f"Writing back the files to original position: from {filename}/ to {fullpath}/"
         )
@@ -231,6 +239,7 @@ def make_snapshot(ctx, config, name):
     assert " " not in name
     fullpath = _get_zfs_path(config) + "@" + name
     subprocess.check_call(["sudo", zfs, "snapshot", fullpath])
+    _zfs_changed()
     __dc(config, ["up", "-d"] + ["postgres"])
     return name
 
@@ -287,6 +296,7 @@ def restore(config, name):
                 zfs_full_path,
             ]
         )
+    _zfs_changed()
     __dc(config, ["rm", "-f"] + ["postgres"])
     __dc(config, ["up", "-d"] + ["postgres"])
 
@@ -303,6 +313,7 @@ def remove(config, snapshot):
     if snapshot["fullpath"] in map(itemgetter("fullpath"), snapshots):
         _try_umount(config)
         subprocess.check_call(["sudo", zfs, "destroy", "-R", snapshot["fullpath"]])
+        _zfs_changed()
 
 
 def remove_volume(config):
@@ -316,6 +327,7 @@ def remove_volume(config):
             pass
         subprocess.check_call(["sudo", zfs, "destroy", "-R", path])
         click.secho(f"Removed: {path}", fg="yellow")
+    _zfs_changed()
     clear_all(config)
 
 def _get_pool_mountpoint(poolname):
@@ -335,4 +347,5 @@ def clear_all(config):
     _try_umount(config)
     diskpath = translate_poolPath_to_fullPath(zfs_full_path)
     if __is_zfs_fs(diskpath):
-        subprocess.check_call(["sudo", zfs, "destroy", "-r", zfs_full_path])
\ No newline at end of file
+        subprocess.check_call(["sudo", zfs, "destroy", "-r", zfs_full_path])
+        _zfs_changed()
\ No newline at end of file
@@ -14,6 +14,7 @@ import traceback
 from datetime import datetime
 import shutil
 import os
+from functools import partial
 import tempfile
 import click
 
@@ -29,7 +30,6 @@ from .tools import __concurrent_safe_write_file
 from .cli import cli, pass_config, Commands
 from .lib_clickhelpers import AliasedGroup
 from .tools import _execute_sql
-from .tools import get_services
 from .tools import __try_to_set_owner
 from .tools import measure_time, abort
 from .module_tools import _determine_affected_modules_for_ir_field_and_related
@@ -85,9 +85,18 @@ def update_module_file(module):
 
 
 @odoo_module.command(name="run-tests")
+@click.option(
+    "-j",
+    "--workers",
+    default=1,
+    help="Parallel test containers; each gets a copy of the database.",
+)
+@click.option("--report", help="Write a junit xml report to this file.")
 @pass_config
 @click.pass_context
-def run_tests(ctx, config):
+def run_tests(ctx, config, workers, report):
+    from .parallel_tests import DurationHistory, Result, write_junit_report
+
     started = datetime.now()
     if not config.devmode and not config.force:
         click.secho(
@@ -113,45 +122,41 @@ def run_tests(ctx, config):
 
     if config.force:
         Commands.invoke(ctx, "wait_for_container_postgres", missing_ok=True)
-        Commands.invoke(ctx, "reset-db")
-        Commands.invoke(ctx, "update", "", tests=False, no_dangling_check=True)
-
-    from .module_tools import Module
-    from .odoo_config import customs_dir
+        _provision_test_db(ctx, config)
 
-    success, failed = [], []
-    for module in tests:
-        module = Module.get_by_name(module)
-        testfiles = list(module.get_all_files_of_module())
-        testfiles = [x for x in testfiles if str(x).startswith("tests/")]
-        testfiles = [x for x in testfiles if str(x).endswith(".py")]
-        testfiles = [x for x in testfiles if x.name != "__init__.py"]
-        testfiles = [x for x in testfiles if x.name.startswith("test_")]
+    testfiles = list(_get_unit_test_files(tests)) if config.use_docker else []
+    history = DurationHistory(config.files["test_durations"])
 
-        # identify test files and run them, otherwise tests of dependent modules are run
-        for file in sorted(testfiles):
-            mfpath = module.manifest_path.parent
-            file = mfpath.relative_to(customs_dir()) / file
-            if config.use_docker:
-                params = ["odoo", "/odoolib/unit_test.py", f"{file}"]
-                click.secho(f"Running test: {file}", fg="yellow", bold=True)
-                res = __dcrun(
-                    config,
-                    params + ["--log-level=error", "--not-interactive"],
-                    returncode=True,
+    if workers > 1:
+        results = _run_unit_tests_parallel(config, testfiles, workers, history)
+    else:
+        results = []
+        for file in testfiles:
+            params = _unit_test_params(file)
+            click.secho(f"Running test: {file}", fg="yellow", bold=True)
+            started_file = time.time()
+            res = __dcrun(
+                config,
+                params + ["--log-level=error", "--not-interactive"],
+                returncode=True,
+            )
+            results.append(Result(file, not res, time.time() - started_file))
+            history.record(file, results[-1].seconds)
+            if res:
+                click.secho(
+                    f"Failed, running again with debug on: {file}",
+                    fg="red",
+                    bold=True,
                 )
-                if res:
-                    failed.append(file)
-                    click.secho(
-                        f"Failed, running again with debug on: {file}",
-                        fg="red",
-                        bold=True,
-                    )
-                    res = __cmd_interactive(
-                        config, *(["run", "--rm"] + params + ["--log-level=debug"])
-                    )
-                else:
-                    success.append(file)
+                res = __cmd_interactive(
+                    config, *(["run", "--rm"] + params + ["--log-level=debug"])
+                )
+        history.save()
+
+    if report:
+        write_junit_report(report, results, name=config.project_name)
+    success = [x.name for x in results if x.ok]
+    failed = [x.name for x in results if not x.ok]
 
     elapsed = datetime.now() - started
     click.secho(f"Time: {elapsed}", fg="yellow")
@@ -171,6 +176,139 @@ def run_tests(ctx, config):
         click.secho("Tests OK", fg="green")
 
 
+# settings changing the database installed by update
+DB_SETTINGS = ["DEFAULT_DEV_PASSWORD", "ODOO_IMAGES_BRANCH", "ODOO_VERSION"]
+
+
+def _get_db_settings(config):
+    """
+    The settings DB_SETTINGS and all settings about demo data and
+    languages.
+    """
+    from .myconfigparser import MyConfigParser
+
+    settings = MyConfigParser(config.files["settings"])
+    result = {
+        k: settings[k]
+        for k in sorted(settings.keys())
+        if k in DB_SETTINGS or "DEMO" in k or "LANG" in k
+    }
+    result["ODOO_LANG"] = os.getenv("ODOO_LANG", "")
+    return result
+
+
+def _provision_test_db(ctx, config):
+    """
+    Fresh database with all modules of the manifest installed; cloned
+    from the template pool, if the modules did not change since a former
+    run.
+    """
+
+    def install():
+        Commands.invoke(ctx, "reset-db")
+        Commands.invoke(ctx, "update", "", tests=False, no_dangling_check=True)
+
+    if not int(config.TEST_DB_TEMPLATES or 0):
+        install()
+        return
+
+    from .db_templates import TemplatePool
+    from .module_tools import Modules
+    from .odoo_config import customs_dir
+
+    os.chdir(customs_dir())
+    hash = TemplatePool.key(
+        _get_modules_hash(config, Modules().get_all_modules_installed_by_manifest()),
+        _get_db_settings(config),
+    )
+    pool = TemplatePool(
+        config.get_odoo_conn(),
+        config.dirs["odoo_data_dir"] / "filestore",
+        max_templates=int(config.TEST_DB_TEMPLATES),
+        max_bytes=float(config.TEST_DB_TEMPLATES_MAX_GB or 0) * 1024**3,
+    )
+    if pool.get(hash):
+        pool.clone(hash, config.dbname)
+    else:
+        install()
+        pool.add(hash, config.dbname)
+
+
+def _get_unit_test_files(modules):
+    """
+    The tests/test_*.py files of the modules relative to the customs dir;
+    running them one by one avoids running tests of dependent modules.
+    """
+    from .module_tools import Module
+    from .odoo_config import customs_dir
+
+    for module in modules:
+        module = Module.get_by_name(module)
+        testfiles = list(module.get_all_files_of_module())
+        testfiles = [x for x in testfiles if str(x).startswith("tests/")]
+        testfiles = [x for x in testfiles if str(x).endswith(".py")]
+        testfiles = [x for x in testfiles if x.name != "__init__.py"]
+        testfiles = [x for x in testfiles if x.name.startswith("test_")]
+
+        for file in sorted(testfiles):
+            mfpath = module.manifest_path.parent
+            yield str(mfpath.relative_to(customs_dir()) / file)
+
+
+def _unit_test_params(file):
+    return ["odoo", "/odoolib/unit_test.py", f"{file}"]
+
+
+def _run_unit_tests_parallel(config, testfiles, workers, history):
+    """
+    Every worker runs its share of the test files on its own copy of the
+    prepared database and its filestore.
+    """
+    from .parallel_tests import run_sharded, run_captured
+    from .tools import _copy_db, _copy_filestore, _remove_filestore
+    from .tools import _remove_postgres_connections, __dc_popen
+
+    conn = config.get_odoo_conn()
+    filestores = config.dirs["odoo_data_dir"] / "filestore"
+    dbs = [f"{config.dbname}_test{i}" for i in range(min(workers, len(testfiles)))]
+    click.secho(f"Copying database {config.dbname} for {len(dbs)} workers")
+    for db in dbs:
+        _copy_db(conn, config.dbname, db)
+        _copy_filestore(filestores, config.dbname, db)
+
+    def run(file, worker):
+        cmd = ["run", "-T", "--rm", "-e", f"DBNAME={dbs[worker]}"]
+        cmd += _unit_test_params(file) + ["--log-level=error", "--not-interactive"]
+        return run_captured(partial(__dc_popen, config, cmd))
+
+    try:
+        results = run_sharded(testfiles, len(dbs), history, run)
+        for result in results:
+            if result.ok:
+                continue
+            click.secho(result.output)
+            click.secho(
+                f"Failed, running again with debug on: {result.name}",
+                fg="red",
+                bold=True,
+            )
+            __cmd_interactive(
+                config,
+                *(
+                    ["run", "--rm", "-e", f"DBNAME={dbs[result.worker]}"]
+                    + _unit_test_params(result.name)
+                    + ["--log-level=debug"]
+                ),
+            )
+    finally:
+        for db in dbs:
+            _remove_postgres_connections(
+                conn.clone(dbname=db), f'drop database if exists "{db}"'
+            )
+            _remove_filestore(filestores, db)
+    return results
+
+
 @odoo_module.command(name="download-openupgrade")
 @pass_config
 @click.option("--version", help="Destination Version", required=True)
@@ -218,7 +356,7 @@ def _get_outdated_versioned_modules_of_deptree(modules):
     from .odoo_config import MANIFEST
 
     mods = Modules()
-    cache_db_modules = {}
+    deptrees = []
 
     for module in sorted(modules):
         if module == "base":
@@ -232,10 +370,13 @@ def _get_outdated_versioned_modules_of_deptree(modules):
                 fg="yellow",
             )
             continue
-        for dep in mods.get_module_flat_dependency_tree(mod):
-            if dep.name not in cache_db_modules:
-                cache_db_modules[dep.name] = DBModules.get_meta_data(dep.name)
-            meta_info = cache_db_modules[dep.name]
+        deptrees.append(mods.get_module_flat_dependency_tree(mod))
+
+    snapshot = DBModules.get_snapshot(dep.name for deps in deptrees for dep in deps)
+
+    for deps in deptrees:
+        for dep in deps:
+            meta_info = snapshot.get_meta_data(dep.name)
             if not meta_info:
                 continue
             version = meta_info["version"]
@@ -533,12 +674,9 @@ def update(
 
         if not no_restart:
             if config.use_docker:
-                Commands.invoke(ctx, "kill", machines=get_services(config, "odoo_base"))
-                if config.run_redis:
-                    Commands.invoke(ctx, "up", machines=["redis"], daemon=True)
-                if config.run_postgres:
-                    Commands.invoke(ctx, "up", machines=["postgres"], daemon=True)
-                Commands.invoke(ctx, "wait_for_container_postgres")
+                from .orchestrate import stop_odoo_and_start_databases
+
+                stop_odoo_and_start_databases(config)
 
         if not no_dangling_check:
             _do_dangling_check(ctx, config, dangling_modules, non_interactive)
@@ -643,11 +781,9 @@ def update(
                 break
 
         if not no_restart and config.use_docker:
-            Commands.invoke(ctx, "restart", machines=["odoo"])
-            if config.run_odoocronjobs:
-                Commands.invoke(ctx, "restart", machines=["odoo_cronjobs"])
-            if config.run_queuejobs:
-                Commands.invoke(ctx, "restart", machines=["odoo_queuejobs"])
+            from .orchestrate import restart_odoo
+
+            restart_odoo(config)
             Commands.invoke(ctx, "up", daemon=True)
 
         Commands.invoke(ctx, "status")
@@ -803,7 +939,7 @@ def _uninstall_marked_modules(config, modules):
 
     if float(config.odoo_version) < 11.0:
         return
-    modules = [x for x in modules if DBModules.is_module_installed(x)]
+    modules = DBModules.get_snapshot(modules).installed()
     if not modules:
         return
     click.secho(f"Going to uninstall {','.join(modules)}", fg="red")
@@ -826,7 +962,7 @@ def _uninstall_marked_modules(config, modules):
         )
         del module
 
-    modules = [x for x in modules if DBModules.is_module_installed(x)]
+    modules = DBModules.get_snapshot(modules).installed()
     if modules:
         abort(f"Failed to uninstall: {','.join(modules)}")
 
@@ -980,7 +1116,22 @@ def _get_available_robottests(ctx, param, incomplete):
 @click.option(
     "-p", "--param", multiple=True, help="e.g. --param key1=value1 --param key2=value2"
 )
-@click.option("--parallel", default=1, help="Parallel runs of robots.")
+@click.option(
+    "--parallel",
+    default=1,
+    help=(
+        "Parallel runs of robots inside the robot container; "
+        "with --shards inside each of the containers."
+    ),
+)
+@click.option(
+    "--shards",
+    default=1,
+    help=(
+        "Robot containers running different test files at once; "
+        "balanced by the durations of former runs."
+    ),
+)
 @click.option(
     "--keep-token-dir",
     is_flag=True,
@@ -1004,6 +1155,13 @@ def _get_available_robottests(ctx, param, incomplete):
 @click.option(
     "--results-file", help="concrete filename where the results.json is stored"
 )
+@click.option(
+    "--since",
+    help=(
+        "Runs the robot tests requiring modules affected by the changes "
+        "since this sha."
+    ),
+)
 @pass_config
 @click.pass_context
 def robotest(
@@ -1016,9 +1174,11 @@ def robotest(
     test_name,
     param,
     parallel,
+    shards,
     output_json,
     keep_token_dir,
     results_file,
+    since,
 ):
     PARAM = param
     del param
@@ -1037,7 +1197,18 @@ def robotest(
 
     from .robo_helpers import _select_robot_filename
 
-    filenames = _select_robot_filename(file, run_all=all)
+    if since:
+        from .robo_helpers import _get_affected_robottest_files
+
+        if file:
+            abort("Cannot provide file and since together!")
+        filenames = _get_affected_robottest_files(
+            _get_affected_modules(since), _get_changed_files(since)
+        )
+        if not filenames:
+            click.secho("No robot tests affected.", fg="green")
+    else:
+        filenames = _select_robot_filename(file, run_all=all)
     del file
 
     if not filenames:
@@ -1053,8 +1224,10 @@ def robotest(
 
     if odoo_modules:
 
+        snapshot = DBModules.get_snapshot(odoo_modules)
+
         def not_installed(module):
-            return DBModules.get_meta_data(module)["state"] == "uninstalled"
+            return snapshot.get_meta_data(module)["state"] == "uninstalled"
 
         modules_to_install = list(filter(not_installed, odoo_modules))
         if modules_to_install:
@@ -1095,26 +1268,34 @@ def robotest(
         return params
 
     token = arrow.get().strftime("%Y-%m-%d_%H%M%S_") + str(uuid.uuid4())
-    data = json.dumps(
-        {
-            "test_files": list(map(str, filenames)),
-            "token": token,
-            "results_file": results_file or "",
-            "params": params(),
-        }
-    )
-    data = base64.b64encode(data.encode("utf-8"))
-
-    params = [
-        "robot",
-    ]
+    output_path = config.HOST_RUN_DIR / "odoo_outdir" / "robot_output"
 
     workingdir = customs_dir() / (Path(os.getcwd()).relative_to(customs_dir()))
     os.chdir(workingdir)
 
-    __dcrun(config, params, pass_stdin=data.decode("utf-8"), interactive=True)
+    # the durations of sharded runs are recorded per container
+    record_durations = None
+    if shards > 1 and len(filenames) > 1:
+        from .robo_helpers import _run_robot_shards
+
+        tokens = _run_robot_shards(
+            config, filenames, shards, token, params(), output_path, results_file
+        )
+    else:
+        record_durations = filenames
+        data = json.dumps(
+            {
+                "test_files": list(map(str, filenames)),
+                "token": token,
+                "results_file": results_file or "",
+                "params": params(),
+            }
+        )
+        data = base64.b64encode(data.encode("utf-8"))
+
+        __dcrun(config, ["robot"], pass_stdin=data.decode("utf-8"), interactive=True)
+        tokens = [token]
 
-    output_path = config.HOST_RUN_DIR / "odoo_outdir" / "robot_output"
     from .robo_helpers import _eval_robot_output
 
     _eval_robot_output(
@@ -1122,9 +1303,11 @@ def robotest(
         output_path,
         started,
         output_json,
-        token,
+        tokens,
         rm_tokendir=not keep_token_dir,
         results_file=results_file,
+        test_files=record_durations,
+        parallel=parallel,
     )
 
 
@@ -1184,17 +1367,43 @@ def list_robot_test_files(config):
 @click.option("-t", "--tags", is_flag=True)
 @click.option("--output-json", is_flag=True)
 @click.option("--log", is_flag=True)
+@click.option(
+    "--since",
+    help="Runs the tests of the modules affected by the changes since this sha.",
+)
 @pass_config
 def unittest(
-    config, file, remote_debug, wait_for_remote, non_interactive, output_json, tags, log
+    config,
+    file,
+    remote_debug,
+    wait_for_remote,
+    non_interactive,
+    output_json,
+    tags,
+    log,
+    since,
 ):
     """
     Collects unittest files and offers to run
     """
     from .odoo_config import MANIFEST, MANIFEST_FILE, customs_dir
-    from .module_tools import Module
+    from .module_tools import Module, Modules
     from pathlib import Path
 
+    if file and since:
+        abort("Cannot provide file and since together!")
+
+    if since:
+        affected = set(_get_affected_modules(since))
+        installed = Modules().get_all_modules_installed_by_manifest()
+        affected = [x for x in installed if x in affected]
+        click.secho(f"Affected modules: {', '.join(affected)}", fg="yellow")
+        os.chdir(customs_dir())
+        file = ",".join(map(str, sorted(_get_unittests_from_modules(affected))))
+        if not file:
+            click.secho("No tests affected.", fg="green")
+            return
+
     if file and "/" not in file:
         try:
             module = Module.get_by_name(file)
@@ -1384,6 +1593,23 @@ def _get_changed_modules(git_sha):
     return list(sorted(set(modules)))
 
 
+def _get_affected_modules(git_sha):
+    """
+    The changed modules and all modules depending on them.
+    """
+    from .module_tools import ModulesCache
+
+    graph = ModulesCache.graph()
+    affected = []
+    for module in _get_changed_modules(git_sha):
+        if module in graph.ids:
+            affected += [module] + graph.dependants_of(module)
+        else:
+            # e.g. not in the addons paths
+            affected.append(module)
+    return list(sorted(set(affected)))
+
+
 @odoo_module.command(name="list-changed-modules")
 @click.option("-s", "--start")
 @click.pass_context
@@ -1446,6 +1672,42 @@ def _get_directory_hash(path):
     return hash_cache[path]
 
 
+def _get_modules_hash(config, modules):
+    """
+    Hash of odoo, the python version and the given modules; paths are
+    relative to the customs dir.
+    """
+    from .module_tools import Module
+
+    paths = _get_global_hash_paths(True)
+    for mod in modules:
+        paths.append(Module.get_by_name(mod).path)
+
+    # hash python version
+    python_version = config.ODOO_PYTHON_VERSION
+    to_hash = str(python_version) + ";"
+    for path in list(sorted(set(paths))):
+        _hash = _get_directory_hash(path)
+        if _hash is None:
+            raise Exception(f"No hash found for {path} try it again with --no-cache")
+        to_hash += f"{path} {_hash},"
+
+    if config.verbose:
+        # break the hash in chunks and output the hash
+        todo = to_hash
+        i = 0
+        while todo:
+            i += 1
+            SIZE = 100
+            part = todo[:SIZE]
+            todo = todo[SIZE:]
+            click.secho(f"{i}.\n{part}", fg="blue")
+            click.secho(get_hash(part), fg="yellow")
+
+        click.secho(f"\n\nTo Hash:\n{to_hash}\n\n")
+    return get_hash(to_hash)
+
+
 @odoo_module.command()
 @click.argument("module", required=True)
 @click.option("-N", "--no-cache", is_flag=True)
@@ -1491,39 +1753,9 @@ def list_deps(ctx, config, module, no_cache):
         if config.verbose:
             print(f"part1: {part1.total_seconds()}")
 
-        # get some hashes:
-        paths = _get_global_hash_paths(True)
-        for mod in data["modules"]:
-            paths.append(Module.get_by_name(mod).path)
-        for mod in data["auto_install"]:
-            paths.append(Module.get_by_name(mod).path)
-
-        # hash python version
-        python_version = config.ODOO_PYTHON_VERSION
-        to_hash = str(python_version) + ";"
-        for path in list(sorted(set(paths))):
-            _hash = _get_directory_hash(path)
-            if _hash is None:
-                raise Exception(
-                    f"No hash found for {path} try it again with --no-cache"
-                )
-            to_hash += f"{path} {_hash},"
-
-        if config.verbose:
-            # break the hash in chunks and output the hash
-            todo = to_hash
-            i = 0
-            while todo:
-                i += 1
-                SIZE = 100
-                part = todo[:SIZE]
-                todo = todo[SIZE:]
-                click.secho(f"{i}.\n{part}", fg="blue")
-                click.secho(get_hash(part), fg="yellow")
-
-            click.secho(f"\n\nTo Hash:\n{to_hash}\n\n")
-        hash = get_hash(to_hash)
-        data["hash"] = hash
+        data["hash"] = _get_modules_hash(
+            config, data["modules"] + data["auto_install"]
+        )
         part2 = arrow.get() - started
         if config.verbose:
             print(f"part2: {part2.total_seconds()}")
@@ -14,14 +14,20 @@ def setup(config):
 
 
 @setup.command()
+@click.option("--origin", is_flag=True, help="Show the file each value comes from.")
 @pass_config
 @click.pass_context
-def show_effective_settings(ctx, config):
-    from . import MyConfigParser
-
-    config = MyConfigParser(config.files["settings"])
-    for k in sorted(config.keys()):
-        click.echo("{}={}".format(k, config[k]))
+def show_effective_settings(ctx, config, origin):
+    from .myconfigparser import MyConfigParser
+    from .settings import get_origins
+
+    origins = get_origins(config) if origin else {}
+    settings = MyConfigParser(config.files["settings"])
+    for k in sorted(settings.keys()):
+        if origin:
+            click.echo("{}={}  # {}".format(k, settings[k], origins.get(k, "?")))
+        else:
+            click.echo("{}={}".format(k, settings[k]))
 
 
 @setup.command(name="remove-web-assets")
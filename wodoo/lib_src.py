@@ -96,6 +96,10 @@ def make_module(config, name, parent_path):
 @click.option("-f", "--filename", required=False)
 def update_ast(filename):
     from .odoo_parser import update_cache
+    from .odoo_parser_watch import query
+
+    if filename and query({"cmd": "update", "path": str(Path(filename).absolute())}):
+        return
 
     started = datetime.now()
     click.echo("Updating ast - can take about one minute")
@@ -111,14 +115,32 @@ def update_ast(filename):
 def goto_inherited(filepath, lineno):
     from .odoo_parser import goto_inherited_view
 
-    lineno = int(lineno)
-    filepath = customs_dir() / filepath
-    lines = filepath.read_text().split("\n")
-    filepath, lineno = goto_inherited_view(filepath, lineno, lines)
+    from .odoo_parser_watch import query
+
+    answer = query({"cmd": "goto-inherited", "filepath": filepath, "lineno": lineno})
+    if answer:
+        filepath, lineno = answer["filepath"], answer["lineno"]
+    else:
+        lineno = int(lineno)
+        filepath = customs_dir() / filepath
+        lines = filepath.read_text().split("\n")
+        filepath, lineno = goto_inherited_view(filepath, lineno, lines)
     if filepath:
         print(f"FILEPATH:{filepath}:{lineno}")
 
 
+@src.command(
+    help=(
+        "Keeps the ast up to date on file changes and answers "
+        "update-ast/goto-inherited requests of editors."
+    )
+)
+def watch():
+    from .odoo_parser_watch import watch
+
+    watch()
+
+
 @src.command(name="show-addons-paths")
 def show_addons_paths():
     from .odoo_config import get_odoo_addons_paths
@@ -8,10 +8,10 @@ import pickle
 import os
 import shutil
 import uuid
-from .tools import get_hash, get_git_hash
+from .tools import get_hash
+from .tools import __concurrent_safe_write_file as concurrent_safe_write_file
 from .tools import __try_to_set_owner as try_to_set_owner
 from .tools import measure_time
-from .tools import is_git_clean
 from .tools import whoami
 
 try:
@@ -108,8 +108,10 @@ def delete_qweb(config, modules):
             except IntegrityError:
                 cr.execute(f"rollback to savepoint {sp}")
 
-        for module in cr.fetchall():
-            if not DBModules.is_module_installed(module):
+        modules = [x[0] for x in cr.fetchall()]
+        snapshot = DBModules.get_snapshot(modules)
+        for module in modules:
+            if not snapshot.is_installed(module):
                 continue
             cr.execute(
                 """
@@ -144,8 +146,10 @@ class DBModules(object):
 
     @classmethod
     def check_if_all_modules_from_install_are_installed(clazz):
-        for module in get_modules_from_install_file():
-            if not clazz.is_module_installed(module):
+        modules = get_modules_from_install_file()
+        snapshot = clazz.get_snapshot(modules)
+        for module in modules:
+            if not snapshot.is_installed(module):
                 yield module
 
     @classmethod
@@ -194,15 +198,17 @@ class DBModules(object):
     @classmethod
     def get_outdated_installed_modules(clazz, mods):
         odoo_version = current_version()
-        for mod in clazz.get_all_installed_modules():
-            if mod not in mods.modules:
-                continue
+        installed = [
+            x for x in clazz.get_all_installed_modules() if x in mods.modules
+        ]
+        snapshot = clazz.get_snapshot(installed)
+        for mod in installed:
             version_new = mods.modules[mod].manifest_dict.get("version", False)
             if not version_new:
                 continue
             if len(list(x for x in version_new if x == ".")) <= 2:
                 version_new = str(odoo_version) + "." + version_new
-            version = clazz.get_meta_data(mod)["version"]
+            version = snapshot.get_meta_data(mod)["version"]
             if version and version != version_new:
                 yield mod
 
@@ -251,66 +257,101 @@ class DBModules(object):
             return [x[0] for x in cr.fetchall()]
 
     @classmethod
-    def get_meta_data(clazz, module):
+    def get_snapshot(clazz, modules):
+        """
+        Fetches state and version of all given modules with one query.
+        """
+        modules = list(dict.fromkeys(modules))
         with get_conn_autoclose() as cr:
             if not _exists_table(cr, "ir_module_module"):
-                return {}
+                return ModuleStates(modules, None)
             cr.execute(
-                "select id, state, name, latest_version from ir_module_module where name = %s",
-                (module,),
+                (
+                    "select id, state, name, latest_version "
+                    "from ir_module_module where name = ANY(%s)"
+                ),
+                (modules,),
             )
-            record = cr.fetchone()
-            if not record:
-                return {
-                    "name": module,
-                    "state": "uninstalled",
-                    "version": False,
-                    "id": False,
-                }
-            return {
-                "name": record[2],
-                "state": record[1],
-                "id": record[0],
-                "version": record[3],
-            }
+            return ModuleStates(modules, cr.fetchall())
+
+    @classmethod
+    def get_meta_data(clazz, module):
+        return clazz.get_snapshot([module]).get_meta_data(module)
 
     @classmethod
     def get_module_state(clazz, module):
-        with get_conn_autoclose() as cr:
-            cr.execute(
-                "select name, state from ir_module_module where name = %s", (module,)
-            )
-            state = cr.fetchone()
-            if not state:
-                return False
-            return state[1]
+        return clazz.get_snapshot([module]).get_state(module)
 
     @classmethod
     def is_module_listed(clazz, module):
-        with get_conn_autoclose() as cr:
-            if not _exists_table(cr, "ir_module_module"):
-                return False
-            cr.execute(
-                "select count(*) from ir_module_module where name = %s", (module,)
-            )
-            return bool(cr.fetchone()[0])
+        return clazz.get_snapshot([module]).is_listed(module)
 
     @classmethod
     def is_module_installed(clazz, module, raise_exception_not_initialized=False):
         if not module:
             raise Exception("no module given")
-        with get_conn_autoclose() as cr:
-            if not _exists_table(cr, "ir_module_module"):
-                if raise_exception_not_initialized:
-                    raise UserWarning("Database not initialized")
-                return False
-            cr.execute(
-                "select name, state from ir_module_module where name = %s", (module,)
-            )
-            state = cr.fetchone()
-            if not state:
-                return False
-            return state[1] in ["installed", "to upgrade"]
+        snapshot = clazz.get_snapshot([module])
+        if not snapshot.initialized and raise_exception_not_initialized:
+            raise UserWarning("Database not initialized")
+        return snapshot.is_installed(module)
+
+
+class ModuleStates(object):
+    """
+    States of modules at one point in time; may be reused during a
+    command as long as nothing is installed in between.
+    """
+
+    def __init__(self, modules, records):
+        self.modules = modules
+        self.initialized = records is not None
+        self.records = {x[2]: x for x in records or []}
+        self._looked_up = set(modules)
+
+    def _check(self, module):
+        if module in self._looked_up:
+            return
+        # not part of the snapshot: looked up on its own like before
+        self._looked_up.add(module)
+        if self.initialized:
+            self.records.update(DBModules.get_snapshot([module]).records)
+
+    def get_meta_data(self, module):
+        self._check(module)
+        if not self.initialized:
+            return {}
+        record = self.records.get(module)
+        if not record:
+            return {
+                "name": module,
+                "state": "uninstalled",
+                "version": False,
+                "id": False,
+            }
+        return {
+            "name": record[2],
+            "state": record[1],
+            "id": record[0],
+            "version": record[3],
+        }
+
+    def get_state(self, module):
+        self._check(module)
+        record = self.records.get(module)
+        return record[1] if record else False
+
+    def is_listed(self, module):
+        self._check(module)
+        return module in self.records
+
+    def is_installed(self, module):
+        return self.get_state(module) in ["installed", "to upgrade"]
+
+    def installed(self):
+        return [x for x in self.modules if self.is_installed(x)]
+
+    def not_installed(self):
+        return [x for x in self.modules if not self.is_installed(x)]
 
 
 def make_customs(path):
@@ -618,84 +659,412 @@ def update_view_in_db(filepath, lineno):
                         exe("ir.ui.view", "write", view_ids, {"arch_db": arch})
 
 
-class ModulesCache(object):
-    __cache = {}
+class ModulesIndex(object):
+    """
+    Persistent index of all modules per addons path.
+
+    Per addons path the directory listing is remembered together with the
+    stat of the addons path; per module the stat of the manifest and the
+    hash of its content. On load only the entries whose stat changed are
+    read again, so a dirty tree costs a few stat calls instead of a
+    complete rescan.
+
+    {
+        '/customs/odoo/addons': {
+            'stat': (mtime_ns, inode),
+            'dirs': ['base', 'stock', ...],
+            'modules': {
+                'stock': {
+                    'stat': (mtime_ns, inode, size),
+                    'hash': '<sha1 of manifest content>',
+                    'manifest': {...},
+                },
+            },
+        },
+    }
+    """
 
-    @classmethod
-    def _get_cache_file(clazz):
+    VERSION = 1
+
+    def __init__(self, manifest_name=None):
+        self.manifest_name = manifest_name or manifest_file_names()
+        self.file = self._get_index_file()
+        self.paths = {}
+        self._dirty = False
+        self._load()
+
+    @staticmethod
+    def _get_index_file():
         _customs_dir = customs_dir()
-        if not is_git_clean(_customs_dir, ignore_files=["requirements.txt"]):
-            return None
-        from gimera import gimera
+        hash = get_hash(str(_customs_dir.resolve().absolute()))
+        file = Path(
+            os.path.expanduser(f"~/.local/cache/wodoo/modules/index.{hash}.bin")
+        )
+        if not file.parent.exists():
+            file.parent.mkdir(exist_ok=True, parents=True)
+            try_to_set_owner(whoami(), file.parent.parent)
+        return file
 
-        if not (_customs_dir / ".git").exists():
-            # case production system no git history for example
-            return None
-        if not gimera._check_all_submodules_initialized():
+    def _load(self):
+        if not self.file.exists():
+            return
+        try:
+            data = pickle.loads(self.file.read_bytes())
+        except Exception:
+            # corrupt or written by an incompatible version; rebuild
+            return
+        if data.get("version") != self.VERSION:
+            return
+        if data.get("manifest_name") != self.manifest_name:
+            return
+        self.paths = data["paths"]
+
+    def save(self):
+        if not self._dirty:
+            return
+        data = {
+            "version": self.VERSION,
+            "manifest_name": self.manifest_name,
+            "paths": self.paths,
+        }
+        exists = self.file.exists()
+        concurrent_safe_write_file(self.file, pickle.dumps(data), as_string=False)
+        if not exists:
+            try_to_set_owner(whoami(), self.file)
+        self._dirty = False
+
+    def _scan_dirs(self, addons_path):
+        with os.scandir(addons_path) as entries:
+            return sorted(
+                entry.name
+                for entry in entries
+                if not entry.name.startswith(".") and entry.is_dir()
+            )
+
+    def _revalidate_module(self, manifest, cached):
+        """
+        Returns the index entry for the given manifest; reads the
+        manifest only if its stat changed and evaluates it only if
+        the content changed.
+        """
+        try:
+            st = os.stat(manifest)
+        except (FileNotFoundError, NotADirectoryError):
             return None
-        hash_git = get_git_hash(_customs_dir)
-        mani_hash = get_hash(MANIFEST_FILE().read_text())
-        hash = get_hash(f"{hash_git}{mani_hash}")
+        stat = (st.st_mtime_ns, st.st_ino, st.st_size)
+        if cached and cached["stat"] == stat:
+            return cached
 
-        file = Path(os.path.expanduser(f"~/.local/cache/wodoo/modules/{hash}.v3.bin"))
-        file.parent.mkdir(exist_ok=True, parents=True)
-        try_to_set_owner(whoami(), file.parent.parent)
-        return file
+        content = manifest.read_text()
+        hash = get_hash(content)
+        self._dirty = True
+        if cached and cached["hash"] == hash:
+            return dict(cached, stat=stat)
+
+        try:
+            manifest_dict = Module._eval_manifest(content)
+        except Exception:
+            click.secho((f"error at file: {manifest}"), fg="red")
+            raise
+        return {"stat": stat, "hash": hash, "manifest": manifest_dict}
+
+    def revalidate_addons_path(self, addons_path):
+        """
+        Brings the index entry of one addons path up to date and returns
+        the module entries of it.
+        """
+        key = str(addons_path)
+        cached = self.paths.get(key) or {}
+        try:
+            st = os.stat(addons_path)
+        except FileNotFoundError:
+            if self.paths.pop(key, None) is not None:
+                self._dirty = True
+            return {}
+        stat = (st.st_mtime_ns, st.st_ino)
+
+        if cached.get("stat") == stat:
+            dirs = cached["dirs"]
+        else:
+            # modules were added, removed or renamed
+            dirs = self._scan_dirs(addons_path)
+            self._dirty = True
+
+        cached_modules = cached.get("modules", {})
+        modules = {}
+        for name in dirs:
+            entry = self._revalidate_module(
+                addons_path / name / self.manifest_name, cached_modules.get(name)
+            )
+            if entry:
+                modules[name] = entry
+        if modules.keys() != cached_modules.keys():
+            self._dirty = True
+
+        self.paths[key] = {"stat": stat, "dirs": dirs, "modules": modules}
+        return modules
+
+    def get_manifests(self, addons_paths):
+        """
+        Returns {module_name: (manifest_path, manifest_dict)}; modules
+        in earlier addons paths win.
+        """
+        result = {}
+        for addons_path in reversed(addons_paths):
+            addons_path = addons_path.absolute()
+            modules = self.revalidate_addons_path(addons_path)
+            for name, entry in modules.items():
+                result[name] = (
+                    addons_path / name / self.manifest_name,
+                    entry["manifest"],
+                )
+
+        # forget addons paths which are not configured anymore
+        keys = set(str(x.absolute()) for x in addons_paths)
+        for key in list(self.paths):
+            if key not in keys:
+                del self.paths[key]
+                self._dirty = True
+        self.save()
+        return result
+
+
+class DependencyGraph(object):
+    """
+    Dependency graph of all modules.
+
+    Every module gets an integer id; the ids are assigned in topological
+    order, so dependencies always have smaller ids than their dependants.
+    Transitive closures are stored as bitsets (python ints), where bit i
+    stands for the module with id i.
+    """
+
+    def __init__(self, modules):
+        names = sorted(modules)
+        self.modules = modules
+        self._missing = {}
+        self._warned = set()
+
+        depends = {}
+        for name in names:
+            deps = modules[name].manifest_dict.get("depends", [])
+            depends[name] = [x for x in deps if x in modules]
+            missing = [x for x in deps if x not in modules]
+            if missing:
+                self._missing[name] = missing
+
+        # modules in a loop and their dependants get the last ids; only
+        # lookups touching them fail
+        ordered, self.cyclic = self._toposort(names, depends)
+        self.names = ordered + self.cyclic
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        self.depends = [[self.ids[x] for x in depends[name]] for name in self.names]
+        self.dependants = [[] for _ in self.names]
+        for i, deps in enumerate(self.depends):
+            for dep in deps:
+                self.dependants[dep].append(i)
+
+        self.closures = []
+        for deps in self.depends[: len(ordered)]:
+            closure = 0
+            for dep in deps:
+                closure |= self.closures[dep] | (1 << dep)
+            self.closures.append(closure)
+        self.closures += [None] * len(self.cyclic)
+
+        self.auto_install = 0
+        for i, name in enumerate(self.names):
+            if modules[name].manifest_dict.get("auto_install", False):
+                self.auto_install |= 1 << i
+
+        self._reverse_closures = None
+
+    @staticmethod
+    def _toposort(names, depends):
+        """
+        Returns the names in topological order and the names, that are
+        in a loop or depend on one.
+        """
+        result = []
+        pending = {name: len(set(depends[name])) for name in names}
+        dependants = {name: [] for name in names}
+        for name in names:
+            for dep in set(depends[name]):
+                dependants[dep].append(name)
+
+        todo = [name for name in names if not pending[name]]
+        while todo:
+            name = todo.pop()
+            result.append(name)
+            for dependant in dependants[name]:
+                pending[dependant] -= 1
+                if not pending[dependant]:
+                    todo.append(dependant)
+
+        return result, sorted(name for name, count in pending.items() if count)
+
+    def _check_loop(self, bitset):
+        if bitset >> (len(self.names) - len(self.cyclic)):
+            raise Exception(
+                f"Recursive loop in dependencies of: {', '.join(self.cyclic)}"
+            )
+
+    def _names(self, bitset):
+        result = []
+        while bitset:
+            low = bitset & -bitset
+            result.append(self.names[low.bit_length() - 1])
+            bitset ^= low
+        return result
+
+    def bitset(self, names):
+        result = 0
+        for name in names:
+            result |= 1 << self.ids[name]
+        return result
+
+    def _warn_missing(self, bitset):
+        for name, missing in self._missing.items():
+            if not bitset & (1 << self.ids[name]):
+                continue
+            for dep in missing:
+                if dep in self._warned:
+                    continue
+                self._warned.add(dep)
+                # if it is a module, which is probably just auto install
+                # but not in the manifest, then it is not critical
+                click.secho(
+                    (
+                        f"Module not found at resolving dependencies: {dep}"
+                        f". Not necessarily a problem at auto install modules."
+                        "\n\n\n"
+                    ),
+                    fg="yellow",
+                    bold=True,
+                )
+
+    def closure(self, name):
+        """
+        Bitset of all direct and indirect dependencies of the module.
+        """
+        i = self.ids[name]
+        self._check_loop(1 << i)
+        closure = self.closures[i]
+        if self._missing:
+            self._warn_missing(closure | (1 << i))
+        return closure
+
+    def dependencies(self, name):
+        return self._names(self.closure(name))
+
+    def reverse_closure(self, name):
+        """
+        Bitset of all modules that directly or indirectly depend on the module.
+        """
+        self._check_loop(1 << self.ids[name])
+        if self._reverse_closures is None:
+            reverse_closures = [0] * len(self.names)
+            for i in reversed(range(len(self.names))):
+                for dependant in self.dependants[i]:
+                    if dependant >= len(self.names) - len(self.cyclic):
+                        # not ordered: the ones behind it are walked
+                        reverse_closures[i] |= self._reachable(dependant)
+                    else:
+                        reverse_closures[i] |= reverse_closures[dependant] | (
+                            1 << dependant
+                        )
+            self._reverse_closures = reverse_closures
+        return self._reverse_closures[self.ids[name]]
+
+    def _reachable(self, i):
+        result = 1 << i
+        todo = [i]
+        while todo:
+            for dependant in self.dependants[todo.pop()]:
+                if not result & (1 << dependant):
+                    result |= 1 << dependant
+                    todo.append(dependant)
+        return result
+
+    def dependants_of(self, name):
+        return self._names(self.reverse_closure(name))
+
+    def auto_install_modules(self):
+        return self._names(self.auto_install)
+
+    def install_closure(self, bitset):
+        """
+        Adds all dependencies to the given set and afterwards all auto
+        install modules, whose dependencies are satisfied. Walking in
+        topological order is sufficient to reach the fixpoint.
+        """
+        self._check_loop(bitset)
+        for i in range(len(self.names)):
+            if bitset & (1 << i):
+                bitset |= self.closures[i]
+
+        todo = self.auto_install & ~bitset
+        while todo:
+            low = todo & -todo
+            todo ^= low
+            i = low.bit_length() - 1
+            self._check_loop(low)
+            if not self.closures[i] & ~bitset:
+                bitset |= low
+        return bitset
+
+    def order(self, names=None):
+        """
+        Returns the given module names (or all) in topological order.
+        """
+        if names is None:
+            self._check_loop((1 << len(self.names)) - 1)
+            return list(self.names)
+        self._check_loop(self.bitset(names))
+        return sorted(names, key=lambda x: self.ids[x])
+
+
+class ModulesCache(object):
+    __cache = {}
+    __graph = None
 
     @classmethod
     def cache(clazz):
         if not ModulesCache.__cache:
-            file = clazz._get_cache_file()
-            if not file or not file.exists():
-                data = Modules._get_modules()
-            else:
-                data = pickle.loads(file.read_bytes())
-            if file and not file.exists():
-                file.write_bytes(pickle.dumps(data))
-                try_to_set_owner(whoami(), file)
-            ModulesCache.__cache = data
-
+            ModulesCache.__cache = Modules._get_modules()
         return ModulesCache.__cache
 
     @classmethod
     def get(clazz, name):
         return ModulesCache.cache()[name]
 
+    @classmethod
+    def graph(clazz):
+        if ModulesCache.__graph is None:
+            ModulesCache.__graph = DependencyGraph(clazz.cache())
+        return ModulesCache.__graph
+
 
 class Modules(object):
     def __init__(self):
         self.modules = ModulesCache.cache()
 
+    @property
+    def graph(self):
+        return ModulesCache.graph()
+
     @classmethod
     @measure_time
     def _get_modules(self):
-        modnames = set()
         from .odoo_config import get_odoo_addons_paths
 
-        @measure_time
-        def get_all_manifests():
-            """
-            Returns a list of full paths of all manifests
-            """
-            for path in reversed(get_odoo_addons_paths()):
-                for file in sorted(path.glob("*/" + manifest_file_names())):
-                    modname = file.parent.name
-                    if modname in modnames:
-                        continue
-                    modnames.add(file.absolute())
-                    yield file.absolute()
+        version = float(current_version())
+        index = ModulesIndex()
+        manifests = index.get_manifests(get_odoo_addons_paths())
 
         modules = {}
-        all_manifests = get_all_manifests()
-        for m in all_manifests:
-            module = Module(m)
-            module.manifest_dict.get("just read manifest")
-            modules[m.parent.name] = module
-
-        for module in modules.values():
-            Modules._get_module_dependency_tree(modules, module)
-
-        # if directory is clear, we may cache
+        for name, (manifest_path, manifest_dict) in manifests.items():
+            modules[name] = Module._from_index(manifest_path, manifest_dict, version)
         return modules
 
     def get_changed_modules(self, sha_start):
@@ -737,16 +1106,12 @@ class Modules(object):
         modules = get_modules_from_install_file()
 
         if mode == "to_install":
-            modules = [x for x in modules if not DBModules.is_module_installed(x)]
+            modules = DBModules.get_snapshot(modules).not_installed()
 
         modules = list(map(lambda x: Module.get_by_name(x), modules))
         return modules
 
     def get_module_dependency_tree(self, module):
-        return self._get_module_dependency_tree(self.modules, module)
-
-    @classmethod
-    def _get_module_dependency_tree(cls, modules, module):
         """
         Dict of dicts
 
@@ -757,126 +1122,62 @@ class Modules(object):
             'product': {},
         }
         """
-        result = {}
+        graph = self.graph
 
-        def append_deps(mod, data, depth):
-            data[mod.name] = {}
-            if depth > 1000:
-                raise Exception("Recursive loop perhaps - to depth")
-            for dep in mod.manifest_dict.get("depends", []):
-                if dep == "base":
-                    data[mod.name][dep] = {}
-                    continue
-                dep_mod = [x for x in modules.values() if x.name == dep]
-                try:
-                    dep_mod = dep_mod[0]
-                except IndexError:
-                    # if it is a module, which is probably just auto install
-                    # but not in the manifest, then it is not critical
-                    click.secho(
-                        (
-                            f"Module not found at resolving dependencies: {dep}"
-                            f". Not necessarily a problem at auto install modules."
-                            "\n\n\n"
-                        ),
-                        fg="yellow",
-                        bold=True,
-                    )
-                else:
-                    data[mod.name][dep] = {}
-                    append_deps(dep_mod, data[mod.name][dep], depth=depth + 1)
+        def append_deps(i, data):
+            data[graph.names[i]] = {}
+            for dep in graph.depends[i]:
+                append_deps(dep, data[graph.names[i]])
 
-        if module._dep_tree is None:
-            append_deps(module, result, depth=0)
-            module._dep_tree = result
-        return module._dep_tree
+        result = {}
+        graph.closure(module.name)
+        append_deps(graph.ids[module.name], result)
+        return result
 
     def get_all_modules_installed_by_manifest(self):
-        all_modules = set()
+        graph = self.graph
+        install = set()
         for module in MANIFEST().get("install", []):
-            all_modules.add(module)
-            module = Module.get_by_name(module)
-            for module2 in self.get_module_flat_dependency_tree(module):
-                all_modules.add(module2.name)
-
-        all_auto_installed_modules = self.get_all_auto_install_modules()
-        while True:
-            len_modules = len(all_modules)
-            for auto_install_module in all_auto_installed_modules:
-                for module2 in self.get_module_flat_dependency_tree(
-                    auto_install_module
-                ):
-                    # not sufficient: if depending on auto_install module
-                    # for module2 in auto_install_module.manifest_dict['depends']:
-                    if module2.name not in all_modules:
-                        break
-                else:
-                    all_modules.add(auto_install_module.name)
-            if len_modules == len(all_modules):
-                break
-        return list(all_modules)
+            install.add(Module.get_by_name(module).name)
+        for module in install:
+            graph.closure(module)
+        return graph._names(graph.install_closure(graph.bitset(install)))
 
     @measure_time
     def get_module_flat_dependency_tree(self, module):
-        deptree = self.get_module_dependency_tree(module)
-        result = set()
-
-        def x(d):
-            for k, v in d.items():
-                module_name = k if isinstance(k, str) else k.name
-                if module_name != module.name:
-                    result.add(module_name)
-                x(v)
-
-        x(deptree)
-        assert all(isinstance(x, str) for x in result)
-        result = list(map(lambda x: Module.get_by_name(x), list(result)))
+        result = self.graph.dependencies(module.name)
+        result = list(map(lambda x: Module.get_by_name(x), result))
         return sorted(list(result))
 
     def get_all_auto_install_modules(self):
         auto_install_modules = []
-        for module in sorted(Modules().modules):
+        for module in self.graph.auto_install_modules():
             try:
                 module = Module.get_by_name(module)
             except NotInAddonsPath:
                 continue
-            if module.manifest_dict.get("auto_install", False):
-                auto_install_modules.append(module)
+            auto_install_modules.append(module)
         return list(sorted(set(auto_install_modules)))
 
     @measure_time
     def get_filtered_auto_install_modules_based_on_module_list(self, module_list):
+        """
+        Returns auto install modules whose dependencies are all either
+        auto install modules themselves or dependencies of the given
+        modules.
+        """
+        graph = self.graph
         module_list = list(map(lambda x: Module.get_by_name(x), module_list))
 
-        complete_modules = set()
+        complete_modules = 0
         for mod in module_list:
-            complete_modules |= set(list(self.get_module_flat_dependency_tree(mod)))
+            complete_modules |= graph.closure(mod.name)
+        satisfied = complete_modules | graph.auto_install
 
-        def _get(all_modules):
-            for auto_install_module in all_modules:
-                dependencies = set(
-                    list(self.get_module_flat_dependency_tree(auto_install_module))
-                )
-                installed_dependencies = set(
-                    [
-                        x
-                        for x in sorted(dependencies)
-                        if x.manifest_dict.get("auto_install") or x in complete_modules
-                    ]
-                )
-                if dependencies == installed_dependencies:
-                    yield auto_install_module
-
-                    if all(x in module_list for x in dependencies):
-                        yield auto_install_module
-
-        modules = list(sorted(self.get_all_auto_install_modules()))
-        while True:
-            before = list(sorted(set(map(lambda x: x.name, modules))))
-            modules = list(_get(modules))
-            after = list(sorted(set(map(lambda x: x.name, modules))))
-            if after == before:
-                break
+        modules = []
+        for name in graph.auto_install_modules():
+            if not graph.closure(name) & ~satisfied:
+                modules.append(Module.get_by_name(name))
         return list(sorted(set(modules)))
 
     def get_all_used_modules(self):
@@ -1051,23 +1352,42 @@ class Module(object):
         self.name = self._manifest_path.parent.name
         self.path = self._manifest_path.parent
         os.chdir(remember_cwd)
-        self._dep_tree = None
 
     @property
     def manifest_path(self):
         return self._manifest_path
 
+    @classmethod
+    def _from_index(cls, manifest_path, manifest_dict, version):
+        """
+        Constructs the module from an entry of the ModulesIndex without
+        searching the manifest file again.
+        """
+        module = cls.__new__(cls)
+        module.version = version
+        module._manifest_dict = manifest_dict
+        try:
+            manifest_path = manifest_path.relative_to(Path(os.getcwd()))
+        except ValueError:
+            manifest_path = manifest_path.relative_to(customs_dir())
+        module._manifest_path = manifest_path
+        module.name = manifest_path.parent.name
+        module.path = manifest_path.parent
+        return module
+
+    @staticmethod
+    def _eval_manifest(content):
+        content = "\n".join(
+            filter(lambda x: not x.strip().startswith("#"), content.splitlines())
+        )
+        return eval(content)  # TODO safe
+
     @property
     def manifest_dict(self):
         if not self._manifest_dict:
             try:
                 content = self.manifest_path.read_text()
-                content = "\n".join(
-                    filter(
-                        lambda x: not x.strip().startswith("#"), content.splitlines()
-                    )
-                )
-                self._manifest_dict = eval(content)  # TODO safe
+                self._manifest_dict = Module._eval_manifest(content)
 
             except (SyntaxError, Exception):
                 click.secho((f"error at file: {self.manifest_path}"), fg="red")
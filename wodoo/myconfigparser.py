@@ -2,18 +2,16 @@
 import sys
 from pathlib import Path
 
-def _get_ignore_case_item(d, k):
+# parsed settings files of this process: path: ((size, mtime), options)
+_parsed = {}
+
+
+def _stat_key(path):
     try:
-        return d[k]
-    except KeyError:
-        if isinstance(k, str):
-            for i in d.keys():
-                if i.lower() == k.lower():
-                    return d[i]
-            else:
-                raise
-        else:
-            raise
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return st.st_size, st.st_mtime_ns
 
 
 class MyConfigParser:
@@ -25,10 +23,11 @@ class MyConfigParser:
         else:
             self.fileName = Path(fileName)
             self.configOptions = {}
-            if self.fileName.exists():
-                self._open()
+            self._open()
         del fileName
         self.debug = debug
+        # lower case key: key
+        self._index = {k.lower(): k for k in self.configOptions}
 
     def apply(self, other):
         for k in other.keys():
@@ -36,6 +35,7 @@ class MyConfigParser:
 
     def clear(self):
         self.configOptions.clear()
+        self._index.clear()
         if self.fileName:
             self.fileName.parent.mkdir(exist_ok=True, parents=True)
             self.fileName.write_text("")
@@ -44,9 +44,19 @@ class MyConfigParser:
         return self.configOptions.keys()
 
     def _open(self):
-        if not self.fileName or not self.fileName.exists():
+        from .startup_profile import profile
+
+        if not self.fileName:
             return
-        content = self.fileName.read_text().strip()
+        stat_key = _stat_key(self.fileName)
+        if not stat_key:
+            return
+        cached = _parsed.get(self.fileName)
+        if cached and cached[0] == stat_key:
+            self.configOptions = dict(cached[1])
+            return
+        with profile.phase("reading settings files"):
+            content = self.fileName.read_text().strip()
         for line in content.split("\n"):
             # If it isn't a comment get the variable and value and put it on a dict
             if not line.startswith("#") and len(line) > 1:
@@ -59,60 +69,64 @@ class MyConfigParser:
                 val = val.strip('\"')
                 val = val.strip('\'')
                 self.configOptions[key.strip()] = val
+        _parsed[self.fileName] = (stat_key, dict(self.configOptions))
 
     def write(self):
         handled_keys = set()
         if not self.fileName:
             return
         try:
-            # Write the file contents
-            if not self.fileName.is_file():
+            if self.fileName.is_file():
+                old_content = self.fileName.read_text()
+            else:
+                old_content = None
+
+            def write_line(key, val):
+                if val is None:
+                    raise Exception("None value not allowed for: {}".format(key))
+                return key + "=" + str(val)
+
+            # Loop through the file to change with new values in dict
+            lines = []
+            for line in (old_content or "").splitlines():
+                if not line.startswith("#") and len(line) > 1 and "=" in line:
+                    (key, val) = line.split('=', 1)
+                    key = key.strip()
+                    if key in self.configOptions:
+                        newVal = self.configOptions[key]
+
+                        # Only update if the variable value has changed
+                        if val != newVal:
+                            line = write_line(key, newVal)
+                    handled_keys.add(key)
+                lines.append(line.strip() + "\n")
+            for key in self.configOptions.keys():
+                if key not in handled_keys:
+                    lines.append(write_line(key, self.configOptions[key]).strip() + "\n")
+
+            # unchanged files keep their mtime, so cached parses stay valid
+            content = "".join(lines)
+            if content != old_content:
                 self.fileName.parent.mkdir(exist_ok=True, parents=True)
-                self.fileName.write_text("")
-            with self.fileName.open("r+") as file:
-                lines = file.readlines()
-                # Truncate file so we don't need to close it and open it again
-                # for writing
-                file.seek(0)
-                file.truncate()
-
-                def write_line(key, val):
-                    if val is None:
-                        raise Exception("None value not allowed for: {}".format(key))
-                    return key + "=" + str(val)
-
-                # Loop through the file to change with new values in dict
-                for line in lines:
-                    if not line.startswith("#") and len(line) > 1:
-                        (key, val) = line.rstrip('\n').split('=', 1)
-                        key = key.strip()
-                        if key in self.configOptions:
-                            newVal = self.configOptions[key]
-
-                            # Only update if the variable value has changed
-                            if val != newVal:
-                                line = write_line(key, newVal)
-                        handled_keys.add(key)
-                    file.write(line.strip() + "\n")
-                for key in self.configOptions.keys():
-                    if key not in handled_keys:
-                        file.write(write_line(key, self.configOptions[key]).strip() + "\n")
+                self.fileName.write_text(content)
+                _parsed.pop(self.fileName, None)
         except IOError as e:
             print("ERROR opening file " + self.fileName + ": " + e.strerror + "\n")
 
     # Redefinition of __getitem__ and __setitem__
 
     def __getitem__(self, key):
-        try:
-            return _get_ignore_case_item(self.configOptions, key)
-        except KeyError:
-            if isinstance(key, int):
-                keys = self.configOptions.keys()
-                return _get_ignore_case_item(self.configOptions[keys[key]])
-            else:
-                raise KeyError(f"Key {key} doesn't exist in {self.fileName}")
+        if key in self.configOptions:
+            return self.configOptions[key]
+        if isinstance(key, str) and key.lower() in self._index:
+            return self.configOptions[self._index[key.lower()]]
+        if isinstance(key, int):
+            return self.configOptions[list(self.configOptions)[key]]
+        raise KeyError(f"Key {key} doesn't exist in {self.fileName}")
 
     def __setitem__(self, key, value):
+        if isinstance(key, str):
+            self._index.setdefault(key.lower(), key)
         if isinstance(value, list):
             value_list = '('
             for item in value:
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Plain client of the socket of 'odoo src watch' for editors.
+
+Uses the standard library only and is run as a script, so a save hook
+does not pay the startup of the odoo command:
+
+    python3 .../wodoo/odoo_ast_client.py update /abs/path/to/file.py
+    python3 .../wodoo/odoo_ast_client.py goto-inherited <filepath> <lineno>
+    python3 .../wodoo/odoo_ast_client.py view module.xmlid
+    python3 .../wodoo/odoo_ast_client.py qweb module.template
+    python3 .../wodoo/odoo_ast_client.py ping
+
+Found locations are printed like the odoo command does:
+FILEPATH:<filepath>:<lineno>
+
+Exits with 1, if no watcher answered; then the editor falls back to
+'odoo src update-ast' and so on.
+"""
+import json
+import os
+import socket
+import sys
+from pathlib import Path
+
+SOCKET_NAME = ".odoo.ast.sock"
+TIMEOUT = 2
+
+
+def find_socket(start=None):
+    """
+    Returns the socket in the customs directory like customs_dir of
+    odoo_config finds it.
+    """
+    if os.getenv("CUSTOMS_DIR"):
+        return Path(os.environ["CUSTOMS_DIR"]) / SOCKET_NAME
+    here = Path(start or os.getcwd()).absolute()
+    for path in [here] + list(here.parents):
+        if (path / "MANIFEST").exists():
+            return path / SOCKET_NAME
+    return None
+
+
+def send(path, request, timeout=TIMEOUT):
+    """
+    Returns the answer of the watcher listening at path or None, if
+    there is none; raises socket.timeout if it does not answer in time.
+    """
+    if not path or not path.exists():
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(str(path))
+    except (ConnectionRefusedError, FileNotFoundError, socket.timeout):
+        sock.close()
+        return None
+    with sock, sock.makefile("rwb") as f:
+        f.write(json.dumps(request).encode("utf8") + b"\n")
+        f.flush()
+        return json.loads(f.readline())
+
+
+def _request(args):
+    cmd, args = args[0], args[1:]
+    if cmd == "update":
+        return {"cmd": cmd, "path": str(Path(args[0]).absolute())}
+    elif cmd in ["view", "qweb"]:
+        return {"cmd": cmd, "name": args[0]}
+    elif cmd == "goto-inherited":
+        return {"cmd": cmd, "filepath": args[0], "lineno": args[1]}
+    elif cmd == "ping":
+        return {"cmd": cmd}
+    raise ValueError(cmd)
+
+
+def main(args):
+    try:
+        request = _request(args)
+    except (IndexError, ValueError):
+        sys.stderr.write(__doc__)
+        return 2
+    try:
+        answer = send(find_socket(), request)
+    except socket.timeout:
+        answer = None
+    if not answer:
+        return 1
+    if "error" in answer:
+        sys.stderr.write(answer["error"] + "\n")
+        return 2
+    if answer.get("filepath"):
+        print(f"FILEPATH:{answer['filepath']}:{answer['lineno']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -11,6 +11,7 @@ except Exception:
     arrow = None
 from collections import OrderedDict
 import threading
+import atexit
 from . import click
 import json
 from pathlib import Path
@@ -83,6 +84,11 @@ def plaintextfile():
     return path
 
 
+def symboldbfile():
+    path = customs_dir() / ".odoo.ast.db"
+    return path
+
+
 def _read_file(path, default=None):
     try:
         with open(path, "r") as f:
@@ -209,19 +215,127 @@ def get_conn(db=None, host=None):
     return conn, cr
 
 
+class _PooledCursor(object):
+    """
+    Cursor of a pooled connection; if the first statement on a reused
+    connection fails because the connection died meanwhile (e.g. restart
+    of postgres), then a new connection is made and the statement runs
+    again. So there is no extra round trip for checking connections.
+    """
+
+    def __init__(self, connection, connect, reused):
+        self.connection = connection
+        self._connect = connect
+        self._cr = connection.cursor()
+        self._check = reused
+
+    def execute(self, *args, **kwargs):
+        check, self._check = self._check, False
+        try:
+            return self._cr.execute(*args, **kwargs)
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            if not check or not self.connection.closed:
+                raise
+        autocommit = self.connection.autocommit
+        self.connection = self._connect()
+        self.connection.autocommit = autocommit
+        self._cr = self.connection.cursor()
+        return self._cr.execute(*args, **kwargs)
+
+    def __iter__(self):
+        return iter(self._cr)
+
+    def __getattr__(self, name):
+        return getattr(self._cr, name)
+
+
+class ConnectionPool(object):
+    """
+    Idle psycopg2 connections of the process per (host, port, user,
+    dbname); saves the tcp and auth handshake for every statement.
+    """
+
+    MAX_IDLE = 4
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.idle = {}
+
+    @contextmanager
+    def cursor(self, autocommit=False, **params):
+        key = (str(params.get("host")), params.get("port"), params.get("user"))
+        key += (params["dbname"],)
+        with self.lock:
+            idle = self.idle.get(key)
+            conn = idle.pop() if idle else None
+        reused = conn is not None
+        if not reused:
+            conn = psycopg2.connect(**params)
+        conn.autocommit = autocommit
+
+        cr = _PooledCursor(conn, lambda: psycopg2.connect(**params), reused)
+        try:
+            yield cr
+            if not autocommit:
+                cr.connection.commit()
+        except Exception:
+            if not cr.connection.closed:
+                cr.connection.rollback()
+            raise
+        finally:
+            cr.close()
+            self._release(key, cr.connection)
+
+    def _release(self, key, conn):
+        if conn.closed:
+            return
+        if conn.status == psycopg2.extensions.STATUS_READY:
+            with self.lock:
+                idle = self.idle.setdefault(key, [])
+                if len(idle) < self.MAX_IDLE:
+                    idle.append(conn)
+                    return
+        conn.close()
+
+    def discard(self, dbname=None):
+        """
+        Closes the idle connections (to dbname); they would block dropping
+        or renaming the database.
+        """
+        with self.lock:
+            keys = [x for x in self.idle if dbname is None or x[3] == dbname]
+            conns = sum((self.idle.pop(x) for x in keys), [])
+        for conn in conns:
+            conn.close()
+
+
+_connection_pool = None
+
+
+def get_connection_pool():
+    global _connection_pool
+    if _connection_pool is None:
+        _connection_pool = ConnectionPool()
+        atexit.register(_connection_pool.discard)
+    return _connection_pool
+
+
 @contextmanager
-def get_conn_autoclose(*args, **kwargs):
-    conn, cr = get_conn(*args, **kwargs)
-    try:
+def get_conn_autoclose(db=None, host=None):
+    config = get_settings()
+    host, port, user, password = get_postgres_connection_params()
+    params = {"dbname": db or config["DBNAME"]}
+    for key, value in [
+        ("password", password),
+        ("host", host),
+        ("port", port),
+        ("user", user),
+    ]:
+        if value:
+            params[key] = str(value)
+
+    with get_connection_pool().cursor(**params) as cr:
         yield cr
-    except Exception:
-        conn.rollback()
-        raise
-    else:
-        conn.commit()
-    finally:
-        cr.close()
-        conn.close()
 
 
 def translate_path_into_machine_path(path):
@@ -1,16 +1,14 @@
 from pathlib import Path
+import bisect
 import os
 import re
 from lxml import etree
-import tempfile
+import sqlite3
 from .odoo_config import customs_dir
 from .odoo_config import plaintextfile
+from .odoo_config import symboldbfile
 from .odoo_config import translate_path_relative_to_customs_root
 
-modified_filename = ""
-cache_models = {}
-cache_xml_ids = {}
-
 SEP_FILE = ":::"
 SEP_LINENO = ":"
 
@@ -33,617 +31,794 @@ def try_to_get_filepath(filepath):
     return filepath
 
 
-def get_file_lineno(line):
-    path, lineno = line.split(SEP_FILE)[1].split(SEP_LINENO)
-    path = path.replace("//", "/")
-    path = try_to_get_filepath(path)
+def _get_file_lineno(row):
+    if not row:
+        return None, None
+    path, lineno = row
+    path = try_to_get_filepath(path.replace("//", "/"))
     return path, int(lineno)
 
 
 def get_view(inherit_id):
-    with plaintextfile().open("r") as f:
-        lines = f.readlines()
-        lines = filter(lambda line: inherit_id in line, lines)
-        lines = filter(lambda line: re.search(rf"\D\ {inherit_id}\ \D", line), lines)
-        lines = list(lines)
-        if lines:
-            return get_file_lineno(lines[0])
-    return None, None
+    with SymbolDatabase() as db:
+        return _get_file_lineno(db.find(["view", "qweb"], inherit_id))
 
 
 def get_qweb_template(name):
-    with plaintextfile().open("r") as f:
-        lines = f.readlines()
-        lines = list(filter(lambda line: "~qweb" in line and name in line, lines))
-        if lines:
-            return get_file_lineno(lines[0])
-    return None, None
-
-
-def walk_files(on_match, pattern):
-    from .module_tools import Module, Modules
-
-    if modified_filename:
-        try:
-            mod = Module(modified_filename)
-        except Module.IsNot:
-            modules = Modules().modules.values()
-        else:
-            modules = [mod]
-    else:
-        modules = Modules().modules.values()
+    with SymbolDatabase() as db:
+        return _get_file_lineno(db.find(["qweb"], name))
 
-    for mod in modules:
-        for file in mod.path.glob("**/" + pattern):
 
-            rel_file = file.relative_to(mod.path)
-            if rel_file.parts[0] in [
-                "migrations",
-                "migration",
-            ]:  # ignore migrations folder that contain OpenUpgrade
-                continue
-            if ".git" in file.parts:
-                continue
-            if file.name.startswith("."):
-                continue
+class SymbolDatabase(object):
+    """
+    Sqlite store of the parsed symbols; entries are replaced per file.
 
-            lines = file.read_text(encoding="utf-8", errors="ignore").split("\n")
-            on_match(file, mod, lines)
+    The plaintext file .odoo.ast is exported from here for tools, that
+    grep it directly.
+    """
 
+    VERSION = 1
 
-def _get_methods():
+    # order of the sections in the plaintext file
+    TYPES = ["model", "xmlid", "def", "field", "view", "qweb"]
 
-    result = []
+    TEMPLATE = (
+        "{type}\t[{module}]\t{label}\t" + SEP_FILE + "{path}" + SEP_LINENO + "{line}"
+    )
 
-    def on_match(filename, module, lines):
-        for linenumber, line in enumerate(lines):
-            linenumber += 1
-            methodname = re.search(r"def\ ([^\(]*)", line)
-            if methodname:
-                methodname = methodname.group(1)
-                model = None
-                if filename in cache_models:
-                    if "lines" in cache_models[filename]:
-                        linenums = list(
-                            reversed(
-                                list(
-                                    filter(
-                                        lambda x: x < linenumber,
-                                        cache_models[filename]["lines"].keys(),
-                                    )
-                                )
-                            )
-                        )
-                        model = None
-                        if len(linenums) > 0:
-                            model = cache_models[filename]["lines"][linenums[0]]
-
-                    result.append(
-                        {
-                            "model": model,
-                            "module": module.name,
-                            "type": "N/A",
-                            "filename": os.path.basename(filename),
-                            "filepath": filename,
-                            "line": linenumber,
-                            "method": methodname,
-                        }
-                    )
+    def __init__(self, path=None):
+        self.path = path or symboldbfile()
+        self.conn = None
 
-    walk_files(on_match, "*.py")
+    def __enter__(self):
+        self.conn = sqlite3.connect(str(self.path), timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self._create_schema()
+        return self
 
-    return result
-
-
-def _get_fields():
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type:
+            self.conn.rollback()
+        else:
+            self.conn.commit()
+        self.conn.close()
+        self.conn = None
 
-    result = []
+    def _create_schema(self):
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version == self.VERSION:
+            return
+        self.conn.executescript(
+            """
+            DROP TABLE IF EXISTS symbols;
+            DROP TABLE IF EXISTS files;
+            CREATE TABLE files (
+                id INTEGER PRIMARY KEY,
+                path TEXT NOT NULL UNIQUE,
+                module TEXT NOT NULL
+            );
+            CREATE TABLE symbols (
+                id INTEGER PRIMARY KEY,
+                file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+                type TEXT NOT NULL,
+                module TEXT NOT NULL,
+                name TEXT NOT NULL,
+                label TEXT NOT NULL,
+                line INTEGER NOT NULL,
+                view_type TEXT
+            );
+            CREATE INDEX symbols_module ON symbols(module);
+            CREATE INDEX symbols_type_name ON symbols(type, name);
+            CREATE INDEX symbols_name ON symbols(name);
+            CREATE INDEX symbols_file_id ON symbols(file_id);
+            """
+        )
+        self.conn.execute(f"PRAGMA user_version={self.VERSION}")
+
+    @property
+    def is_empty(self):
+        return not self.conn.execute("SELECT 1 FROM files LIMIT 1").fetchone()
+
+    def clear(self):
+        self.conn.execute("DELETE FROM symbols")
+        self.conn.execute("DELETE FROM files")
+
+    def delete_file(self, path):
+        self.conn.execute("DELETE FROM files WHERE path = ?", (str(path),))
+
+    def insert(self, entries):
+        """
+        entries: list of dicts with type, module, name, label, path, line
+        and view_type
+        """
+        file_ids = {}
+        rows = []
+        for entry in entries:
+            path = str(entry["path"])
+            if path not in file_ids:
+                self.delete_file(path)
+                cursor = self.conn.execute(
+                    "INSERT INTO files(path, module) VALUES (?, ?)",
+                    (path, entry["module"]),
+                )
+                file_ids[path] = cursor.lastrowid
+            rows.append(
+                (
+                    file_ids[path],
+                    entry["type"],
+                    entry["module"],
+                    entry["name"],
+                    entry["label"],
+                    entry["line"],
+                    entry.get("view_type"),
+                )
+            )
+        self.conn.executemany(
+            (
+                "INSERT INTO symbols"
+                "(file_id, type, module, name, label, line, view_type) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)"
+            ),
+            rows,
+        )
 
-    def on_match(filename, module, lines):
-        for linenumber, line in enumerate(lines):
-            linenumber += 1
-            if "#" in line:
-                line = line.split("#")[0]
+    def delete_files_below(self, path):
+        self.conn.execute(
+            "DELETE FROM files WHERE path LIKE ? ESCAPE '\\'",
+            (str(path).replace("%", "\\%").replace("_", "\\_") + "/%",),
+        )
 
-            match = re.search(r".*=.*fields\..*\(", line)
-            if match:
-                fieldname = match.group(0).split("=")[0].strip()
-            else:
-                # V8
-                match = re.search(r"[\'\"]([^\'^\"]*)[\'\"].*fields\.", line)
-                if not match:
-                    continue
-                fieldname = match.group(1)
-            if filename in cache_models and "lines" in cache_models[filename]:
-                linenums = list(
-                    reversed(
-                        list(
-                            filter(
-                                lambda x: x < linenumber,
-                                cache_models[filename]["lines"].keys(),
-                            )
-                        )
+    def find(self, types, name):
+        """
+        Returns (path, line) of the first symbol with the given name.
+        """
+        placeholders = ",".join("?" for _ in types)
+        return self.conn.execute(
+            (
+                "SELECT f.path, s.line FROM symbols s "
+                "JOIN files f ON f.id = s.file_id "
+                f"WHERE s.name = ? AND s.type IN ({placeholders}) "
+                "ORDER BY s.id LIMIT 1"
+            ),
+            [name] + list(types),
+        ).fetchone()
+
+    def get_view_type(self, xmlid):
+        row = self.conn.execute(
+            "SELECT view_type FROM symbols WHERE type = 'view' AND name = ? LIMIT 1",
+            (xmlid,),
+        ).fetchone()
+        return row[0] if row else None
+
+    def export_plaintext(self, path):
+        """
+        Writes all symbols in the format of the former plaintext cache.
+        """
+        order = " ".join(f"WHEN '{x}' THEN {i}" for i, x in enumerate(self.TYPES))
+        cursor = self.conn.execute(
+            (
+                "SELECT s.type, s.module, s.label, f.path, s.line FROM symbols s "
+                "JOIN files f ON f.id = s.file_id "
+                f"ORDER BY CASE s.type {order} END, s.id"
+            )
+        )
+        tmpfile = path.parent / f"{path.name}.{os.getpid()}"
+        with tmpfile.open("w") as f:
+            for type, module, label, filepath, line in cursor:
+                f.write(
+                    self.TEMPLATE.format(
+                        type=type, module=module, label=label, path=filepath, line=line
                     )
                 )
-                model = None
-                if len(linenums) > 0:
-                    model = cache_models[filename]["lines"][linenums[0]]
-
-                result.append(
-                    {
-                        "model": model,
-                        "module": module.name,
-                        "type": "N/A",
-                        "filename": os.path.basename(filename),
-                        "filepath": filename,
-                        "line": linenumber,
-                        "field": fieldname,
-                    }
-                )
-
-    walk_files(on_match, "*.py")
+                f.write("\n")
+        os.replace(tmpfile, path)
 
-    return result
 
+EXTRACTORS = []
+IGNORED_DIRS = [
+    "migrations",
+    "migration",
+]  # ignore migrations folder that contain OpenUpgrade
+OSVREGEX = [
+    r"class.*\(.*osv.*\)",
+    r"class.*\(.*TransientModel.*\)",
+    r"class.*\(.*Model.*\)",
+]
 
-def _get_views():
 
-    result = []
-    for id in cache_xml_ids["ids"]:
-        e = cache_xml_ids["ids"][id]
-        if e["model"] == "ir.ui.view":
-            if not e["type"] and e["inherit_id"]:
-                parent = e
-                BARRIER = 0
-                while parent and parent["inherit_id"] and BARRIER < 10:
-                    parent = cache_xml_ids["ids"].get(e["inherit_id"], None)
-                    BARRIER += 1
-                if parent:
-                    e["type"] = parent["type"]
-            result.append(e)
+def extractor(*suffixes):
+    """
+    Registers a function, that extracts entries from a scanned file with
+    one of the given suffixes. The function receives the ScannedFile and
+    appends its findings to scanned_file.result.
+    """
 
-    return result
+    def decorator(method):
+        EXTRACTORS.append((suffixes, method))
+        return method
 
+    return decorator
 
-def _get_qweb_templates():
-    result = []
 
-    def on_match(filename, module, lines):
-        if filename.relative_to(module.path).parts[0] != "static":
-            return
+class ScannedFile(object):
+    """
+    A file of a module, that is read once and then handed to all
+    registered extractors. Content, lines and xml tree are produced
+    on first access and shared.
+    """
 
-        try:
-            tree = etree.parse(filename)
-        except Exception:
-            return
+    def __init__(self, filepath, module):
+        self.filepath = filepath
+        self.module = module
+        self.result = {}
+        self._content = None
+        self._lines = None
+        self._tree = False
+        self._model_index = None
+
+    @property
+    def content(self):
+        if self._content is None:
+            self._content = self.filepath.read_text(encoding="utf-8", errors="ignore")
+        return self._content
+
+    @property
+    def lines(self):
+        if self._lines is None:
+            self._lines = self.content.split("\n")
+        return self._lines
+
+    @property
+    def tree(self):
+        if self._tree is False:
+            try:
+                self._tree = etree.parse(str(self.filepath))
+            except Exception:
+                self._tree = None
+        return self._tree
 
-        # get all records
-        for r in tree.xpath("/templates/*"):
-            if "t-name" in r.attrib:
-                id = r.attrib["t-name"]
-                extends = r.get("t-extend", "")
-
-                if "." not in id:
-                    id = "%s.%s" % (module.name, id)
-
-                r = {
-                    "type": "qweb",
-                    "module": module.name,
-                    "id": id,
-                    "filename": os.path.basename(filename),
-                    "filepath": filename,
-                    "line": r.sourceline,
-                    "name": id,
-                    "inherit_id": extends,
-                }
+    @property
+    def model_index(self):
+        if self._model_index is None:
+            self._model_index = ModelIndex(self.lines)
+        return self._model_index
 
-                result.append(r)
+    def model_at(self, linenumber):
+        return self.model_index.model_at(linenumber)
 
-    walk_files(on_match, "*.xml")
-    sorted(result, key=lambda x: x["name"])
+    def append(self, kind, **values):
+        values.setdefault("module", self.module.name)
+        values.setdefault("filename", self.filepath.name)
+        values.setdefault("filepath", self.filepath)
+        self.result.setdefault(kind, []).append(values)
 
-    return result
 
+def _get_module_files(module):
+    suffixes = set()
+    for _suffixes, _ in EXTRACTORS:
+        suffixes |= set(_suffixes)
 
-def _get_xml_ids():
     result = []
+    for root, dirs, files in os.walk(module.path):
+        root = Path(root)
+        if root == module.path:
+            dirs[:] = [x for x in dirs if x not in IGNORED_DIRS]
+        dirs[:] = [x for x in dirs if x != ".git"]
+        for filename in files:
+            if filename.startswith("."):
+                continue
+            if os.path.splitext(filename)[1] not in suffixes:
+                continue
+            result.append(root / filename)
+    return sorted(result)
 
-    cache_xml_ids.setdefault("files", {})
-    cache_xml_ids.setdefault("ids", {})
 
-    def on_match(filename, module, lines):
-        try:
-            tree = etree.parse(str(filename))
-        except TypeError:
-            return
-        except etree.XMLSyntaxError:
-            return
+def _get_module_file(module, filepath):
+    """
+    Returns the absolute filepath as path relative to the module like
+    the paths of _get_module_files; empty if the file is not scanned.
+    """
+    for parent in filepath.parents:
+        if (parent / module.manifest_path.name).exists():
+            break
+    else:
+        return []
+    rel_path = filepath.relative_to(parent)
+    if rel_path.parts[0] in IGNORED_DIRS or ".git" in rel_path.parts:
+        return []
+    if filepath.name.startswith("."):
+        return []
+    if not any(filepath.suffix in suffixes for suffixes, _ in EXTRACTORS):
+        return []
+    return [module.path / rel_path]
+
+
+def scan_file(filepath, module):
+    scanned = ScannedFile(filepath, module)
+    for suffixes, method in EXTRACTORS:
+        if filepath.suffix in suffixes:
+            method(scanned)
+    return scanned.result
+
+
+def scan_module(module, files=None):
+    """
+    Runs all extractors on the files of the module; every file is
+    read only once.
+    """
+    result = {}
+    if files is None:
+        files = _get_module_files(module)
+    for filepath in files:
+        for kind, entries in scan_file(filepath, module).items():
+            result.setdefault(kind, []).extend(entries)
+    return result
 
-        if filename not in cache_xml_ids["files"]:
-            cache_xml_ids["files"][filename] = []
 
-        def append_result(
-            model, xmlid, line, res_model, name="", ttype="", inherit_id=""
-        ):
+def scan_modules(modules):
+    """
+    Scans the modules in a process pool and returns the
+    collected results in order of the modules.
+    """
+    from concurrent.futures import ProcessPoolExecutor
 
-            if "." not in xmlid:
-                xmlid = "%s.%s" % (module.name, xmlid)
+    result = {}
+    modules = list(modules)
+    if len(modules) > 1:
+        with ProcessPoolExecutor() as executor:
+            scanned = list(executor.map(scan_module, modules, chunksize=4))
+    else:
+        scanned = list(map(scan_module, modules))
+    for module_result in scanned:
+        for kind, entries in module_result.items():
+            result.setdefault(kind, []).extend(entries)
+    return result
 
-            # find res_models of view:
-            if model and xmlid and "." in xmlid:
-                r = {
-                    "module": module.name,
-                    "model": model,
-                    "id": xmlid,
-                    "filename": os.path.basename(filename),
-                    "filepath": filename,
-                    "line": line,
-                    "res_model": res_model,
-                    "name": name,
-                    "type": ttype,
-                    "inherit_id": inherit_id,
-                }
 
-                cache_xml_ids["ids"][xmlid] = r
-                cache_xml_ids["files"][filename].append(r)
-                result.append(r)
+class ModelIndex(object):
+    """
+    Maps the lines of a python file to the model of the innermost class
+    around them. Built in one pass over the lines; lookups are a bisect
+    on the lines, where the owning class changes.
 
-        # get all records
-        for r in tree.xpath("//record"):
-            if "id" in r.attrib and "model" in r.attrib:
-                id = r.attrib["id"]
-                model = r.attrib["model"]
+    A class ends at the first statement, that is not indented deeper
+    than the class; lines inside brackets or multi-line strings are
+    not taken into account for that.
+    """
 
-                res_model = r.xpath("field[@name='model' or @name='res_model']")
-                if len(res_model) > 0:
-                    res_model = res_model[0].text
-                else:
-                    res_model = ""
+    RE_NAME = re.compile(r"[\\\t\ ]_name.?=")
+    RE_INHERIT = re.compile(r"[\\\t\ ]_inherit.?=")
+    RE_QUOTED = re.compile("[\\'\\\"]([^\\'^\\\"]*)[\\'\\\"]")
+    RE_STRINGS = re.compile(r"'[^']*'|\"[^\"]*\"")
+    TRIPLE_QUOTES = ['"""', "'''"]
+
+    def __init__(self, lines):
+        self.classes = []
+        self._starts = []
+        self._owners = []
+        self._build(lines)
+
+    @property
+    def models(self):
+        """
+        Classes with _name or _inherit in order of their lines.
+        """
+        result = []
+        for cls in self.classes:
+            if not cls["name"] and not cls["inherit"]:
+                continue
+            # Zeilennummer der Klasse verwenden; es gibt Faelle z.B. stock.move,
+            # in denen _columns oberhalb von _name steht
+            if not cls["name"]:
+                result.append(
+                    {"model": cls["inherit"], "line": cls["line"], "inherited": True}
+                )
+            else:
+                result.append(
+                    {"model": cls["name"], "line": cls["line"], "inherited": False}
+                )
+        return result
+
+    def model_at(self, linenumber):
+        i = bisect.bisect_right(self._starts, linenumber) - 1
+        if i < 0 or not self._owners[i]:
+            return None
+        cls = self._owners[i]
+        return cls["name"] or cls["inherit"] or None
+
+    def _mark(self, linenumber, cls):
+        if self._starts and self._starts[-1] == linenumber:
+            self._owners[-1] = cls
+        elif not self._owners or self._owners[-1] is not cls:
+            self._starts.append(linenumber)
+            self._owners.append(cls)
+
+    def _build(self, lines):
+        stack = []
+        in_string = None
+        depth = 0
+        for linenumber, line in enumerate(lines, 1):
+            stripped = line.strip()
+            if stripped and not stripped.startswith("#") and not in_string and not depth:
+                indent = len(line) - len(line.lstrip())
+                closed = False
+                while stack and indent <= stack[-1]["indent"]:
+                    stack.pop()
+                    closed = True
+
+                if stripped.startswith("class ") and any(
+                    re.match(x, stripped) for x in OSVREGEX
+                ):
+                    cls = {
+                        "indent": indent,
+                        "line": linenumber,
+                        "name": "",
+                        "inherit": "",
+                    }
+                    stack.append(cls)
+                    self.classes.append(cls)
+                    self._mark(linenumber, cls)
+                elif closed:
+                    self._mark(linenumber, stack[-1] if stack else None)
+                if stack and stack[-1]["line"] != linenumber:
+                    self._set_name(stack[-1], line)
+
+            in_string, depth = self._continuation(line, in_string, depth)
+
+    def _set_name(self, cls, line):
+        if self.RE_NAME.search(line):
+            match = self.RE_QUOTED.search(line)
+            if match:
+                cls["name"] = match.group(1)
+        elif self.RE_INHERIT.search(line):
+            match = self.RE_QUOTED.search(line)
+            if match:
+                cls["inherit"] = match.group(1)
+
+    def _continuation(self, line, in_string, depth):
+        """
+        Tracks multi-line strings and open brackets after the line.
+        """
+        for quotes in self.TRIPLE_QUOTES:
+            if in_string in (None, quotes) and line.count(quotes) % 2:
+                in_string = None if in_string else quotes
+        if in_string:
+            return in_string, depth
+        code = self.RE_STRINGS.sub("", line.split("#")[0])
+        depth += sum(code.count(x) for x in "([{")
+        depth -= sum(code.count(x) for x in ")]}")
+        return in_string, max(depth, 0)
+
+
+@extractor(".py")
+def _get_models(scanned):
+    for model in scanned.model_index.models:
+        scanned.append("models", **model)
+
+
+@extractor(".py")
+def _get_methods(scanned):
+    if not scanned.model_index.models:
+        return
 
-                if model == "ir.ui.menuitem":
-                    name = r.xpath("field[@name='name']")[0].text
-                    append_result(model, id, r.sourceline, "", name)
-                elif model == "ir.ui.view":
-                    name = ""
-                    inherit_id = ""
-                    if r.xpath("field[@name='name']"):
-                        name = r.xpath("field[@name='name']")[0].text
-                    if r.xpath("field[@name='inherit_id']"):
-                        if r.xpath("field[@name='inherit_id']/@ref"):
-                            inherit_id = r.xpath("field[@name='inherit_id']/@ref")[0]
-                            if "." not in inherit_id:
-                                inherit_id = f"{module}.{inherit_id}"
-                    ttype = ""
-                    if not inherit_id:
-                        if r.xpath("field[@name='arch']"):
-                            arch = etree.tostring(
-                                r.xpath("field[@name='arch']")[0]
-                            ).decode("utf-8")
-                            lines = [x.strip() for x in arch.split("\n")]
-                            lines = [l for l in lines if l]
-                            lines = lines[:5]
-
-                            for line in lines:
-                                for _t in [
-                                    "form",
-                                    "tree",
-                                    "calendar",
-                                    "search",
-                                    "kanban",
-                                ]:
-                                    token = f"<{_t} "
-                                    if token in line:
-                                        ttype = _t
-                    append_result(
-                        model,
-                        id,
-                        r.sourceline,
-                        "",
-                        name,
-                        ttype=ttype,
-                        inherit_id=inherit_id,
-                    )
-                else:
-                    append_result(model, id, r.sourceline, res_model)
-
-        for r in tree.xpath("//menuitem"):
-            if "id" in r.attrib:
-                id = r.attrib["id"]
-                model = "ir.ui.menuitem"
-                name = id
-                try:
-                    name = r.attrib["name"]
-                except Exception:
-                    # if there is no name, then name comes from
-                    # associated action
-                    try:
-                        action = r.attrib["action"]
-                    except Exception:
-                        action = ""
-
-                    if action in cache_xml_ids:
-                        name = cache_xml_ids[action].get("name")
+    for linenumber, line in enumerate(scanned.lines):
+        linenumber += 1
+        methodname = re.search(r"def\ ([^\(]*)", line)
+        if methodname:
+            scanned.append(
+                "methods",
+                model=scanned.model_at(linenumber),
+                type="N/A",
+                line=linenumber,
+                method=methodname.group(1),
+            )
 
-                append_result(model, id, r.sourceline, "", name)
 
-        for r in tree.xpath("//report"):
-            if "id" in r.attrib:
-                id = r.attrib["id"]
-                model = "report"
-                append_result(model, id, r.sourceline, "")
+@extractor(".py")
+def _get_fields(scanned):
+    if not scanned.model_index.models:
+        return
 
-        for r in tree.xpath("//template"):
-            if "id" in r.attrib:
-                id = r.attrib["id"]
-                model = "ir.ui.view"
-                inherit_id = ""
-                if r.get("inherit_id"):
-                    inherit_id = r.get("inherit_id")
-                append_result(model, id, r.sourceline, "qweb", inherit_id=inherit_id)
+    for linenumber, line in enumerate(scanned.lines):
+        linenumber += 1
+        if "#" in line:
+            line = line.split("#")[0]
 
-    walk_files(on_match, "*.xml")
-    result.sort(key=lambda x: x["id"])
+        match = re.search(r".*=.*fields\..*\(", line)
+        if match:
+            fieldname = match.group(0).split("=")[0].strip()
+        else:
+            # V8
+            match = re.search(r"[\'\"]([^\'^\"]*)[\'\"].*fields\.", line)
+            if not match:
+                continue
+            fieldname = match.group(1)
+        scanned.append(
+            "fields",
+            model=scanned.model_at(linenumber),
+            type="N/A",
+            line=linenumber,
+            field=fieldname,
+        )
 
-    return result
 
+def _get_views(xml_ids, get_view_type=None):
+    """
+    param: get_view_type - looks up the type of views, that were not
+    scanned now
+    """
+    ids = {}
+    for e in xml_ids:
+        ids[e["id"]] = e
 
-def _get_models():
     result = []
+    for e in ids.values():
+        if e["model"] == "ir.ui.view":
+            if not e["type"] and e["inherit_id"]:
+                parent = ids.get(e["inherit_id"], None)
+                if parent:
+                    e["type"] = parent["type"]
+                elif get_view_type:
+                    e["type"] = get_view_type(e["inherit_id"]) or ""
+            result.append(e)
 
-    def on_match(filename, module, lines):
-        with open(filename, "r") as f:
-            lines = f.readlines()
-
-            def append_model(name, name_linenum, inherit, inherit_linenum):
-                if name == "" and inherit == "":
-                    return
-
-                if name == "" and len(inherit) != "":
-                    model = inherit
-                    linenum = inherit_linenum
-                    inherited = True
-                else:
-                    model = name
-                    linenum = name_linenum
-                    inherited = False
-
-                global cache_models
-                if filename not in cache_models:
-                    cache_models[filename] = {"lines": {}, "models": {}}
-                if model not in cache_models[filename]["models"]:
-                    cache_models[filename]["models"][model] = []
-                if "models" not in cache_models:
-                    cache_models["models"] = {}
-                if model not in cache_models["models"]:
-                    cache_models["models"][model] = []
-                cache_models[filename]["models"][model].append(linenum)
-                cache_models[filename]["lines"][linenum] = model
-                cache_models["models"][model].append(
-                    {
-                        "file": filename,
-                        "line": linenum,
-                        "inherited": inherited,
-                        "module": module,
-                    }
-                )
+    return result
 
-            for linenum, line in enumerate(lines):
-                linenum += 1
-
-                osvregex = [
-                    r"class.*\(.*osv.*\)",
-                    r"class.*\(.*TransientModel.*\)",
-                    r"class.*\(.*Model.*\)",
-                ]
-                if any(re.match(x, line) for x in osvregex):
-
-                    _name = ""
-                    _inherit = ""
-
-                    for linenum1 in range(linenum, len(lines)):
-                        line1 = lines[linenum1]
-                        linenum1 += 1
-
-                        if re.search(r"[\\\t\ ]_name.?=", line1):
-                            _name = re.search("[\\'\\\"]([^\\'^\\\"]*)[\\'\\\"]", line1)
-                            if not _name:
-                                # print "classname not found in: %s"%lines[i]
-                                pass
-                            else:
-                                _name = _name.group(1)
-                        elif re.search(r"[\\\t\ ]_inherit.?=", line1):
-                            match = re.search("[\\'\\\"]([^\\'^\\\"]*)[\\'\\\"]", line1)
-                            if match:
-                                _inherit = match.group(1)
-                        elif any(re.match(x, line1) for x in osvregex):
-                            # reached new class so append it
-                            break
-
-                    linenum_class = linenum  # Zeilennummer der Klasse verwenden; es gibt Faelle z.B. stock.move, in denen _columns oberhalb von _name steht
-                    append_model(_name, linenum_class, _inherit, linenum_class)
-                    linenum = linenum1 - 1
-
-    walk_files(on_match, "*.py")
-
-    cache_models.setdefault("models", {})
-    for m in cache_models["models"]:
-        for l in cache_models["models"][m]:
-            result.append(
-                {
-                    "model": m,
-                    "line": l["line"],
-                    "filepath": l["file"],
-                    "filename": l["file"].name,
-                    "module": l["module"].name,
-                    "inherited": l["inherited"],
-                }
+
+@extractor(".xml")
+def _get_qweb_templates(scanned):
+    module = scanned.module
+    if scanned.filepath.relative_to(module.path).parts[0] != "static":
+        return
+    tree = scanned.tree
+    if tree is None:
+        return
+
+    # get all records
+    for r in tree.xpath("/templates/*"):
+        if "t-name" in r.attrib:
+            id = r.attrib["t-name"]
+            extends = r.get("t-extend", "")
+
+            if "." not in id:
+                id = "%s.%s" % (module.name, id)
+
+            scanned.append(
+                "qweb",
+                type="qweb",
+                id=id,
+                line=r.sourceline,
+                name=id,
+                inherit_id=extends,
             )
-    return result
 
 
-def _remove_entries(plain_text_file, rel_path):
-    """
-    Removes entries pointing to the relative path
-    """
-    match = f"{SEP_FILE}{rel_path}{SEP_LINENO}"
-    try:
-        temp = Path(tempfile.mktemp(suffix=".tmp"))
+@extractor(".xml")
+def _get_xml_ids(scanned):
+    module = scanned.module
+    tree = scanned.tree
+    if tree is None:
+        return
 
-        os.system(
-            (
-                f"cat '{plain_text_file}' | "
-                f"grep -v '{match}' > '{temp}'; "
-                f"cp '{temp}' '{plain_text_file}'"
+    def append_result(model, xmlid, line, res_model, name="", ttype="", inherit_id=""):
+
+        if "." not in xmlid:
+            xmlid = "%s.%s" % (module.name, xmlid)
+
+        # find res_models of view:
+        if model and xmlid and "." in xmlid:
+            scanned.append(
+                "xml_ids",
+                model=model,
+                id=xmlid,
+                line=line,
+                res_model=res_model,
+                name=name,
+                type=ttype,
+                inherit_id=inherit_id,
             )
-        )
-    finally:
-        if temp.exists():
-            temp.unlink()
 
+    # get all records
+    for r in tree.xpath("//record"):
+        if "id" in r.attrib and "model" in r.attrib:
+            id = r.attrib["id"]
+            model = r.attrib["model"]
 
-def update_cache(arg_modified_filename=None):
+            res_model = r.xpath("field[@name='model' or @name='res_model']")
+            if len(res_model) > 0:
+                res_model = res_model[0].text
+            else:
+                res_model = ""
+
+            if model == "ir.ui.menuitem":
+                name = r.xpath("field[@name='name']")[0].text
+                append_result(model, id, r.sourceline, "", name)
+            elif model == "ir.ui.view":
+                name = ""
+                inherit_id = ""
+                if r.xpath("field[@name='name']"):
+                    name = r.xpath("field[@name='name']")[0].text
+                if r.xpath("field[@name='inherit_id']"):
+                    if r.xpath("field[@name='inherit_id']/@ref"):
+                        inherit_id = r.xpath("field[@name='inherit_id']/@ref")[0]
+                        if "." not in inherit_id:
+                            inherit_id = f"{module}.{inherit_id}"
+                ttype = ""
+                if not inherit_id:
+                    if r.xpath("field[@name='arch']"):
+                        arch = etree.tostring(r.xpath("field[@name='arch']")[0]).decode(
+                            "utf-8"
+                        )
+                        lines = [x.strip() for x in arch.split("\n")]
+                        lines = [l for l in lines if l]
+                        lines = lines[:5]
+
+                        for line in lines:
+                            for _t in [
+                                "form",
+                                "tree",
+                                "calendar",
+                                "search",
+                                "kanban",
+                            ]:
+                                token = f"<{_t} "
+                                if token in line:
+                                    ttype = _t
+                append_result(
+                    model,
+                    id,
+                    r.sourceline,
+                    "",
+                    name,
+                    ttype=ttype,
+                    inherit_id=inherit_id,
+                )
+            else:
+                append_result(model, id, r.sourceline, res_model)
+
+    for r in tree.xpath("//menuitem"):
+        if "id" in r.attrib:
+            id = r.attrib["id"]
+            model = "ir.ui.menuitem"
+            # if there is no name, then name comes from
+            # associated action
+            name = r.attrib.get("name", id)
+            append_result(model, id, r.sourceline, "", name)
+
+    for r in tree.xpath("//report"):
+        if "id" in r.attrib:
+            id = r.attrib["id"]
+            model = "report"
+            append_result(model, id, r.sourceline, "")
+
+    for r in tree.xpath("//template"):
+        if "id" in r.attrib:
+            id = r.attrib["id"]
+            model = "ir.ui.view"
+            inherit_id = ""
+            if r.get("inherit_id"):
+                inherit_id = r.get("inherit_id")
+            append_result(model, id, r.sourceline, "qweb", inherit_id=inherit_id)
+
+
+def _get_entries(result, get_view_type=None):
     """
-    param: modified_filename - if given, then only this filename is parsed;
+    Turns the results of the extractors into entries of the SymbolDatabase.
     """
-    from . import module_tools
-    from .module_tools import Module, Modules
+    relpaths = {}
+
+    def _relpath(filepath):
+        if filepath not in relpaths:
+            relpaths[filepath] = translate_path_relative_to_customs_root(filepath)
+        return relpaths[filepath]
+
+    def entry(type, values, name, label, view_type=None):
+        return {
+            "type": type,
+            "module": values["module"],
+            "name": name,
+            "label": label,
+            "path": _relpath(values["filepath"]),
+            "line": values["line"],
+            "view_type": view_type,
+        }
+
+    for model in result.get("models", []):
+        yield entry("model", model, model["model"], model["model"])
+
+    for xmlid in sorted(result.get("xml_ids", []), key=lambda x: x["id"]):
+        if "." in xmlid["id"]:
+            name = xmlid["id"]
+        else:
+            name = f"{xmlid['module']}.{xmlid['id']}"
+        yield entry("xmlid", xmlid, name, name + " model:" + xmlid["model"])
 
-    if arg_modified_filename:
-        arg_modified_filename = Path(arg_modified_filename).resolve().absolute()
-    plainfile = plaintextfile()
-    if not plainfile.is_file():
-        arg_modified_filename = None
+    for method in result.get("methods", []):
+        name = "{model}.{method}".format(**method)
+        yield entry("def", method, name, name)
 
-    if arg_modified_filename:
-        try:
-            Module(arg_modified_filename)
-        except Module.IsNot:
-            return
+    for field in result.get("fields", []):
+        name = "{model}.{field}".format(**field)
+        yield entry("field", field, name, name)
+
+    for view in _get_views(result.get("xml_ids", []), get_view_type):
+        label = "{res_model} ~{type} {id} [inherit_id={inherit_id}]".format(**view)
+        yield entry("view", view, view["id"], label, view_type=view["type"])
 
-    global cache_models
-    global modified_filename
-    modified_filename = arg_modified_filename
+    for qwebtemplate in result.get("qweb", []):
+        label = "~{type} {id} [inherit_id={inherit_id}]".format(**qwebtemplate)
+        yield entry("qweb", qwebtemplate, qwebtemplate["id"], label)
+
+
+def _update_file(db, modified_filename):
+    from .module_tools import Module
 
     try:
-        rel_path = (
-            translate_path_relative_to_customs_root(modified_filename)
-            if modified_filename
-            else None
-        )
+        module = Module(modified_filename)
+    except Module.IsNot:
+        return
+
+    try:
+        rel_path = translate_path_relative_to_customs_root(modified_filename)
     except Exception:
         # suck errors - called from vim for all files
         return
 
-    if arg_modified_filename and plainfile.is_file():
-        _remove_entries(plainfile, rel_path)
+    files = []
+    if modified_filename.exists():
+        files = _get_module_file(module, modified_filename)
+    result = scan_module(module, files=files)
+    db.delete_file(rel_path)
+    db.insert(_get_entries(result, db.get_view_type))
 
-    cache_models = {}
-    qwebtemplates = _get_qweb_templates()
-    xml_ids = _get_xml_ids()
-    models = _get_models()
-    methods = _get_methods()
-    fields = _get_fields()
-    views = _get_views()
 
-    if os.path.isfile(plainfile) and arg_modified_filename:
-        f = open(plainfile, "a")
-    else:
-        if os.path.isdir(os.path.dirname(plainfile)):
-            f = open(plainfile, "w")
+def _update_all(db):
+    from .module_tools import Modules
+
+    result = scan_modules(Modules().modules.values())
+    db.clear()
+    db.insert(_get_entries(result))
+
+
+def update_files(filenames):
+    """
+    Parses the given files again; if there is no cache yet, then
+    everything is parsed.
+    """
+    plainfile = plaintextfile()
+    if not os.path.isdir(os.path.dirname(plainfile)):
+        return
+
+    with SymbolDatabase() as db:
+        if db.is_empty or not filenames:
+            _update_all(db)
         else:
-            return
+            for filename in filenames:
+                _update_file(db, Path(filename).resolve().absolute())
 
-    try:
-        TEMPLATE = (
-            "{type}\t[{module}]\t{name}\t"
-            + SEP_FILE
-            + "{filepath}"
-            + SEP_LINENO
-            + "{line}"
-        )
-        for model in models:
-            f.write(
-                TEMPLATE.format(
-                    type="model",
-                    module=model["module"],
-                    name=model["model"],
-                    filepath=translate_path_relative_to_customs_root(model["filepath"]),
-                    line=model["line"],
-                )
-            )
-            f.write("\n")
-        for xmlid in xml_ids:
-            if "." in xmlid["id"]:
-                name = xmlid["id"]
-            else:
-                name = f"{xmlid['module']}.{xmlid['id']}"
-            name += " model:" + xmlid["model"]
-            f.write(
-                TEMPLATE.format(
-                    type="xmlid",
-                    module=xmlid["module"],
-                    name=name,
-                    filepath=translate_path_relative_to_customs_root(xmlid["filepath"]),
-                    line=xmlid["line"],
-                )
-            )
-            f.write("\n")
-        for method in methods:
-            name = "{model}.{method}".format(**method)
-            f.write(
-                TEMPLATE.format(
-                    type="def",
-                    module=method["module"],
-                    name=name,
-                    filepath=translate_path_relative_to_customs_root(
-                        method["filepath"]
-                    ),
-                    line=method["line"],
-                )
-            )
-            f.write("\n")
-        for field in fields:
-            name = "{model}.{field}".format(**field)
-            line = TEMPLATE.format(
-                type="field",
-                module=field["module"],
-                name=name,
-                filepath=translate_path_relative_to_customs_root(field["filepath"]),
-                line=field["line"],
-            )
-            f.write(line + "\n")
-        for view in views:
-            name = "{res_model} ~{type} {id} [inherit_id={inherit_id}]".format(**view)
-            f.write(
-                TEMPLATE.format(
-                    type="view",
-                    module=view["module"],
-                    name=name,
-                    filepath=translate_path_relative_to_customs_root(view["filepath"]),
-                    line=view["line"],
-                )
-            )
-            f.write("\n")
-        for qwebtemplate in qwebtemplates:
-            name = "~{type} {id} [inherit_id={inherit_id}]".format(**qwebtemplate)
-            f.write(
-                TEMPLATE.format(
-                    type="qweb",
-                    module=qwebtemplate["module"],
-                    name=name,
-                    filepath=translate_path_relative_to_customs_root(
-                        qwebtemplate["filepath"]
-                    ),
-                    line=qwebtemplate["line"],
-                )
-            )
-            f.write("\n")
-    finally:
-        f.close()
+        db.export_plaintext(plainfile)
 
     return plainfile
 
 
+def remove_directory(path):
+    """
+    Removes the entries of all files below the path.
+    """
+    rel_path = translate_path_relative_to_customs_root(Path(path).absolute())
+    with SymbolDatabase() as db:
+        db.delete_files_below(rel_path)
+        db.export_plaintext(plaintextfile())
+
+
+def update_cache(arg_modified_filename=None):
+    """
+    param: modified_filename - if given, then only this filename is parsed;
+    """
+    return update_files([arg_modified_filename] if arg_modified_filename else [])
+
+
 def goto_inherited_view(filepath, line, current_buffer):
     line -= 1  # line ist einsbasiert
     sline = current_buffer[line]
@@ -0,0 +1,308 @@
+"""
+Long running process, that keeps the symbol database of odoo_parser
+up to date by listening to inotify events on all addons paths.
+
+Editors talk to it over a unix socket; every request and every answer
+is one line of json:
+
+    {"cmd": "update", "path": "/abs/path/to/file.py"}
+    {"cmd": "view", "name": "module.xmlid"}
+    {"cmd": "qweb", "name": "module.template"}
+    {"cmd": "goto-inherited", "filepath": "...", "lineno": 12}
+    {"cmd": "ping"}
+
+Save hooks of editors use the plain client odoo_ast_client.py, that
+does not start the odoo command. Files are parsed again only if their
+mtime changed since the last parse, so the update of the save hook and
+the inotify event of the same save parse the file once.
+"""
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+import click
+from .odoo_config import customs_dir
+from . import odoo_ast_client
+
+SUFFIXES = [".py", ".xml"]
+DEBOUNCE = 0.3
+# e.g. while the watcher parses everything again; then the editor
+# commands do the work themselves
+QUERY_TIMEOUT = 2
+
+
+def socket_path():
+    return customs_dir() / odoo_ast_client.SOCKET_NAME
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+class Inotify(object):
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_Q_OVERFLOW = 0x4000
+    IN_IGNORED = 0x8000
+    IN_ISDIR = 0x40000000
+
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    EVENT = struct.Struct("iIII")
+
+    def __init__(self):
+        if not sys.platform.startswith("linux"):
+            raise Exception("inotify is only available on linux")
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            self._raise()
+        self.watches = {}
+
+    def _raise(self, path=None):
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno), str(path or ""))
+
+    def add_watch(self, path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(str(path)), self.MASK)
+        if wd < 0:
+            self._raise(path)
+        self.watches[wd] = Path(path)
+
+    def read(self, timeout):
+        """
+        Returns list of (path, mask) of the events.
+        """
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        result = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            name = data[offset : offset + length].rstrip(b"\0").decode()
+            offset += length
+            if mask & self.IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            if wd not in self.watches:
+                continue
+            result.append((self.watches[wd] / name, mask))
+        return result
+
+    def close(self):
+        os.close(self.fd)
+
+
+class AstWatcher(object):
+    def __init__(self, addons_paths):
+        self.addons_paths = addons_paths
+        self.inotify = Inotify()
+        self.lock = threading.Lock()
+        self.pending = set()
+        self.removed_dirs = set()
+        # path: mtime of the file when it was parsed last
+        self.parsed = {}
+
+    def watch_tree(self, path):
+        """
+        Watches all directories below path; returns the files in it.
+        """
+        files = []
+        for root, dirs, _files in os.walk(path):
+            dirs[:] = [x for x in dirs if x != ".git"]
+            try:
+                self.inotify.add_watch(root)
+            except OSError as ex:
+                if ex.errno == 28:
+                    click.secho(
+                        (
+                            "Limit of inotify watches reached; please increase "
+                            "fs.inotify.max_user_watches"
+                        ),
+                        fg="red",
+                    )
+                raise
+            files += [Path(root) / x for x in _files]
+        return files
+
+    def _on_event(self, path, mask):
+        if mask & Inotify.IN_Q_OVERFLOW:
+            # lost events; parse everything again
+            self.pending.add(None)
+        elif mask & Inotify.IN_ISDIR:
+            if mask & (Inotify.IN_CREATE | Inotify.IN_MOVED_TO):
+                self.pending |= set(self.watch_tree(path))
+            elif mask & (Inotify.IN_DELETE | Inotify.IN_MOVED_FROM):
+                self.removed_dirs.add(path)
+        elif path.suffix in SUFFIXES and not path.name.startswith("."):
+            if mask & (Inotify.IN_CLOSE_WRITE | Inotify.IN_MOVED_TO):
+                self.pending.add(path)
+            elif mask & (Inotify.IN_DELETE | Inotify.IN_MOVED_FROM):
+                self.pending.add(path)
+
+    def update(self, paths):
+        """
+        Parses the files changed since their last parse; returns them.
+        Must be called with the lock held.
+        """
+        from .odoo_parser import update_files
+
+        changed = []
+        for path in paths:
+            mtime = _mtime(path)
+            if str(path) in self.parsed and self.parsed[str(path)] == mtime:
+                continue
+            self.parsed[str(path)] = mtime
+            changed.append(path)
+        if changed:
+            update_files(changed)
+        return changed
+
+    def _process(self):
+        from .odoo_parser import update_files, remove_directory
+
+        pending, self.pending = self.pending, set()
+        removed_dirs, self.removed_dirs = self.removed_dirs, set()
+        with self.lock:
+            for path in removed_dirs:
+                remove_directory(path)
+            if None in pending:
+                click.secho("Parsing everything again", fg="yellow")
+                self.parsed.clear()
+                update_files([])
+            elif pending:
+                pending = self.update(sorted(pending))
+        if pending:
+            click.secho(f"Updated {len(pending)} file(s)", fg="green")
+
+    def run(self):
+        from .odoo_parser import update_files
+
+        for path in self.addons_paths:
+            if path.exists():
+                self.watch_tree(path)
+        click.secho(f"Watching {len(self.inotify.watches)} directories", fg="green")
+        with self.lock:
+            update_files([])
+
+        server = WatchServer(str(socket_path()), WatchRequestHandler)
+        server.watcher = self
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        click.secho(f"Listening on {socket_path()}", fg="green")
+        click.secho(f"Client for editors: {sys.executable} {odoo_ast_client.__file__}")
+
+        last_event = None
+        try:
+            while True:
+                events = self.inotify.read(DEBOUNCE)
+                for path, mask in events:
+                    self._on_event(path, mask)
+                if events:
+                    last_event = time.time()
+                elif last_event and time.time() - last_event >= DEBOUNCE:
+                    last_event = None
+                    self._process()
+        finally:
+            server.shutdown()
+            server.server_close()
+            socket_path().unlink()
+            self.inotify.close()
+
+
+class WatchServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class WatchRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                answer = self.answer(json.loads(line))
+            except Exception as ex:
+                answer = {"error": str(ex)}
+            try:
+                self.wfile.write(json.dumps(answer).encode("utf8") + b"\n")
+            except BrokenPipeError:
+                # the client gave up waiting
+                return
+
+    def answer(self, request):
+        from .odoo_parser import get_view, get_qweb_template
+        from .odoo_parser import goto_inherited_view
+
+        watcher = self.server.watcher
+        cmd = request["cmd"]
+        if cmd == "ping":
+            return {"result": "pong"}
+        elif cmd == "update":
+            with watcher.lock:
+                watcher.update([request["path"]])
+            return {"result": "ok"}
+        elif cmd in ["view", "qweb"]:
+            method = get_view if cmd == "view" else get_qweb_template
+            filepath, lineno = method(request["name"])
+        elif cmd == "goto-inherited":
+            filepath = customs_dir() / request["filepath"]
+            lines = filepath.read_text().split("\n")
+            filepath, lineno = goto_inherited_view(
+                filepath, int(request["lineno"]), lines
+            )
+        else:
+            raise Exception(f"Unknown command: {cmd}")
+        return {"filepath": filepath and str(filepath), "lineno": lineno}
+
+
+def query(request, path=None, timeout=QUERY_TIMEOUT):
+    """
+    Sends the request to a running watcher; returns None if there is
+    no watcher or it does not answer in time.
+    """
+    try:
+        answer = odoo_ast_client.send(path or socket_path(), request, timeout)
+    except socket.timeout:
+        click.secho("No answer of the watcher in time.", fg="yellow")
+        return None
+    if not answer:
+        return None
+    if "error" in answer:
+        raise Exception(answer["error"])
+    return answer
+
+
+def watch():
+    from .odoo_config import get_odoo_addons_paths
+    from .tools import abort
+
+    if not sys.platform.startswith("linux"):
+        abort("odoo src watch needs inotify and runs on linux only.")
+
+    path = socket_path()
+    if path.exists():
+        if query({"cmd": "ping"}):
+            raise Exception(f"Already running: {path}")
+        # left over from a killed watcher
+        path.unlink()
+
+    # store paths relative to the customs like update-ast does
+    os.chdir(customs_dir())
+    AstWatcher(get_odoo_addons_paths()).run()
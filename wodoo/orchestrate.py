@@ -0,0 +1,156 @@
+"""
+Container actions as a plan of steps: every step starts, as soon as the
+steps it comes after are done, so independent containers are stopped and
+started at the same time.
+
+Containers are stopped and restarted with the docker sdk. Bringing a
+service up is left to 'docker-compose up -d', which recreates containers
+whose configuration or image changed and only starts the others.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from functools import partial
+import click
+from .tools import __dc as dc
+from .tools import _wait_postgres
+from .tools import get_services
+
+
+class Step(object):
+    def __init__(self, name, func, after):
+        self.name = name
+        self.func = func
+        self.after = after
+
+
+class Plan(object):
+    def __init__(self, workers=8):
+        self.workers = workers
+        self.steps = {}
+
+    def add(self, name, func, after=()):
+        for x in after:
+            if x not in self.steps:
+                raise Exception(f"Unknown step: {x}")
+        self.steps[name] = Step(name, func, list(after))
+        return name
+
+    def _run_step(self, step):
+        started = time.time()
+        step.func()
+        click.secho(f"{step.name} ({time.time() - started:.1f}s)", fg="green")
+
+    def run(self):
+        """
+        Raises the first error; steps already running are finished, no
+        further steps are started.
+        """
+        pending = dict(self.steps)
+        done = set()
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while pending or running:
+                for name, step in list(pending.items()):
+                    if all(x in done for x in step.after):
+                        running[pool.submit(self._run_step, step)] = name
+                        del pending[name]
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    future.result()
+                    done.add(name)
+
+
+class Containers(object):
+    """
+    The containers of the project by service name; container_name is set
+    to <project>_<service> when composing.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self._local = threading.local()
+        self.safe_kill = (config.safe_kill or "").split(",")
+
+    @property
+    def client(self):
+        # one client per thread
+        if not hasattr(self._local, "client"):
+            import docker
+
+            self._local.client = docker.from_env()
+        return self._local.client
+
+    def get(self, service):
+        import docker
+
+        try:
+            return self.client.containers.get(f"{self.config.project_name}_{service}")
+        except docker.errors.NotFound:
+            return None
+
+    def stop(self, service):
+        """
+        Like kill: postgres, redis and other safe kill services get time
+        to persist their data.
+        """
+        container = self.get(service)
+        if not container or container.status != "running":
+            return
+        if self.config.devmode:
+            container.kill()
+        else:
+            container.stop(timeout=20 if service in self.safe_kill else 2)
+
+    def up(self, service):
+        # other services may come up at the same time; they bring their
+        # dependencies up themselves
+        dc(self.config, ["up", "-d", "--no-deps", service])
+
+    def restart(self, service):
+        """
+        Like docker-compose restart the container is not recreated; the
+        final up of all services does that.
+        """
+        container = self.get(service)
+        if not container:
+            self.up(service)
+            return
+        self.stop(service)
+        container.start()
+
+
+def stop_odoo_and_start_databases(config):
+    """
+    Before updating: stops the odoo services while redis and postgres
+    are started.
+    """
+    containers = Containers(config)
+    plan = Plan()
+    for service in get_services(config, "odoo_base"):
+        plan.add(f"stop {service}", partial(containers.stop, service))
+    if config.run_redis:
+        plan.add("up redis", partial(containers.up, "redis"))
+    if config.run_postgres:
+        plan.add("up postgres", partial(containers.up, "postgres"))
+        plan.add(
+            "postgres ready", partial(_wait_postgres, config), after=["up postgres"]
+        )
+    plan.run()
+
+
+def restart_odoo(config):
+    """
+    After updating: restarts odoo, cronjobs and queuejobs together.
+    """
+    containers = Containers(config)
+    plan = Plan()
+    services = ["odoo"]
+    if config.run_odoocronjobs:
+        services += ["odoo_cronjobs"]
+    if config.run_queuejobs:
+        services += ["odoo_queuejobs"]
+    for service in services:
+        plan.add(f"restart {service}", partial(containers.restart, service))
+    plan.run()
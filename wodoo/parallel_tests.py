@@ -0,0 +1,144 @@
+"""
+Runs test files in parallel: every worker gets its own copy of the
+prepared database and a share of the files, balanced by the durations of
+former runs.
+"""
+import json
+import statistics
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from xml.etree import ElementTree
+import click
+from .restore_tools import distribute
+
+
+class DurationHistory(object):
+    """
+    Seconds per test (file) of former runs; new tests are assumed to take
+    the median.
+    """
+
+    DEFAULT = 60.0
+    SMOOTHING = 0.7  # weight of the last run
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.durations = {}
+        if self.path.exists():
+            try:
+                self.durations = json.loads(self.path.read_text())
+            except ValueError:
+                pass
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        if key in self.durations:
+            return self.durations[key]
+        if self.durations:
+            return statistics.median(self.durations.values())
+        return self.DEFAULT
+
+    def record(self, key, seconds):
+        with self.lock:
+            if key in self.durations:
+                seconds = (
+                    self.SMOOTHING * seconds
+                    + (1 - self.SMOOTHING) * self.durations[key]
+                )
+            self.durations[key] = round(seconds, 2)
+
+    def save(self):
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+        self.path.write_text(json.dumps(self.durations, indent=4, sort_keys=True))
+
+
+def shard(keys, workers, history):
+    return distribute(keys, workers, size=history.get)
+
+
+class Result(object):
+    def __init__(self, name, ok, seconds, output="", worker=None):
+        self.name = name
+        self.ok = ok
+        self.seconds = seconds
+        self.output = output
+        self.worker = worker
+
+
+def run_sharded(keys, workers, history, run):
+    """
+    run(key, worker) -> (ok, output) is called for every key; the keys of
+    a worker run one after another. Returns the results in order of keys.
+    """
+    buckets = shard(keys, workers, history)
+    lock = threading.Lock()
+    results = {}
+
+    def run_bucket(worker, bucket):
+        for key in bucket:
+            started = time.time()
+            ok, output = run(key, worker)
+            result = Result(key, ok, time.time() - started, output, worker)
+            history.record(key, result.seconds)
+            with lock:
+                results[key] = result
+                click.secho(
+                    (
+                        f"[{len(results)}/{len(keys)}] "
+                        f"{'OK' if ok else 'FAILED'} {key} "
+                        f"({result.seconds:.0f}s, worker {worker})"
+                    ),
+                    fg="green" if ok else "red",
+                )
+
+    click.secho(
+        "Distribution: "
+        + ", ".join(
+            f"{len(x)} tests ~{sum(map(history.get, x)):.0f}s" for x in buckets
+        ),
+        fg="yellow",
+    )
+    with ThreadPoolExecutor(max_workers=len(buckets) or 1) as pool:
+        for future in [
+            pool.submit(run_bucket, i, bucket) for i, bucket in enumerate(buckets)
+        ]:
+            future.result()
+    history.save()
+    return [results[x] for x in keys]
+
+
+def run_captured(popen, input=None):
+    """
+    Runs the process started by popen(stdout=..., stderr=...) and returns
+    (ok, output).
+    """
+    proc = popen(
+        stdin=subprocess.PIPE if input is not None else None,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+    )
+    output = proc.communicate(input)[0].decode("utf8", errors="replace")
+    return proc.returncode == 0, output
+
+
+def write_junit_report(path, results, name="tests"):
+    suite = ElementTree.Element(
+        "testsuite",
+        name=name,
+        tests=str(len(results)),
+        failures=str(len([x for x in results if not x.ok])),
+        time=f"{sum(x.seconds for x in results):.2f}",
+    )
+    for result in results:
+        case = ElementTree.SubElement(
+            suite, "testcase", name=str(result.name), time=f"{result.seconds:.2f}"
+        )
+        if not result.ok:
+            failure = ElementTree.SubElement(case, "failure", message="failed")
+            failure.text = result.output
+        elif result.output:
+            ElementTree.SubElement(case, "system-out").text = result.output
+    ElementTree.ElementTree(suite).write(path, encoding="utf-8", xml_declaration=True)
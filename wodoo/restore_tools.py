@@ -0,0 +1,331 @@
+"""
+Parallel restore of pg_dump custom format archives.
+
+The table of contents of the archive is read up front to know the size
+of every table; the tables are spread largest first over the workers,
+indexes and constraints are created afterwards in one parallel run.
+"""
+import heapq
+import subprocess
+import threading
+import time
+from pathlib import Path
+import click
+
+MAGIC = b"PGDMP"
+
+SECTION_DATA = 3
+
+OFFSET_POS_SET = 2
+
+BLK_DATA = 1
+BLK_BLOBS = 3
+
+
+class TocEntry(object):
+    def __init__(self, dump_id, desc, section, namespace, tag, offset):
+        self.dump_id = dump_id
+        self.desc = desc
+        self.section = section
+        self.namespace = namespace
+        self.tag = tag
+        self.offset = offset
+        self.size = 0
+
+    @property
+    def name(self):
+        return f"{self.namespace}.{self.tag}" if self.namespace else self.tag
+
+    @property
+    def listline(self):
+        return f"{self.dump_id}; {self.desc} {self.name}"
+
+
+class TocReader(object):
+    """
+    Reads the header and table of contents like pg_backup_archiver.c
+    ReadHead and ReadToc do.
+    """
+
+    def __init__(self, file):
+        self.file = file
+
+    def _read(self, count):
+        data = self.file.read(count)
+        if len(data) != count:
+            raise Exception("Unexpected end of dump file")
+        return data
+
+    def _byte(self):
+        return self._read(1)[0]
+
+    def _int(self):
+        sign = self._byte()
+        value = int.from_bytes(self._read(self.intsize), "little")
+        return -value if sign else value
+
+    def _str(self):
+        length = self._int()
+        if length < 0:
+            return None
+        return self._read(length).decode("utf8", errors="replace")
+
+    def _offset(self):
+        flag = self._byte()
+        value = int.from_bytes(self._read(self.offsize), "little")
+        return value if flag == OFFSET_POS_SET else None
+
+    def read(self):
+        if self._read(5) != MAGIC:
+            raise Exception("Not a custom format dump")
+        self.version = (self._byte(), self._byte())
+        self._byte()  # revision
+        if self.version < (1, 7):
+            raise Exception(f"Dump version too old: {self.version}")
+        self.intsize = self._byte()
+        self.offsize = self._byte()
+        if self._byte() != 1:
+            raise Exception("Not a custom format dump")
+        if self.version >= (1, 15):
+            self._byte()  # compression algorithm
+        else:
+            self._int()  # compression level
+        for i in range(7):
+            self._int()  # timestamp
+        self._str()  # database name
+        if self.version >= (1, 10):
+            self._str()  # server version
+            self._str()  # pg_dump version
+
+        return [self._read_entry() for i in range(self._int())]
+
+    def _read_entry(self):
+        version = self.version
+        dump_id = self._int()
+        self._int()  # has data dumper
+        self._str()  # table oid
+        self._str()  # oid
+        tag = self._str()
+        desc = self._str()
+        section = self._int() if version >= (1, 11) else None
+        self._str()  # definition
+        self._str()  # drop statement
+        self._str()  # copy statement
+        namespace = self._str()
+        if version >= (1, 10):
+            self._str()  # tablespace
+        if version >= (1, 14):
+            self._str()  # table access method
+        if version >= (1, 16):
+            self._int()  # relkind
+        self._str()  # owner
+        if version >= (1, 9):
+            self._str()  # with oids
+        while self._str() is not None:
+            pass  # dependencies
+        offset = self._offset()
+        return TocEntry(dump_id, desc, section, namespace, tag, offset)
+
+    def _skip_chunks(self):
+        while True:
+            length = self._int()
+            if not length:
+                return
+            self.file.seek(length, 1)
+
+    def scan_blocks(self):
+        """
+        Dumps written to a pipe have no offsets in the toc; walks the data
+        blocks following the toc like pg_restore does on a pipe and
+        returns {dump id: offset}.
+        """
+        offsets = {}
+        while True:
+            offset = self.file.tell()
+            block = self.file.read(1)
+            if not block:
+                return offsets
+            dump_id = self._int()
+            if block[0] == BLK_DATA:
+                self._skip_chunks()
+            elif block[0] == BLK_BLOBS:
+                while self._int():  # oid of the large object
+                    self._skip_chunks()
+            else:
+                raise Exception(f"Unknown block type {block[0]} at {offset}")
+            offsets[dump_id] = offset
+
+
+def is_custom_dump(path):
+    with open(path, "rb") as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def read_toc(path):
+    """
+    Returns the toc entries; the size of the entries with data is the
+    distance to the next data block in the archive.
+
+    Without offsets in the toc (written to a pipe) the data blocks are
+    walked; if that fails the data entries share the file size equally,
+    so they are at least spread evenly by count.
+    """
+    path = Path(path)
+    with open(path, "rb") as file:
+        reader = TocReader(file)
+        entries = reader.read()
+        if not any(x.offset is not None for x in entries):
+            try:
+                offsets = reader.scan_blocks()
+            except Exception as ex:
+                click.secho(f"Could not read the data blocks: {ex}", fg="yellow")
+                data = [x for x in entries if x.section == SECTION_DATA]
+                for entry in data:
+                    entry.size = path.stat().st_size // len(data)
+                return entries
+            for entry in entries:
+                entry.offset = offsets.get(entry.dump_id)
+
+    with_data = sorted(
+        (x for x in entries if x.offset is not None), key=lambda x: x.offset
+    )
+    ends = [x.offset for x in with_data[1:]] + [path.stat().st_size]
+    for entry, end in zip(with_data, ends):
+        entry.size = end - entry.offset
+    return entries
+
+
+def distribute(entries, workers, size=lambda x: x.size):
+    """
+    Longest processing time first: the next biggest entry goes to the
+    worker with the least work.
+    """
+    buckets = [(0, i, []) for i in range(workers)]
+    for entry in sorted(entries, key=lambda x: -size(x)):
+        total, i, bucket = heapq.heappop(buckets)
+        bucket.append(entry)
+        heapq.heappush(buckets, (total + size(entry), i, bucket))
+    return [x[2] for x in sorted(buckets, key=lambda x: x[1]) if x[2]]
+
+
+class Progress(object):
+    def __init__(self, entries):
+        self.total = sum(x.size for x in entries) or 1
+        self.done = 0
+        self.started = time.time()
+        self.lock = threading.Lock()
+
+    def finished(self, entry, seconds):
+        with self.lock:
+            self.done += entry.size
+            elapsed = time.time() - self.started
+            percent = self.done * 100 / self.total
+            eta = elapsed * (self.total - self.done) / max(self.done, 1)
+            speed = entry.size / 1024 / 1024 / max(seconds, 0.001)
+            click.secho(
+                (
+                    f"[{percent:3.0f}%] {entry.name}: "
+                    f"{entry.size / 1024 / 1024:.1f} MB in {seconds:.0f}s "
+                    f"({speed:.1f} MB/s) - ETA {eta / 60:.0f} min"
+                ),
+                fg="green",
+            )
+
+
+class ParallelRestore(object):
+    """
+    pg_restore: callable(args, **popen_kwargs) that starts pg_restore
+    against the target database and the dump file.
+    """
+
+    def __init__(
+        self,
+        path,
+        pg_restore,
+        workers,
+        exclude_tables=None,
+        ignore_errors=False,
+        verbose=False,
+    ):
+        self.path = path
+        self.pg_restore = pg_restore
+        self.workers = max(workers, 1)
+        self.exclude_tables = exclude_tables or []
+        self.ignore_errors = ignore_errors
+        self.verbose = verbose
+
+    def _args(self, *args):
+        args = ["--no-owner"] + list(args)
+        if not self.ignore_errors:
+            args += ["--exit-on-error"]
+        return args
+
+    def _wait(self, proc):
+        if proc.wait() and not self.ignore_errors:
+            raise Exception(f"pg_restore failed with exit code {proc.returncode}")
+
+    def run(self):
+        entries = read_toc(self.path)
+        data = [
+            x
+            for x in entries
+            if x.section == SECTION_DATA
+            and not (x.desc == "TABLE DATA" and x.tag in self.exclude_tables)
+        ]
+
+        click.secho("Restoring schema", fg="yellow")
+        self._wait(self.pg_restore(self._args("--section=pre-data")))
+
+        buckets = distribute(data, self.workers)
+        click.secho(
+            (
+                f"Restoring {len(data)} data entries "
+                f"({sum(x.size for x in data) / 1024 / 1024:.0f} MB) "
+                f"with {len(buckets)} workers"
+            ),
+            fg="yellow",
+        )
+        progress = Progress(data)
+        errors = []
+        threads = [
+            threading.Thread(target=self._restore_data, args=(x, progress, errors))
+            for x in buckets
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+
+        click.secho("Creating indexes and constraints", fg="yellow")
+        self._wait(
+            self.pg_restore(self._args("--section=post-data", "-j", str(self.workers)))
+        )
+
+    def _restore_data(self, entries, progress, errors):
+        by_name = {x.name: x for x in entries}
+        try:
+            proc = self.pg_restore(
+                self._args("--verbose", "-L", "/dev/stdin"),
+                stdin=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+            proc.stdin.write("".join(x.listline + "\n" for x in entries).encode())
+            proc.stdin.close()
+
+            current, started = None, None
+            for line in proc.stderr:
+                line = line.decode("utf8", errors="replace").rstrip()
+                if "processing data for table" in line:
+                    if current:
+                        progress.finished(current, time.time() - started)
+                    name = line.split('"')[1]
+                    current, started = by_name.get(name), time.time()
+                elif self.verbose or "error" in line:
+                    click.secho(line, fg="red" if "error" in line else None)
+            self._wait(proc)
+            if current:
+                progress.finished(current, time.time() - started)
+        except Exception as ex:
+            errors.append(ex)
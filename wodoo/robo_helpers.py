@@ -64,20 +64,132 @@ def _normalize_robot_line(line):
     return line
 
 
+# no robot tests in there, but tens of thousands of directories
+ROBOT_PRUNE = [".git", "node_modules", "__pycache__"]
+ROBOT_PRUNE_PATHS = ["odoo", "enterprise"]
+
+
+class RobotIndex(object):
+    """
+    The robot files below root with their resources and odoo-require
+    modules. The tree is only walked again, if one of its directories
+    changed and a file only parsed again, if its mtime changed.
+
+    The odoo and enterprise trees are not searched; like the former
+    Path.glob("**/*.robot") symlinked directories are not followed.
+    """
+
+    def __init__(self, root=None, cache=None):
+        from .compose_cache import StageCache, fingerprint
+        from .odoo_config import customs_dir
+
+        self.root = Path(root or customs_dir()).absolute()
+        self.cache = cache or StageCache.for_project(
+            fingerprint(str(self.root)), kind="robot"
+        )
+        self.files = self.cache.tree(
+            "robot files",
+            self.root,
+            lambda x: x.endswith(".robot"),
+            prune=ROBOT_PRUNE,
+            prune_paths=ROBOT_PRUNE_PATHS,
+        )
+        self.parsed = {}
+        self._dependants = None
+        for path in self.files:
+            self._parse(path)
+        self.cache.forget_files(self.parsed)
+        self.cache.save()
+
+    @staticmethod
+    def _read(path):
+        content = path.read_text()
+        return (
+            list(_get_required_odoo_modules_from_robot_file(content)),
+            [x.resolve() for x in _get_resources_of_robot_file(path.parent, content)],
+        )
+
+    def _parse(self, path):
+        if path in self.parsed:
+            return
+        self.parsed[path] = self.cache.file(path, self._read)
+        for resource in self.parsed[path][1]:
+            if resource.exists():
+                self._parse(resource)
+
+    def tests(self):
+        def is_test(path):
+            parts = path.relative_to(self.root).parts
+            return "keywords" not in parts and "library" not in parts
+
+        return sorted(x.relative_to(self.root) for x in self.files if is_test(x))
+
+    def resources(self, path):
+        """
+        The resources the file includes directly or indirectly.
+        """
+        path = self.root / path
+        self._parse(path)
+        result, todo = [], [path]
+        while todo:
+            for resource in self.parsed[todo.pop()][1]:
+                if not resource.exists():
+                    abort(f"Could not find file {resource}")
+                if resource not in result:
+                    result.append(resource)
+                    todo.append(resource)
+        return result
+
+    def requires(self, path):
+        """
+        The odoo modules required by the file and its resources.
+        """
+        path = self.root / path
+        self._parse(path)
+        result = list(self.parsed[path][0])
+        for resource in self.resources(path):
+            result += self.parsed[resource][0]
+        return result
+
+    def dependants(self, resource):
+        """
+        The tests including the resource directly or indirectly.
+        """
+        if self._dependants is None:
+            self._dependants = {}
+            for test in self.tests():
+                for x in self.resources(test):
+                    self._dependants.setdefault(x, []).append(test)
+        return self._dependants.get((self.root / resource).resolve(), [])
+
+
 def _get_all_robottest_files(path=None):
-    from .odoo_config import customs_dir
+    return RobotIndex(path).tests()
 
-    testfiles = []
-    path = path or customs_dir()
-    for _file in path.glob("**/*.robot"):
-        if "keywords" in _file.parts:
-            continue
-        if "library" in _file.parts:
-            continue
 
-        testfiles.append(_file.relative_to(path))
-        del _file
-    return testfiles
+def _get_affected_robottest_files(modules, changed_files=(), path=None):
+    """
+    The robot test files, which require one of the modules (odoo-require
+    also of the included resources) or which or whose resources changed.
+    """
+    index = RobotIndex(path)
+    modules = set(modules)
+    changed_files = set(map(str, changed_files))
+    result = set()
+    for filename in index.tests():
+        if str(filename) in changed_files or set(index.requires(filename)) & modules:
+            result.add(filename)
+    for filename in changed_files:
+        if filename.endswith(".robot"):
+            result |= set(index.dependants(filename))
+    return sorted(result)
+
+
+def _get_resources_of_robot_file(root_dir, filecontent):
+    for line in filecontent.splitlines():
+        line = _normalize_robot_line(line)
+        if line.startswith("Resource") and line.endswith(".robot"):
+            yield root_dir / line.split("  ")[1]
 
 
 def collect_all(root_dir, robo_file_content):
@@ -90,15 +202,11 @@ def collect_all(root_dir, robo_file_content):
     """
     yield from _get_required_odoo_modules_from_robot_file(robo_file_content)
     try:
-        for line in robo_file_content.splitlines():
-            line = _normalize_robot_line(line)
-            if line.startswith("Resource") and line.endswith(".robot"):
-                filepath = line.split("  ")[1]
-                filepath = root_dir / filepath
-                if not filepath.exists():
-                    abort((f"Could not find file {filepath}"))
-                content = filepath.read_text()
-                yield from collect_all(filepath.resolve().parent, content)
+        for filepath in _get_resources_of_robot_file(root_dir, robo_file_content):
+            if not filepath.exists():
+                abort((f"Could not find file {filepath}"))
+            content = filepath.read_text()
+            yield from collect_all(filepath.resolve().parent, content)
 
     except Exception as ex:  # pylint: disable=broad-except
         abort(str(ex))
@@ -131,18 +239,112 @@ def get_odoo_modules(verbose, test_files, root_dir):
     Returns:
         bytes: the archive in bytes format
     """
-    test_files = [x.absolute() for x in test_files]
-
+    index = RobotIndex(root_dir)
     for file in test_files:
-        file_content = file.read_text()
-        yield from collect_all(file.parent, file_content)
+        yield from index.requires(Path(file).absolute())
+
+
+def _run_robot_shards(
+    config, filenames, shards, token, params, output_path, results_file
+):
+    """
+    Every test file runs in its own robot container, the files are
+    distributed on the shards longest first by the durations of former
+    runs. The results are merged into results_file.
+
+    Returns the tokens of the runs.
+    """
+    from functools import partial
+    from .parallel_tests import DurationHistory, run_sharded, run_captured
+    from .tools import __dc_popen
+
+    history = DurationHistory(config.files["robot_durations"])
+    tokens = {str(x): f"{token}_{i}" for i, x in enumerate(filenames)}
+
+    def _results_json(filename):
+        return output_path / f"{tokens[filename]}.json"
+
+    def run(filename, worker):
+        data = json.dumps(
+            {
+                "test_files": [filename],
+                "token": tokens[filename],
+                "results_file": _results_json(filename).name,
+                "params": params,
+            }
+        )
+        ok, output = run_captured(
+            partial(__dc_popen, config, ["run", "-T", "--rm", "robot"]),
+            input=base64.b64encode(data.encode("utf-8")),
+        )
+        if not _results_json(filename).exists():
+            return False, output
+        results = json.loads(_results_json(filename).read_text())
+        return ok and all(x.get("all_ok") for x in results), output
+
+    merged = []
+    for result in run_sharded(list(tokens), shards, history, run):
+        results_json = _results_json(result.name)
+        if not results_json.exists():
+            click.secho(result.output, fg="red")
+            merged.append(
+                {
+                    "name": result.name,
+                    "all_ok": False,
+                    "count": 0,
+                    "avg_duration": result.seconds,
+                }
+            )
+            continue
+        for line in json.loads(results_json.read_text()):
+            line["token"] = tokens[result.name]
+            merged.append(line)
+        results_json.unlink()
+    (output_path / (results_file or "results.json")).write_text(
+        json.dumps(merged, indent=4)
+    )
+    return list(tokens.values())
+
+
+def _record_robot_durations(config, test_files, test_results, parallel=1):
+    """
+    Keeps the durations of the test files of a run in one container for
+    balancing the shards of later runs; a file runs count times, parallel
+    at once.
+    """
+    from .parallel_tests import DurationHistory
+
+    history = DurationHistory(config.files["robot_durations"])
+    for test_file in map(str, test_files):
+        for line in test_results:
+            name = str(line.get("name"))
+            if name not in [test_file, Path(test_file).name, Path(test_file).stem]:
+                continue
+            if line.get("avg_duration") is None:
+                continue
+            runs = -(-int(line.get("count") or 1) // max(int(parallel), 1))
+            history.record(test_file, float(line["avg_duration"]) * runs)
+    history.save()
 
 
 def _eval_robot_output(
-    config, output_path, started, output_json, token, rm_tokendir, results_file
+    config,
+    output_path,
+    started,
+    output_json,
+    tokens,
+    rm_tokendir,
+    results_file,
+    test_files=None,
+    parallel=1,
 ):
+    """
+    test_files: if set, the durations of the files are recorded
+    """
     results_json = output_path / (results_file or "results.json")
     test_results = json.loads(results_json.read_text())
+    if test_files:
+        _record_robot_durations(config, test_files, test_results, parallel)
     failds = [x for x in test_results if not x.get("all_ok")]
     color_info = "green"
 
@@ -176,32 +378,38 @@ def _eval_robot_output(
 
     # move completed runs without token to parent to reduce the amount of intermediate files
     find_results_path = None
-    token_path = output_path / token
-    for filepath in token_path.glob("*"):
-        if not filepath.is_dir():
-            continue
-        dest_path = output_path / filepath.name
-        if dest_path.exists() and dest_path.is_dir():
-            shutil.rmtree(dest_path)
-        elif dest_path.exists():
-            dest_path.unlink()
-        if rm_tokendir:
-            shutil.move(filepath, dest_path)
-            find_results_path = dest_path
-        else:
-            shutil.copytree(filepath, dest_path)
-            find_results_path = filepath
-
-    if rm_tokendir and token_path.exists():
-        shutil.rmtree(token_path)
-
-    click.secho(f"Outputs are generated in {find_results_path}", fg="yellow")
+    results_paths = {}
+    for token in tokens:
+        token_path = output_path / token
+        for filepath in token_path.glob("*"):
+            if not filepath.is_dir():
+                continue
+            dest_path = output_path / filepath.name
+            if dest_path.exists() and dest_path.is_dir():
+                shutil.rmtree(dest_path)
+            elif dest_path.exists():
+                dest_path.unlink()
+            if rm_tokendir:
+                shutil.move(filepath, dest_path)
+                find_results_path = dest_path
+            else:
+                shutil.copytree(filepath, dest_path)
+                find_results_path = filepath
+            results_paths[token] = find_results_path
+
+        if rm_tokendir and token_path.exists():
+            shutil.rmtree(token_path)
+
+    for path in sorted(set(map(str, results_paths.values()))) or [None]:
+        click.secho(f"Outputs are generated in {path}", fg="yellow")
     click.secho(
         ("Watch the logs online at: " f"http://host:{config.PROXY_PORT}/robot-output")
     )
 
     for line in test_results:
-        line["testoutput"] = str(find_results_path)
+        line["testoutput"] = str(
+            results_paths.get(line.pop("token", None)) or find_results_path
+        )
 
     if output_json:
         click.secho("---!!!---###---")
@@ -1,4 +1,5 @@
 import os
+import json
 from pwd import getpwnam  
 import sys
 import click
@@ -8,6 +9,8 @@ from contextlib import contextmanager
 from .odoo_config import MANIFEST
 from .tools import whoami
 
+ORIGIN_RELOAD = 'reload'
+
 def _get_settings_files(config):
     """
     Returns list of paths or files
@@ -27,7 +30,7 @@ def _get_settings_files(config):
 @contextmanager
 def _get_settings(config, customs, quiet=False):
     from .myconfigparser import MyConfigParser  # NOQA
-    files = _collect_settings_files(config, customs=None, quiet=quiet)
+    files = _collect_settings_files(config, quiet=quiet)
     filename = tempfile.mktemp(suffix='.')
     _make_settings_file(filename, files)
     c = MyConfigParser(filename)
@@ -39,30 +42,67 @@ def _get_settings(config, customs, quiet=False):
 def _export_settings(config, forced_values):
     from . import odoo_config
     from .myconfigparser import MyConfigParser
+    from .compose_cache import StageCache
 
-    setting_files = _collect_settings_files(config)
-    _make_settings_file(config.files['settings'], setting_files)
+    cache = StageCache.for_project(config.project_name, "settings")
+    setting_files = _collect_settings_files(config, cache=cache)
+    origins = _make_settings_file(config.files['settings'], setting_files, cache)
+    cache.save()
     # constants
     settings = MyConfigParser(config.files['settings'])
     if 'OWNER_UID' not in settings.keys():
         settings['OWNER_UID'] = whoami(id=True)
+        origins['OWNER_UID'] = ORIGIN_RELOAD
 
     # forced values:
     for k, v in forced_values.items():
         settings[k] = v
+        origins[k] = ORIGIN_RELOAD
 
     settings['ODOO_IMAGES'] = config.dirs['images']
+    origins['ODOO_IMAGES'] = ORIGIN_RELOAD
 
     settings.write()
+    _write_origins(config, origins)
+
+def _write_origins(config, origins):
+    from .myconfigparser import MyConfigParser
+
+    settings = MyConfigParser(config.files['settings'])
+    # values set before, e.g. DBNAME
+    for key in settings.keys():
+        origins.setdefault(key, ORIGIN_RELOAD)
+    config.files['settings_origins'].write_text(json.dumps(origins, indent=4))
 
-def _collect_settings_files(config, quiet=False):
+def get_origins(config):
+    """
+    Returns {key: file or 'reload'} for the settings of the last reload.
+    """
+    path = config.files['settings_origins']
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())
+
+def _find_default_settings(images_dir, cache=None):
+    """
+    The default.settings files below the images; with a cache the tree is
+    only walked again, if the mtime of one of its directories changed.
+    """
+    from .compose_cache import walk_tree
+
+    def collect(filename):
+        return filename == 'default.settings'
+
+    if not cache:
+        return walk_tree(images_dir, collect)[1]
+    return cache.tree('default.settings', images_dir, collect)
+
+def _collect_settings_files(config, quiet=False, cache=None):
     _files = []
 
     if config.dirs:
         _files.append(config.dirs['odoo_home'] / 'defaults')
-        # optimize
-        for filename in config.dirs['images'].glob("**/default.settings"):
-            _files.append(config.dirs['images'] / filename)
+        _files += _find_default_settings(config.dirs['images'], cache)
     if config.restrict.get('settings'):
         _files += config.restrict['settings']
     else:
@@ -102,17 +142,40 @@ def _collect_settings_files(config, quiet=False):
 
     return _files
 
-def _make_settings_file(outfile, setting_files):
+def compile_settings(setting_files, cache=None):
     """
-    Puts all settings into one settings file
+    Merges the settings files; returns (values, origins) - origins tells
+    for every key the file, where the value comes from.
+    Cached by size and mtime of all files.
+    """
+    from .myconfigparser import MyConfigParser
+    from .compose_cache import fingerprint, file_key
+
+    def compile():
+        values, origins = {}, {}
+        for file in setting_files:
+            if not file:
+                continue
+            c = MyConfigParser(file)
+            for key in c.keys():
+                values[key] = c[key]
+                origins[key] = str(file)
+        return values, origins
+
+    if not cache:
+        return compile()
+    key = fingerprint([file_key(x) for x in setting_files if x])
+    return cache.stage('compiled', key, compile)[0]
+
+def _make_settings_file(outfile, setting_files, cache=None):
+    """
+    Puts all settings into one settings file; returns the origins of the
+    values.
     """
     from .myconfigparser import MyConfigParser
     c = MyConfigParser(outfile)
-    for file in setting_files:
-        if not file:
-            continue
-        c2 = MyConfigParser(file)
-        c.apply(c2)
+    values, origins = compile_settings(setting_files, cache)
+    c.apply(values)
 
     # expand variables
     for key in list(c.keys()):
@@ -121,3 +184,4 @@ def _make_settings_file(outfile, setting_files):
             c[key] = os.path.expanduser(value)
 
     c.write()
+    return origins
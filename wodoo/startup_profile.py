@@ -0,0 +1,116 @@
+"""
+odoo --profile-startup
+
+Records how long importing every module takes and the phases of the cli
+setup; the report is printed to stderr when the process ends.
+
+Enabled at the very top of wodoo/__init__.py, so that all imports after
+that are seen.
+"""
+import atexit
+import importlib.abc
+import sys
+import time
+from contextlib import contextmanager
+
+FLAG = "--profile-startup"
+
+
+class _TimedLoader(importlib.abc.Loader):
+    def __init__(self, loader, profile):
+        self._loader = loader
+        self._profile = profile
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        profile = self._profile
+        started = time.perf_counter()
+        profile._stack.append(0.0)
+        try:
+            self._loader.exec_module(module)
+        finally:
+            elapsed = time.perf_counter() - started
+            children = profile._stack.pop()
+            if profile._stack:
+                profile._stack[-1] += elapsed
+            profile.imports.append((module.__name__, elapsed, elapsed - children))
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+
+class _ImportTimer(importlib.abc.MetaPathFinder):
+    def __init__(self, profile):
+        self.profile = profile
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(spec.loader, self.profile)
+        return spec
+
+
+class StartupProfile(object):
+    def __init__(self):
+        self.enabled = False
+        self.started = None
+        self.imports = []  # (module, seconds incl. sub imports, seconds self)
+        self.phases = {}  # name: [count, seconds]
+        self._stack = []
+
+    def enable(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        self.started = time.perf_counter()
+        sys.meta_path.insert(0, _ImportTimer(self))
+        atexit.register(self.report)
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            phase = self.phases.setdefault(name, [0, 0.0])
+            phase[0] += 1
+            phase[1] += time.perf_counter() - started
+
+    def report(self, file=None, top=30):
+        file = file or sys.stderr
+        total = time.perf_counter() - self.started
+        imports = sum(x[2] for x in self.imports)
+
+        def ms(seconds):
+            return f"{seconds * 1000:9.1f} ms"
+
+        print(f"\nStartup profile (total {ms(total).strip()})", file=file)
+        print(
+            f"\nImports: {len(self.imports)} modules, {ms(imports).strip()}", file=file
+        )
+        print(f"{'cumulative':>12} {'self':>12}  module", file=file)
+        for name, cumulative, own in sorted(self.imports, key=lambda x: -x[1])[:top]:
+            print(f"{ms(cumulative)} {ms(own)}  {name}", file=file)
+        print("\nPhases:", file=file)
+        for name, (count, seconds) in self.phases.items():
+            print(f"{ms(seconds)}  {name} ({count}x)", file=file)
+
+
+profile = StartupProfile()
+
+
+def enable_if_requested(argv=None):
+    if FLAG in (argv or sys.argv):
+        profile.enable()
@@ -0,0 +1,4 @@
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "benchmark: time budgets; only run with WODOO_BENCHMARK=1"
+    )
@@ -0,0 +1,50 @@
+import os
+import time
+import zipfile
+import pytest
+from .. import lib_backup
+
+
+@pytest.mark.parametrize("raw", [True, False])
+def test_zip_add_deflated(tmp_path, monkeypatch, raw):
+    monkeypatch.setattr(lib_backup, "_raw_members_supported", lambda: raw)
+    files = {"a.txt": b"a" * 1000, "b.bin": bytes(range(256)) * 10}
+    path = tmp_path / "backup.zip"
+    with zipfile.ZipFile(path, "w", allowZip64=True) as zf:
+        for name, data in files.items():
+            (tmp_path / name).write_bytes(data)
+            zinfo = zipfile.ZipInfo(name, time.localtime()[:6])
+            lib_backup._zip_add_deflated(
+                zf, zinfo, *lib_backup._deflate_file(tmp_path / name, 6)
+            )
+    with zipfile.ZipFile(path) as zf:
+        assert zf.testzip() is None
+        assert {x: zf.read(x) for x in zf.namelist()} == files
+
+
+def test_raw_members_supported():
+    # fails, if the zipfile internals changed in a new python version
+    assert lib_backup._raw_members_supported()
+
+
+def test_backup_files_incremental(tmp_path, monkeypatch):
+    log = tmp_path / "sudo.log"
+    (tmp_path / "bin").mkdir()
+    (tmp_path / "bin" / "sudo").write_text(f'#!/bin/sh\necho "$@" >> {log}\n')
+    (tmp_path / "bin" / "sudo").chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tmp_path / 'bin'}:{os.environ['PATH']}")
+    monkeypatch.setenv("DUMP_UID", "1000")
+
+    files = tmp_path / "filestore"
+    (files / "ab").mkdir(parents=True)
+    (files / "ab" / "file").write_text("content")
+    repo = tmp_path / "repo"
+    lib_backup._backup_files_incremental(files, repo)
+    lib_backup._backup_files_incremental(files, repo)
+
+    # two backups within the same second
+    assert len(lib_backup._get_file_generations(repo)) == 2
+    calls = log.read_text().splitlines()
+    assert len(calls) == 2
+    assert calls[0].startswith(f"chown 1000 {repo} {repo / 'objects'}")
+    assert len(calls[1].split()) == 3  # only the new manifest
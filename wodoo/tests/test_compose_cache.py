@@ -0,0 +1,139 @@
+import os
+import pytest
+from .. import lib_composer
+from ..compose_cache import StageCache
+
+TEMPLATE = """\
+services:
+  odoo:
+    image: odoo:${ODOO_VERSION}
+    environment:
+      - FROM_OS=${WODOO_TEST_FROM_OS}
+"""
+
+DEFAULT_NETWORK = """\
+networks:
+    default:
+        name: ${NETWORK_NAME}
+"""
+
+
+class Config(object):
+    YAML_VERSION = "3.7"
+    COMPOSE_VERIFY = False
+    COMPOSE_CONFIG_SUBPROCESS = False
+
+    def __init__(self, path):
+        self.files = {
+            "config/default_network": path / "default_network",
+            "docker_compose_bin": "docker-compose",
+        }
+
+
+def _touch(path):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+
+@pytest.fixture
+def build(tmp_path, monkeypatch):
+    """
+    Runs __get_complete_config with a new cache from the cache file like
+    a new reload does and returns the config and the stages run.
+    """
+    (tmp_path / "default_network").write_text(DEFAULT_NETWORK)
+    (tmp_path / "run").mkdir()
+    (tmp_path / "run" / "settings").write_text("DBNAME=db\n")
+    template = tmp_path / "docker-compose.yml"
+    template.write_text(TEMPLATE)
+    monkeypatch.setenv("WODOO_TEST_FROM_OS", "a")
+
+    stages = []
+    for name in ["__parse_compose_file", "__prepare_contents", "__compose_config"]:
+
+        def wrapper(*args, __name=name, __method=getattr(lib_composer, name)):
+            stages.append(__name.strip("_"))
+            return __method(*args)
+
+        monkeypatch.setattr(lib_composer, name, wrapper)
+
+    env = {
+        "ODOO_VERSION": "15.0",
+        "NETWORK_NAME": "net",
+        "HOST_RUN_DIR": str(tmp_path / "run"),
+    }
+
+    def build(subprocess=False, **values):
+        stages.clear()
+        cache = StageCache(tmp_path / "cache.bin")
+        config = Config(tmp_path)
+        config.COMPOSE_CONFIG_SUBPROCESS = subprocess
+        content = getattr(lib_composer, "__get_complete_config")(
+            config, [template], dict(env, **values), cache
+        )
+        cache.save()
+        return content, list(stages)
+
+    build.template = template
+    return build
+
+
+def test_cached_build(build):
+    content, stages = build()
+    assert stages == ["parse_compose_file", "prepare_contents", "compose_config"]
+    assert content["services"]["odoo"]["image"] == "odoo:15.0"
+    assert content["services"]["odoo"]["environment"]["FROM_OS"] == "a"
+
+    assert build() == (content, [])
+
+    # touched but unchanged template: the merged config is still used
+    _touch(build.template)
+    assert build() == (content, ["parse_compose_file", "prepare_contents"])
+
+
+def test_cached_build_template_changed(build):
+    build()
+    build.template.write_text(TEMPLATE.replace("image: odoo:", "image: odoo-custom:"))
+    content, stages = build()
+    assert stages == ["parse_compose_file", "prepare_contents", "compose_config"]
+    assert content["services"]["odoo"]["image"] == "odoo-custom:15.0"
+
+
+def test_cached_build_settings_changed(build):
+    build()
+    content, stages = build(ODOO_VERSION="16.0")
+    assert stages == ["prepare_contents", "compose_config"]
+    assert content["services"]["odoo"]["image"] == "odoo:16.0"
+
+
+def test_cached_build_default_network_changed(build, tmp_path):
+    build()
+    (tmp_path / "default_network").write_text(
+        DEFAULT_NETWORK.replace("${NETWORK_NAME}", "other")
+    )
+    content, stages = build()
+    assert stages == ["prepare_contents", "compose_config"]
+    assert content["networks"]["default"]["name"] == "other"
+
+
+def test_cached_build_environment_changed(build, monkeypatch):
+    build()
+    # read by docker-compose config from the environment
+    monkeypatch.setenv("WODOO_TEST_FROM_OS", "b")
+    content, stages = build()
+    assert stages == ["compose_config"]
+    assert content["services"]["odoo"]["environment"]["FROM_OS"] == "b"
+
+
+def test_cached_build_subprocess(build, monkeypatch):
+    monkeypatch.setattr(
+        lib_composer,
+        "__run_docker_compose_config",
+        lambda config, contents, env: {"services": {"from": "docker-compose"}},
+    )
+    build()
+    # switching to docker-compose config runs it, also with equal templates
+    content, stages = build(subprocess=True)
+    assert stages == ["compose_config"]
+    assert content == {"services": {"from": "docker-compose"}}
+    assert build(subprocess=True) == (content, [])
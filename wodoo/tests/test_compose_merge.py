@@ -0,0 +1,135 @@
+import os
+import pytest
+from ..compose_merge import Interpolator, compose_config
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("${A}", "a"),
+        ("$A/x", "a/x"),
+        ("${UNSET}", ""),
+        ("${UNSET:-d}", "d"),
+        ("${EMPTY:-d}", "d"),
+        ("${EMPTY-d}", ""),
+        ("${UNSET-${A}}", "a"),
+        ("${A:+set}", "set"),
+        ("${EMPTY:+set}", ""),
+        ("$${A}", "${A}"),
+        ("cost: 5$", "cost: 5$"),
+    ],
+)
+def test_interpolate(text, expected):
+    interpolate = Interpolator({"A": "a", "EMPTY": ""})
+    assert interpolate(text) == expected
+
+
+def test_interpolate_errors():
+    with pytest.raises(Exception, match="Missing mandatory value for B"):
+        Interpolator({})("${B:?required}")
+    with pytest.raises(Exception, match="Invalid interpolation format"):
+        Interpolator({})({"image": "${"})
+
+
+def test_compose_config(tmp_path):
+    settings = tmp_path / "settings"
+    settings.write_text("# comment\nDBNAME=db\nPRICE=5$\n")
+    contents = [
+        {
+            "services": {
+                "odoo": {
+                    "image": "odoo:${VERSION}",
+                    "build": ".",
+                    "env_file": ["${RUN_DIR}/settings"],
+                    "environment": ["DBNAME=override", "FROM_OS"],
+                    "ports": ["80:80"],
+                    "volumes": ["a:/opt/a", "b:/opt/b", "./data:/opt/data:ro"],
+                    "command": ["run", "a"],
+                    "networks": ["default"],
+                }
+            }
+        },
+        {
+            "services": {
+                "odoo": {
+                    "environment": {"EXTRA": 1},
+                    "labels": ["x=y"],
+                    "ports": ["80:80", "81:81"],
+                    "volumes": ["c:/opt/b"],
+                    "command": ["run"],
+                    "networks": {"other": {"aliases": ["o"]}},
+                },
+                "postgres": {"image": "postgres"},
+            },
+            "networks": {"other": {"name": "${UNSET}"}},
+        },
+    ]
+    environment = {"VERSION": "16", "RUN_DIR": str(tmp_path), "FROM_OS": "os"}
+    result, missing = compose_config(contents, environment, base_dir=tmp_path)
+
+    odoo = result["services"]["odoo"]
+    assert odoo["image"] == "odoo:16"
+    assert odoo["build"] == {"context": str(tmp_path)}
+    assert "env_file" not in odoo
+    assert odoo["environment"] == {
+        "DBNAME": "override",
+        "PRICE": "5$$",
+        "FROM_OS": "os",
+        "EXTRA": "1",
+    }
+    assert odoo["labels"] == {"x": "y"}
+    assert odoo["ports"] == ["80:80", "81:81"]
+    assert odoo["volumes"] == [
+        "a:/opt/a",
+        "c:/opt/b",
+        f"{tmp_path}/data:/opt/data:ro",
+    ]
+    assert odoo["command"] == ["run"]
+    assert odoo["networks"] == {"default": None, "other": {"aliases": ["o"]}}
+    assert result["services"]["postgres"] == {
+        "image": "postgres",
+        "environment": {},
+    }
+    assert missing == ["UNSET"]
+    # input stays untouched for docker-compose config
+    assert contents[0]["services"]["odoo"]["image"] == "odoo:${VERSION}"
+
+
+def test_compose_config_paths(tmp_path):
+    contents = [
+        {
+            "services": {
+                "odoo": {
+                    "build": {"context": "../odoo", "dockerfile": "Dockerfile"},
+                    "volumes": [
+                        "/abs:/opt/abs",
+                        "~/home:/opt/home",
+                        "/opt/anonymous",
+                        {"type": "bind", "source": "./bind", "target": "/opt/bind"},
+                        {"type": "volume", "source": "named", "target": "/opt/named"},
+                    ],
+                },
+                "git": {"build": "https://github.com/a/b.git#main"},
+            }
+        }
+    ]
+    result, _ = compose_config(contents, {}, base_dir=tmp_path / "customs")
+    odoo = result["services"]["odoo"]
+    assert odoo["build"] == {
+        "context": str(tmp_path / "odoo"),
+        "dockerfile": "Dockerfile",
+    }
+    assert odoo["volumes"] == [
+        "/abs:/opt/abs",
+        os.path.expanduser("~/home") + ":/opt/home",
+        "/opt/anonymous",
+        {
+            "type": "bind",
+            "source": str(tmp_path / "customs" / "bind"),
+            "target": "/opt/bind",
+        },
+        {"type": "volume", "source": "named", "target": "/opt/named"},
+    ]
+    assert result["services"]["git"]["build"] == {
+        "context": "https://github.com/a/b.git#main"
+    }
@@ -0,0 +1,51 @@
+import importlib
+import click
+from ..cli import cli, Commands, LAZY_COMMANDS, LAZY_GLOBAL_COMMANDS
+
+
+def _load_all():
+    modules = set(x[0] for x in LAZY_COMMANDS.values())
+    modules |= set(LAZY_GLOBAL_COMMANDS.values())
+    for module in modules:
+        importlib.import_module(module, "wodoo")
+
+
+def test_lazy_commands_match_registered_commands():
+    _load_all()
+    for name, cmd in cli.commands.items():
+        if name in ["completion", "version"]:
+            continue
+        assert name in LAZY_COMMANDS, name
+        module, subcommands = LAZY_COMMANDS[name]
+        assert cmd.callback.__module__ == "wodoo" + module, name
+        if isinstance(cmd, click.Group):
+            assert sorted(cmd.commands) == sorted(subcommands), name
+        else:
+            assert subcommands is None, name
+    assert set(LAZY_COMMANDS) <= set(cli.commands)
+
+
+def test_lazy_global_commands_match_registered_commands():
+    _load_all()
+    for name, cmd in Commands.commands.items():
+        assert LAZY_GLOBAL_COMMANDS.get(name) == "." + cmd.callback.__module__.split(
+            "."
+        )[-1], name
+    assert set(LAZY_GLOBAL_COMMANDS) == set(Commands.commands)
+
+
+def test_former_attributes():
+    # imported eagerly before python 3.7, see wodoo/__init__.py
+    import wodoo
+
+    for name in [
+        "lib_module",
+        "lib_db",
+        "daddy_cleanup",
+        "module_tools",
+        "odoo_config",
+        "abort",
+        "_file2env",
+    ]:
+        assert getattr(wodoo, name)
+    assert getattr(wodoo, "__dcrun") is getattr(wodoo.tools, "__dcrun")
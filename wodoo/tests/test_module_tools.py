@@ -0,0 +1,282 @@
+import os
+import pytest
+from ..module_tools import Module, ModulesIndex
+
+
+def _manifest(path, name, **values):
+    (path / name).mkdir(parents=True, exist_ok=True)
+    values.setdefault("depends", [])
+    (path / name / "__manifest__.py").write_text(repr(dict(name=name, **values)))
+
+
+def _touch(path):
+    # some filesystems keep the mtime within the same tick
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    evaluated = []
+    eval_manifest = Module._eval_manifest
+
+    def _eval(content):
+        evaluated.append(content)
+        return eval_manifest(content)
+
+    monkeypatch.setattr(Module, "_eval_manifest", staticmethod(_eval))
+    monkeypatch.setattr(
+        ModulesIndex, "_get_index_file", staticmethod(lambda: tmp_path / "index.bin")
+    )
+    for name in ["base", "stock"]:
+        _manifest(tmp_path / "odoo", name)
+    _manifest(tmp_path / "customs", "stock", version="1.0")
+    _manifest(tmp_path / "customs", "sale")
+
+    def get(*addons_paths):
+        evaluated.clear()
+        paths = addons_paths or [tmp_path / "customs", tmp_path / "odoo"]
+        return ModulesIndex("__manifest__.py").get_manifests(list(paths))
+
+    get.evaluated = evaluated
+    return get
+
+
+def test_modules_index(tmp_path, index):
+    manifests = index()
+    assert sorted(manifests) == ["base", "sale", "stock"]
+    # earlier addons paths win
+    assert manifests["stock"] == (
+        tmp_path / "customs" / "stock" / "__manifest__.py",
+        {"name": "stock", "depends": [], "version": "1.0"},
+    )
+    assert len(index.evaluated) == 4
+
+    # unchanged: loaded from the index file without reading the manifests
+    assert index() == manifests
+    assert not index.evaluated
+
+    # edited manifest
+    _manifest(tmp_path / "customs", "sale", depends=["stock"])
+    _touch(tmp_path / "customs" / "sale" / "__manifest__.py")
+    assert index()["sale"][1]["depends"] == ["stock"]
+    assert len(index.evaluated) == 1
+
+    # touched but same content: not evaluated again
+    _touch(tmp_path / "customs" / "sale" / "__manifest__.py")
+    assert index()["sale"][1]["depends"] == ["stock"]
+    assert not index.evaluated
+
+
+def test_modules_index_directories(tmp_path, index):
+    index()
+
+    # new module directory
+    _manifest(tmp_path / "customs", "purchase")
+    _touch(tmp_path / "customs")
+    assert "purchase" in index()
+    assert len(index.evaluated) == 1
+
+    # removed module directory; the one of the next addons path shows up
+    (tmp_path / "customs" / "stock" / "__manifest__.py").unlink()
+    (tmp_path / "customs" / "stock").rmdir()
+    _touch(tmp_path / "customs")
+    assert index()["stock"][0] == tmp_path / "odoo" / "stock" / "__manifest__.py"
+
+    # changed addons paths
+    assert sorted(index(tmp_path / "odoo")) == ["base", "stock"]
+    assert ModulesIndex("__manifest__.py").paths.keys() == {str(tmp_path / "odoo")}
+    assert sorted(index()) == ["base", "purchase", "sale", "stock"]
+    assert len(index.evaluated) == 2
+
+    # removed addons path
+    _manifest(tmp_path / "gone", "gone")
+    assert "gone" in index(tmp_path / "gone", tmp_path / "odoo")
+    (tmp_path / "gone" / "gone" / "__manifest__.py").unlink()
+    (tmp_path / "gone" / "gone").rmdir()
+    (tmp_path / "gone").rmdir()
+    assert sorted(index(tmp_path / "gone", tmp_path / "odoo")) == ["base", "stock"]
+
+
+def test_modules_index_other_manifest_name(tmp_path, index):
+    index()
+    # index files of another manifest name are not used
+    manifests = ModulesIndex("__openerp__.py").get_manifests([tmp_path / "odoo"])
+    assert manifests == {}
+
+
+class FakeModule(object):
+    def __init__(self, depends, auto_install=False):
+        self.manifest_dict = {"depends": depends, "auto_install": auto_install}
+
+
+GRAPH = {
+    "base": [],
+    "web": ["base"],
+    "mail": ["base"],
+    "account": ["base"],
+    "stock": ["base"],
+    "sale": ["mail"],
+    "sale_stock": ["sale", "stock"],
+    "sale_account": ["sale", "account"],
+    "website": ["web"],
+    "website_sale": ["website", "sale"],
+    "website_sale_stock": ["website_sale", "sale_stock"],
+    "mail_bot": ["mail"],
+    "custom": ["sale", "not_in_addons_path"],
+}
+AUTO_INSTALL = ["sale_stock", "sale_account", "website_sale_stock", "mail_bot"]
+
+
+def _graph(graph=GRAPH):
+    from ..module_tools import DependencyGraph
+
+    return DependencyGraph(
+        {
+            name: FakeModule(depends, auto_install=name in AUTO_INSTALL)
+            for name, depends in graph.items()
+        }
+    )
+
+
+def _old_dependencies(name):
+    # the former recursive resolution of get_module_flat_dependency_tree
+    result = set()
+    for dep in GRAPH[name]:
+        if dep in GRAPH:
+            result |= {dep} | _old_dependencies(dep)
+    return result
+
+
+def _old_installed(install):
+    # the former fixpoint of get_all_modules_installed_by_manifest
+    result = set(install)
+    for name in install:
+        result |= _old_dependencies(name)
+    while True:
+        count = len(result)
+        for name in AUTO_INSTALL:
+            if _old_dependencies(name) <= result:
+                result.add(name)
+        if count == len(result):
+            return result
+
+
+def test_dependency_graph():
+    graph = _graph()
+    for name in GRAPH:
+        assert set(graph.dependencies(name)) == _old_dependencies(name)
+        assert set(graph.dependants_of(name)) == {
+            x for x in GRAPH if name in _old_dependencies(x)
+        }
+        for dep in graph.dependencies(name):
+            assert graph.ids[dep] < graph.ids[name]
+
+    for install in [
+        ["sale"],
+        ["sale", "stock"],
+        ["website_sale", "stock"],
+        ["custom", "account"],
+        ["web"],
+    ]:
+        assert set(graph._names(graph.install_closure(graph.bitset(install)))) == (
+            _old_installed(install)
+        )
+
+
+def test_dependency_graph_loop():
+    graph = _graph(
+        dict(
+            GRAPH,
+            loop_a=["base", "loop_b"],
+            loop_b=["loop_a"],
+            uses_loop=["loop_a"],
+        )
+    )
+    # modules outside of the loop are resolved as usual
+    assert set(graph.dependencies("website_sale_stock")) == _old_dependencies(
+        "website_sale_stock"
+    )
+    assert set(graph._names(graph.install_closure(graph.bitset(["sale"])))) == (
+        _old_installed(["sale"])
+    )
+    assert set(graph.dependants_of("base")) >= {"loop_a", "loop_b", "uses_loop"}
+    for name in ["loop_a", "loop_b", "uses_loop"]:
+        with pytest.raises(Exception, match="Recursive loop"):
+            graph.dependencies(name)
+        with pytest.raises(Exception, match="Recursive loop"):
+            graph.dependants_of(name)
+    with pytest.raises(Exception, match="Recursive loop"):
+        graph.install_closure(graph.bitset(["uses_loop"]))
+    with pytest.raises(Exception, match="Recursive loop"):
+        graph.order()
+
+
+@pytest.fixture
+def module_table(monkeypatch):
+    from contextlib import contextmanager
+    from .. import module_tools
+
+    class Cursor(object):
+        rows = [
+            (1, "installed", "base", "15.0.1.3"),
+            (2, "to upgrade", "sale", "15.0.1.0"),
+            (3, "uninstalled", "stock", False),
+        ]
+        queries = []
+
+        def execute(self, sql, params):
+            self.queries.append(params[0])
+            self.result = [x for x in self.rows if x[2] in params[0]]
+
+        def fetchall(self):
+            return self.result
+
+    @contextmanager
+    def get_conn_autoclose():
+        yield Cursor()
+
+    monkeypatch.setattr(module_tools, "get_conn_autoclose", get_conn_autoclose)
+    monkeypatch.setattr(module_tools, "_exists_table", lambda cr, table: True)
+    return Cursor
+
+
+def test_module_states(module_table):
+    from ..module_tools import DBModules
+
+    snapshot = DBModules.get_snapshot(["base", "sale", "stock", "purchase", "base"])
+    assert module_table.queries == [["base", "sale", "stock", "purchase"]]
+    assert snapshot.installed() == ["base", "sale"]
+    assert snapshot.not_installed() == ["stock", "purchase"]
+    assert snapshot.get_state("stock") == "uninstalled"
+    assert snapshot.get_meta_data("base") == {
+        "name": "base",
+        "state": "installed",
+        "id": 1,
+        "version": "15.0.1.3",
+    }
+    assert snapshot.get_meta_data("purchase")["state"] == "uninstalled"
+    assert not snapshot.is_listed("purchase")
+    assert DBModules.is_module_installed("sale")
+    assert not DBModules.is_module_installed("stock")
+    assert len(module_table.queries) == 3
+
+    # modules outside of the snapshot are looked up once on their own
+    module_table.queries.clear()
+    snapshot = DBModules.get_snapshot(["sale"])
+    assert snapshot.is_installed("base")
+    assert snapshot.get_meta_data("base")["version"] == "15.0.1.3"
+    assert not snapshot.is_listed("account")
+    assert module_table.queries == [["sale"], ["base"], ["account"]]
+    assert snapshot.installed() == ["sale"]
+
+
+def test_module_states_not_initialized(module_table, monkeypatch):
+    from .. import module_tools
+
+    monkeypatch.setattr(module_tools, "_exists_table", lambda cr, table: False)
+    snapshot = module_tools.DBModules.get_snapshot(["base"])
+    assert not snapshot.initialized
+    assert snapshot.get_meta_data("base") == {}
+    assert not snapshot.is_installed("sale")
+    assert not module_table.queries
@@ -0,0 +1,171 @@
+import pytest
+from .. import odoo_parser
+from ..odoo_parser import ModelIndex, SymbolDatabase
+
+MODELS = '''\
+from odoo import fields, models
+
+
+class Partner(models.Model):
+    _inherit = "res.partner"
+
+    code = fields.Char()
+
+    def _compute_code(self):
+        pass
+
+
+class Wizard(models.TransientModel):
+    """
+    _name = "not.this"
+    """
+
+    _name = "partner.wizard"
+    _description = (
+        "Wizard"
+    )
+
+    class Inner(models.Model):
+        _name = "inner.model"
+
+        def inner(self):
+            pass
+
+    def action(self):
+        pass
+
+
+def helper():
+    pass
+'''
+
+VIEWS = """\
+<odoo>
+    <record id="view_partner_form" model="ir.ui.view">
+        <field name="name">partner</field>
+        <field name="model">res.partner</field>
+        <field name="arch" type="xml">
+            <form string="Partner">
+            </form>
+        </field>
+    </record>
+</odoo>
+"""
+
+INHERITED_VIEWS = """\
+<odoo>
+    <record id="view_partner_form_inherit" model="ir.ui.view">
+        <field name="inherit_id" ref="mod.view_partner_form"/>
+        <field name="arch" type="xml">
+            <field name="name" position="after"/>
+        </field>
+    </record>
+</odoo>
+"""
+
+
+def _line(text, content=MODELS):
+    return content.split("\n").index(text) + 1
+
+
+def test_model_index():
+    index = ModelIndex(MODELS.split("\n"))
+    assert index.models == [
+        {"model": "res.partner", "line": 4, "inherited": True},
+        {"model": "partner.wizard", "line": 13, "inherited": False},
+        {"model": "inner.model", "line": 23, "inherited": False},
+    ]
+    assert index.model_at(1) is None
+    assert index.model_at(_line("    code = fields.Char()")) == "res.partner"
+    assert index.model_at(_line("    def _compute_code(self):")) == "res.partner"
+    # the docstring and the continued bracket do not end the class
+    assert index.model_at(_line('        "Wizard"')) == "partner.wizard"
+    assert index.model_at(_line("        def inner(self):")) == "inner.model"
+    # back in the outer class after the inner one
+    assert index.model_at(_line("    def action(self):")) == "partner.wizard"
+    assert index.model_at(_line("def helper():")) is None
+
+
+class FakeModule(object):
+    def __init__(self, path):
+        self.path = path
+        self.name = path.name
+        self.manifest_path = path / "__manifest__.py"
+
+
+@pytest.fixture
+def module(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        odoo_parser,
+        "translate_path_relative_to_customs_root",
+        lambda path: path.relative_to(tmp_path),
+    )
+    path = tmp_path / "mod"
+    (path / "models").mkdir(parents=True)
+    (path / "views").mkdir()
+    (path / "migrations").mkdir()
+    (path / "__manifest__.py").write_text("{}")
+    (path / "models" / "partner.py").write_text(MODELS)
+    (path / "views" / "partner.xml").write_text(VIEWS)
+    (path / "migrations" / "ignored.py").write_text(MODELS)
+    return FakeModule(path)
+
+
+def _rescan(db, module, filepath):
+    files = odoo_parser._get_module_file(module, filepath)
+    result = odoo_parser.scan_module(module, files=files)
+    db.delete_file(odoo_parser.translate_path_relative_to_customs_root(filepath))
+    db.insert(odoo_parser._get_entries(result, db.get_view_type))
+
+
+def test_symbol_database(tmp_path, module):
+    with SymbolDatabase(tmp_path / "symbols.db") as db:
+        assert db.is_empty
+        result = odoo_parser.scan_module(module)
+        db.insert(odoo_parser._get_entries(result))
+        assert not db.is_empty
+        assert db.find(["model"], "partner.wizard") == ("mod/models/partner.py", 13)
+        assert db.find(["def"], "inner.model.inner") == ("mod/models/partner.py", 26)
+        assert db.find(["field"], "res.partner.code") == ("mod/models/partner.py", 7)
+        assert db.find(["view"], "mod.view_partner_form") == (
+            "mod/views/partner.xml",
+            2,
+        )
+        assert db.get_view_type("mod.view_partner_form") == "form"
+
+        # the type of an inherited view is looked up from the stored
+        # parent, which is not scanned again
+        filepath = module.path / "views" / "partner_inherit.xml"
+        filepath.write_text(INHERITED_VIEWS)
+        _rescan(db, module, filepath)
+        assert db.get_view_type("mod.view_partner_form_inherit") == "form"
+
+        # rescanning a file replaces only its own symbols
+        (module.path / "models" / "partner.py").write_text(
+            MODELS.replace("partner.wizard", "partner.wizard2")
+        )
+        _rescan(db, module, module.path / "models" / "partner.py")
+        assert db.find(["model"], "partner.wizard") is None
+        assert db.find(["model"], "partner.wizard2")
+        assert db.find(["view"], "mod.view_partner_form")
+
+        # files of the ignored migrations are not scanned
+        assert not odoo_parser._get_module_file(
+            module, module.path / "migrations" / "ignored.py"
+        )
+
+        plaintext = tmp_path / ".odoo.ast"
+        db.export_plaintext(plaintext)
+        lines = plaintext.read_text().splitlines()
+        assert lines[0] == "model\t[mod]\tres.partner\t:::mod/models/partner.py:4"
+        assert [x.split("\t")[0] for x in lines] == sorted(
+            (x.split("\t")[0] for x in lines), key=SymbolDatabase.TYPES.index
+        )
+
+        db.delete_files_below("mod/views")
+        assert db.find(["view"], "mod.view_partner_form") is None
+        assert db.find(["model"], "res.partner")
+
+    # stored on exit
+    with SymbolDatabase(tmp_path / "symbols.db") as db:
+        assert db.find(["model"], "partner.wizard2")
@@ -0,0 +1,117 @@
+import os
+import subprocess
+import sys
+import threading
+import pytest
+from .. import odoo_ast_client, odoo_parser
+from ..odoo_parser_watch import AstWatcher, WatchServer, WatchRequestHandler, query
+
+
+class Watcher(AstWatcher):
+    def __init__(self):
+        # without inotify
+        self.lock = threading.Lock()
+        self.pending = set()
+        self.removed_dirs = set()
+        self.parsed = {}
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    updated = []
+    monkeypatch.setattr(odoo_parser, "update_files", updated.extend)
+    path = tmp_path / "watch.sock"
+    server = WatchServer(str(path), WatchRequestHandler)
+    server.watcher = Watcher()
+    server.updated = updated
+    server.path = path
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_query(server):
+    assert query({"cmd": "ping"}, server.path) == {"result": "pong"}
+    assert query({"cmd": "update", "path": "/a.py"}, server.path)
+    assert server.updated == ["/a.py"]
+    # unchanged since
+    assert query({"cmd": "update", "path": "/a.py"}, server.path)
+    assert server.updated == ["/a.py"]
+    with pytest.raises(Exception, match="Unknown command"):
+        query({"cmd": "unknown"}, server.path)
+
+
+def test_query_without_watcher(tmp_path):
+    assert query({"cmd": "ping"}, tmp_path / "missing.sock") is None
+
+
+def test_query_while_watcher_busy(server):
+    # e.g. parsing everything again
+    with server.watcher.lock:
+        answer = query({"cmd": "update", "path": "/a.py"}, server.path, timeout=0.2)
+    assert answer is None
+
+
+def test_update_once_per_save(server, tmp_path):
+    watcher = server.watcher
+    path = tmp_path / "a.py"
+    path.write_text("a = 1")
+    # save hook first, then the inotify event of the same save
+    query({"cmd": "update", "path": str(path)}, server.path)
+    watcher.pending.add(path)
+    watcher._process()
+    assert server.updated == [str(path)]
+
+    # the other way round
+    path.write_text("a = 2")
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    watcher.pending.add(path)
+    watcher._process()
+    query({"cmd": "update", "path": str(path)}, server.path)
+    assert server.updated == [str(path), path]
+
+    # removed
+    path.unlink()
+    watcher.pending.add(path)
+    watcher._process()
+    query({"cmd": "update", "path": str(path)}, server.path)
+    assert server.updated == [str(path), path, path]
+
+
+def _client(*args, cwd):
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", odoo_ast_client.__file__] + list(args),
+        cwd=str(cwd),
+        env=dict(os.environ, CUSTOMS_DIR=""),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+
+
+def test_client(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        odoo_parser, "get_view", lambda name: (tmp_path / "views.xml", 3)
+    )
+    (tmp_path / "MANIFEST").write_text("{}")
+    server.path.rename(tmp_path / odoo_ast_client.SOCKET_NAME)
+    (tmp_path / "module").mkdir()
+    cwd = tmp_path / "module"
+
+    result = _client("update", "a.py", cwd=cwd)
+    assert result.returncode == 0
+    assert server.updated == [str(cwd / "a.py")]
+    # the odoo command is not started
+    assert "click" not in result.stderr
+    assert "wodoo" not in result.stderr
+
+    result = _client("view", "module.view", cwd=cwd)
+    assert result.stdout == f"FILEPATH:{tmp_path / 'views.xml'}:3\n"
+    assert _client("unknown", cwd=cwd).returncode == 2
+
+
+def test_client_without_watcher(tmp_path):
+    (tmp_path / "MANIFEST").write_text("{}")
+    assert _client("ping", cwd=tmp_path).returncode == 1
@@ -0,0 +1,99 @@
+import threading
+import pytest
+from .. import orchestrate
+from ..orchestrate import Containers, Plan
+
+
+def test_plan_runs_independent_steps_together():
+    started = threading.Barrier(2, timeout=5)
+    order = []
+
+    def step(name, barrier=False):
+        def run():
+            if barrier:
+                # both wait for each other: only passes, if run concurrently
+                started.wait()
+            order.append(name)
+
+        return run
+
+    plan = Plan()
+    plan.add("up redis", step("up redis", True))
+    plan.add("up postgres", step("up postgres", True))
+    plan.add("postgres ready", step("postgres ready"), after=["up postgres"])
+    plan.run()
+    assert order[-1] == "postgres ready"
+
+
+def test_plan_stops_at_error():
+    order = []
+
+    def fail():
+        raise Exception("failed")
+
+    plan = Plan()
+    plan.add("up postgres", fail)
+    plan.add("postgres ready", lambda: order.append(1), after=["up postgres"])
+    with pytest.raises(Exception, match="failed"):
+        plan.run()
+    assert not order
+    with pytest.raises(Exception, match="Unknown step"):
+        plan.add("restart odoo", fail, after=["missing"])
+
+
+class Container(object):
+    def __init__(self, status):
+        self.status = status
+        self.calls = []
+
+    def stop(self, timeout):
+        self.calls.append(("stop", timeout))
+
+    def kill(self):
+        self.calls.append(("kill",))
+
+    def start(self):
+        self.calls.append(("start",))
+
+
+class Config(object):
+    project_name = "proj"
+    safe_kill = "postgres,redis"
+    devmode = False
+
+
+@pytest.fixture
+def containers(monkeypatch):
+    containers = Containers(Config())
+    containers.existing = {}
+    containers.composed = []
+    monkeypatch.setattr(containers, "get", containers.existing.get)
+    monkeypatch.setattr(
+        orchestrate, "dc", lambda config, args: containers.composed.append(args)
+    )
+    return containers
+
+
+def test_containers_up(containers):
+    # docker-compose decides whether to create, recreate or start
+    containers.existing["redis"] = Container("running")
+    containers.up("redis")
+    containers.up("postgres")
+    assert containers.composed == [
+        ["up", "-d", "--no-deps", "redis"],
+        ["up", "-d", "--no-deps", "postgres"],
+    ]
+    assert not containers.existing["redis"].calls
+
+
+def test_containers_restart(containers):
+    containers.existing["odoo"] = Container("running")
+    containers.existing["postgres"] = Container("running")
+    containers.existing["odoo_cronjobs"] = Container("exited")
+    for service in ["odoo", "postgres", "odoo_cronjobs", "odoo_queuejobs"]:
+        containers.restart(service)
+    assert containers.existing["odoo"].calls == [("stop", 2), ("start",)]
+    assert containers.existing["postgres"].calls == [("stop", 20), ("start",)]
+    assert containers.existing["odoo_cronjobs"].calls == [("start",)]
+    # missing containers are created
+    assert containers.composed == [["up", "-d", "--no-deps", "odoo_queuejobs"]]
@@ -0,0 +1,76 @@
+from xml.etree import ElementTree
+from ..parallel_tests import DurationHistory, run_sharded, shard, write_junit_report
+
+
+def test_shard_by_durations(tmp_path):
+    history = DurationHistory(tmp_path / "durations.json")
+    history.durations = {"a": 100, "b": 60, "c": 50, "d": 10}
+    buckets = shard(["a", "b", "c", "d", "new"], 2, history)
+    # the new file is assumed to take the median
+    assert buckets == [["a", "c"], ["b", "new", "d"]]
+
+
+def test_run_sharded(tmp_path):
+    history = DurationHistory(tmp_path / "durations.json")
+
+    def run(key, worker):
+        return key != "fails", f"output of {key}"
+
+    results = run_sharded(["ok1", "fails", "ok2"], 2, history, run)
+    assert [(x.name, x.ok) for x in results] == [
+        ("ok1", True),
+        ("fails", False),
+        ("ok2", True),
+    ]
+    assert set(DurationHistory(tmp_path / "durations.json").durations) == {
+        "ok1",
+        "fails",
+        "ok2",
+    }
+
+    report = tmp_path / "report.xml"
+    write_junit_report(report, results)
+    suite = ElementTree.parse(report).getroot()
+    assert suite.get("tests") == "3"
+    assert suite.get("failures") == "1"
+    assert suite.find("testcase[@name='fails']/failure").text == "output of fails"
+
+
+def test_run_unit_tests_parallel_filestores(tmp_path, monkeypatch):
+    from .. import lib_module, parallel_tests, tools
+
+    class Connection(object):
+        def clone(self, dbname):
+            return dbname
+
+    class Config(object):
+        dbname = "db"
+        dirs = {"odoo_data_dir": tmp_path}
+
+        def get_odoo_conn(self):
+            return Connection()
+
+    filestores = tmp_path / "filestore"
+    (filestores / "db" / "ab").mkdir(parents=True)
+    (filestores / "db" / "ab" / "attachment").write_text("content")
+    dropped = []
+    monkeypatch.setattr(tools, "_copy_db", lambda conn, from_db, to_db: None)
+    monkeypatch.setattr(
+        tools, "_remove_postgres_connections", lambda dbname, sql: dropped.append(sql)
+    )
+
+    def run_captured(popen):
+        dbname = popen.args[1][4].split("=")[1]
+        attachment = filestores / dbname / "ab" / "attachment"
+        return attachment.read_text() == "content", dbname
+
+    monkeypatch.setattr(parallel_tests, "run_captured", run_captured)
+    history = parallel_tests.DurationHistory(tmp_path / "durations.json")
+    results = lib_module._run_unit_tests_parallel(
+        Config(), ["a.py", "b.py", "c.py"], 2, history
+    )
+    assert all(x.ok for x in results)
+    assert {x.output for x in results} == {"db_test0", "db_test1"}
+    assert len(dropped) == 2
+    # only the filestore of the prepared database is left
+    assert [x.name for x in filestores.iterdir()] == ["db"]
@@ -0,0 +1,55 @@
+from pathlib import Path
+from ..restore_tools import SECTION_DATA, TocEntry, distribute, read_toc
+
+# pg_dump -Fc of a table with 300 rows, one with a single row and a large
+# object; once written to a file, once to a pipe (no offsets in the toc)
+DUMPS = Path(__file__).parent / "dumps"
+
+
+def _data(path):
+    return [
+        (x.desc, x.name, x.size) for x in read_toc(path) if x.section == SECTION_DATA
+    ]
+
+
+def test_read_toc():
+    entries = read_toc(DUMPS / "seekable.dump")
+    assert [x.name for x in entries if x.desc == "TABLE"] == [
+        "public.big",
+        "public.small",
+    ]
+    assert _data(DUMPS / "seekable.dump") == [
+        ("TABLE DATA", "public.big", 6437),
+        ("TABLE DATA", "public.small", 31),
+        ("BLOBS", "BLOBS", 38),
+    ]
+
+
+def test_read_toc_pipe():
+    assert _data(DUMPS / "pipe.dump") == _data(DUMPS / "seekable.dump")
+
+
+def test_read_toc_truncated(tmp_path):
+    path = tmp_path / "truncated.dump"
+    data = (DUMPS / "pipe.dump").read_bytes()
+    path.write_bytes(data[:-20])
+    sizes = [x[2] for x in _data(path)]
+    assert sizes == [(len(data) - 20) // 3] * 3
+
+
+def _entry(name, size):
+    entry = TocEntry(0, "TABLE DATA", SECTION_DATA, "public", name, None)
+    entry.size = size
+    return entry
+
+
+def test_distribute():
+    sizes = [5, 100, 60, 50, 5]
+    entries = [_entry(name, size) for name, size in zip("abcde", sizes)]
+    buckets = distribute(entries, 2)
+    assert [[x.tag for x in bucket] for bucket in buckets] == [
+        ["b", "a", "e"],
+        ["c", "d"],
+    ]
+    assert [x.tag for x in distribute(entries, 10)[0]] == ["b"]
+    assert len(distribute(entries, 10)) == 5
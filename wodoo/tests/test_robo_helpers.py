@@ -0,0 +1,101 @@
+import json
+import arrow
+import pytest
+from pathlib import Path
+from ..compose_cache import StageCache
+from ..parallel_tests import DurationHistory
+from ..robo_helpers import RobotIndex, _record_robot_durations
+from ..robo_helpers import _eval_robot_output, _get_affected_robottest_files
+
+
+class Config(object):
+    PROXY_PORT = 80
+
+
+def test_eval_output_of_shards(tmp_path):
+    for token in ["run_0", "run_1"]:
+        (tmp_path / token / f"{token}_output").mkdir(parents=True)
+    (tmp_path / "results.json").write_text(
+        json.dumps(
+            [
+                {"name": "a", "all_ok": True, "token": "run_0"},
+                {"name": "b", "all_ok": False, "token": "run_1"},
+            ]
+        )
+    )
+    with pytest.raises(SystemExit):
+        _eval_robot_output(
+            Config(), tmp_path, arrow.utcnow(), False, ["run_0", "run_1"], True, None
+        )
+    results = json.loads((tmp_path / "results.json").read_text())
+    assert [x["testoutput"] for x in results] == [
+        str(tmp_path / "run_0_output"),
+        str(tmp_path / "run_1_output"),
+    ]
+    assert not (tmp_path / "run_0").exists()
+
+
+def test_affected_robot_files(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    keywords = tmp_path / "robot_utils" / "keywords"
+    keywords.mkdir(parents=True)
+    (keywords / "sale.robot").write_text("# odoo-require: sale\n")
+    (tmp_path / "tests").mkdir()
+    (tmp_path / "tests" / "sale.robot").write_text(
+        "*** Settings ***\nResource  ../robot_utils/keywords/sale.robot\n"
+    )
+    (tmp_path / "tests" / "stock.robot").write_text("# odoo-require: stock\n")
+
+    def affected(modules, changed_files=()):
+        return list(
+            map(str, _get_affected_robottest_files(modules, changed_files, tmp_path))
+        )
+
+    assert affected(["sale"]) == ["tests/sale.robot"]
+    assert affected(["crm"]) == []
+    assert affected(["crm"], ["tests/stock.robot"]) == ["tests/stock.robot"]
+    assert affected([], ["robot_utils/keywords/sale.robot"]) == ["tests/sale.robot"]
+
+
+def test_robot_index_parses_changed_files_only(tmp_path, monkeypatch):
+    root = tmp_path / "customs"
+    (root / "tests").mkdir(parents=True)
+    test = root / "tests" / "a.robot"
+    test.write_text("# odoo-require: sale\nResource  b.robot\n")
+    (root / "tests" / "b.robot").write_text("# odoo-require: stock\n")
+    (root / "odoo" / "addons").mkdir(parents=True)
+    (root / "odoo" / "addons" / "vendored.robot").write_text("")
+    cache = StageCache(tmp_path / "cache.bin")
+
+    index = RobotIndex(root, cache)
+    assert set(index.requires("tests/a.robot")) == {"sale", "stock"}
+    assert index.dependants("tests/b.robot") == [Path("tests/a.robot")]
+
+    parsed = []
+    read = RobotIndex._read
+    monkeypatch.setattr(
+        RobotIndex, "_read", staticmethod(lambda path: parsed.append(path) or read(path))
+    )
+    RobotIndex(root, StageCache(tmp_path / "cache.bin"))
+    assert parsed == []
+    (root / "tests" / "c.robot").write_text("")
+    index = RobotIndex(root, StageCache(tmp_path / "cache.bin"))
+    assert parsed == [root / "tests" / "c.robot"]
+    assert list(map(str, index.tests())) == [
+        "tests/a.robot",
+        "tests/b.robot",
+        "tests/c.robot",
+    ]
+
+
+def test_record_robot_durations(tmp_path):
+    class Config(object):
+        files = {"robot_durations": tmp_path / "durations.json"}
+
+    results = [
+        {"name": "tests/a.robot", "all_ok": True, "count": 4, "avg_duration": 10},
+        {"name": "b", "all_ok": False, "count": 1, "avg_duration": 3},
+    ]
+    _record_robot_durations(Config(), ["tests/a.robot", "tests/b.robot"], results, 2)
+    history = DurationHistory(Config.files["robot_durations"])
+    assert history.durations == {"tests/a.robot": 20, "tests/b.robot": 3}
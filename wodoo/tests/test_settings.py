@@ -0,0 +1,38 @@
+from ..compose_cache import StageCache
+from ..myconfigparser import MyConfigParser
+from ..settings import _find_default_settings, compile_settings
+
+
+def test_myconfigparser(tmp_path):
+    path = tmp_path / "settings"
+    path.write_text("# comment\nRUN_ODOO=1\nDBNAME=db\n")
+    settings = MyConfigParser(path)
+    assert settings["run_odoo"] == "1"
+    assert settings.get("missing", "x") == "x"
+
+    mtime = path.stat().st_mtime_ns
+    settings.write()
+    assert path.stat().st_mtime_ns == mtime
+
+    settings["DBNAME"] = "other"
+    settings["NEW"] = "1"
+    settings.write()
+    assert path.read_text() == "# comment\nRUN_ODOO=1\nDBNAME=other\nNEW=1\n"
+    assert MyConfigParser(path)["new"] == "1"
+
+
+def test_compile_settings(tmp_path):
+    cache = StageCache(tmp_path / "cache.bin")
+    images = tmp_path / "images"
+    (images / "odoo").mkdir(parents=True)
+    assert _find_default_settings(images, cache) == []
+
+    (images / "odoo" / "default.settings").write_text("RUN_ODOO=1\nA=1\n")
+    files = _find_default_settings(images, cache)
+    assert files == [images / "odoo" / "default.settings"]
+
+    project = tmp_path / "settings"
+    project.write_text("RUN_ODOO=0\n")
+    values, origins = compile_settings(files + [project], cache)
+    assert values == {"RUN_ODOO": "0", "A": "1"}
+    assert origins == {"RUN_ODOO": str(project), "A": str(files[0])}
@@ -0,0 +1,180 @@
+"""
+Startup benchmark of the cli: runs some cheap commands against a
+synthetic customs tree and fails, if they get slower than the budget in
+startup_budget.json or import modules they do not need.
+
+The time budgets are only checked with WODOO_BENCHMARK=1, as they
+depend on the load of the machine; slower machines:
+WODOO_BENCHMARK_FACTOR=2 doubles the time budgets.
+
+Print the timings:
+
+    python -m wodoo.tests.test_startup_benchmark
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+import pytest
+
+REPEAT = 5
+BUDGET_FILE = Path(__file__).parent / "startup_budget.json"
+REPO_ROOT = Path(__file__).parent.parent.parent
+
+RUN_CLI = (
+    "import atexit, os, sys\n"
+    "atexit.register(lambda: open(os.environ['WODOO_BENCHMARK_MODULES'], 'w')"
+    ".write('\\n'.join(sys.modules)))\n"
+    "import wodoo\n"
+    "wodoo.cli(prog_name='odoo')\n"
+)
+
+COMMANDS = {
+    "version": {"args": ["version"]},
+    "completion": {
+        "args": [],
+        "env": {
+            "_ODOO_COMPLETE": "bash_complete",
+            "COMP_WORDS": "odoo ba",
+            "COMP_CWORD": "1",
+        },
+    },
+    "list-modules": {"args": ["odoo-module", "list-modules"]},
+    "list-deps": {"args": ["-f", "odoo-module", "list-deps", "m_199"]},
+}
+
+
+def _git(path, *args):
+    subprocess.check_call(
+        ["git", "-c", "user.name=wodoo", "-c", "user.email=wodoo@localhost"]
+        + list(args),
+        cwd=path,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def make_customs(root, count_odoo=50, count_custom=200):
+    """
+    Customs with odoo modules and a chain of custom modules depending on
+    each other; plus the home with the images repository.
+    """
+    customs = root / "customs"
+
+    def make_module(path, name, depends):
+        path = customs / path / name
+        path.mkdir(parents=True)
+        (path / "__init__.py").write_text("")
+        (path / "__manifest__.py").write_text(
+            repr({"name": name, "version": "1.0", "depends": depends})
+        )
+
+    make_module("odoo/odoo/addons", "base", [])
+    for i in range(count_odoo):
+        make_module("odoo/addons", f"o_{i}", ["base"] + ([f"o_{i - 1}"] if i else []))
+    for i in range(count_custom):
+        depends = [f"o_{i % count_odoo}"] + ([f"m_{i - 1}"] if i else [])
+        make_module("addons", f"m_{i}", depends)
+    (customs / "odoo" / "odoo-bin").write_text("")
+    (customs / "odoo" / "requirements.txt").write_text("")
+    (customs / "MANIFEST").write_text(
+        json.dumps(
+            {
+                "version": 16.0,
+                "addons_paths": ["odoo/odoo/addons", "odoo/addons", "addons"],
+                "install": [f"m_{count_custom - 1}"],
+            }
+        )
+    )
+    _git(customs, "init", "-q")
+    _git(customs, "add", "-A")
+    _git(customs, "commit", "-qm", "init")
+
+    images = root / "home" / ".odoo" / "images"
+    images.mkdir(parents=True)
+    _git(images, "init", "-q")
+    _git(images, "commit", "-q", "--allow-empty", "-m", "init")
+    return customs
+
+
+def run_command(root, name, repeat=REPEAT):
+    """
+    Returns the durations in ms and the imported modules.
+    """
+    command = COMMANDS[name]
+    modules_file = root / "modules.txt"
+    env = dict(os.environ)
+    env.update(command.get("env", {}))
+    env.update(
+        {
+            "HOME": str(root / "home"),
+            "PYTHONPATH": str(REPO_ROOT),
+            "WODOO_BENCHMARK_MODULES": str(modules_file),
+        }
+    )
+    env.pop("CUSTOMS_DIR", None)
+
+    durations = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", RUN_CLI] + command["args"],
+            cwd=root / "customs",
+            env=env,
+            check=not command.get("env"),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        durations.append((time.perf_counter() - started) * 1000)
+    return durations, modules_file.read_text().splitlines()
+
+
+@pytest.fixture(scope="module")
+def benchmark_root():
+    with tempfile.TemporaryDirectory() as root:
+        root = Path(root)
+        make_customs(root)
+        yield root
+
+
+@pytest.mark.parametrize("name", sorted(COMMANDS))
+def test_startup_imports(benchmark_root, name):
+    budget = json.loads(BUDGET_FILE.read_text())[name]
+    durations, modules = run_command(benchmark_root, name, repeat=1)
+
+    forbidden = [
+        x
+        for x in modules
+        if any(x == y or x.startswith(y + ".") for y in budget["forbidden_imports"])
+    ]
+    assert not forbidden, f"{name} imports {', '.join(forbidden)}"
+
+
+@pytest.mark.benchmark
+@pytest.mark.skipif(
+    os.getenv("WODOO_BENCHMARK") != "1", reason="time budgets need WODOO_BENCHMARK=1"
+)
+@pytest.mark.parametrize("name", sorted(COMMANDS))
+def test_startup_budget(benchmark_root, name):
+    budget = json.loads(BUDGET_FILE.read_text())[name]
+    factor = float(os.getenv("WODOO_BENCHMARK_FACTOR", "1"))
+    durations, modules = run_command(benchmark_root, name)
+    assert min(durations) <= budget["max_ms"] * factor, (
+        f"{name} took {min(durations):.0f}ms; budget {budget['max_ms']}ms"
+    )
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as root:
+        root = Path(root)
+        make_customs(root)
+        for name in sorted(COMMANDS):
+            durations, modules = run_command(root, name)
+            print(
+                f"{name:15} min {min(durations):7.0f}ms  "
+                f"median {statistics.median(durations):7.0f}ms  "
+                f"{len(modules)} modules"
+            )
@@ -0,0 +1,205 @@
+import os
+import pytest
+from ..tools import DirectoryHasher
+
+# dtreetrawl -N --hash -R of the tree of _make_tree; symlinks are not part
+# of it, equal files count twice
+TREE_HASH = "6f3c443005480aa83c25da81aad5bf9c"
+
+
+def _make_tree(path):
+    (path / "sub" / "deeper").mkdir(parents=True)
+    (path / "a.txt").write_text("a\n")
+    (path / "sub" / "b.txt").write_text("b\n")
+    (path / "sub" / "c.bin").write_bytes(bytes(range(256)))
+    (path / "sub" / "deeper" / "empty").write_text("")
+    (path / "sub" / "deeper" / "same_as_a.txt").write_text("a\n")
+    (path / "link").symlink_to("a.txt")
+    (path / "linkdir").symlink_to("sub")
+    return path
+
+
+@pytest.fixture
+def hasher(tmp_path, monkeypatch):
+    hasher = DirectoryHasher(cache_file=tmp_path / "cache" / "hashes.bin")
+    hasher.read = []
+    hash_file = hasher._hash_file
+
+    def _hash_file(path):
+        hasher.read.append(os.path.relpath(path, tmp_path / "tree"))
+        return hash_file(path)
+
+    monkeypatch.setattr(hasher, "_hash_file", _hash_file)
+    return hasher
+
+
+def test_directory_hash(tmp_path, hasher):
+    tree = _make_tree(tmp_path / "tree")
+    assert hasher.hash(tree) == TREE_HASH
+    assert len(hasher.read) == 5
+
+    # names are not part of the hash
+    (tree / "sub" / "b.txt").rename(tree / "b.txt")
+    assert DirectoryHasher(cache_file=tmp_path / "other.bin").hash(tree) == TREE_HASH
+
+
+def test_directory_hash_cached(tmp_path, hasher):
+    tree = _make_tree(tmp_path / "tree")
+    hasher.hash(tree)
+    hasher.save()
+
+    hasher.read.clear()
+    assert hasher.hash(tree) == TREE_HASH
+    assert not hasher.read
+
+    # a new process reads the digests from the cache file
+    hasher._digests = None
+    (tree / "sub" / "b.txt").write_text("changed\n")
+    assert hasher.hash(tree) != TREE_HASH
+    assert hasher.read == [os.path.join("sub", "b.txt")]
+
+
+class FakeConnection(object):
+    def __init__(self):
+        import psycopg2.extensions
+
+        self.status = psycopg2.extensions.STATUS_READY
+        self.autocommit = False
+        self.closed = 0
+        self.dead = False
+        self.executed = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+class FakeCursor(object):
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, sql, params=None):
+        import psycopg2
+
+        if self.connection.dead:
+            # e.g. postgres was restarted meanwhile
+            self.connection.closed = 2
+            raise psycopg2.OperationalError("server closed the connection")
+        if sql == "fails":
+            raise psycopg2.OperationalError("fails")
+        self.connection.executed.append(sql)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    from .. import odoo_config
+
+    pool = odoo_config.ConnectionPool()
+    pool.connections = []
+
+    def connect(**params):
+        pool.connections.append(FakeConnection())
+        return pool.connections[-1]
+
+    monkeypatch.setattr(odoo_config, "_connection_pool", pool)
+    monkeypatch.setattr(odoo_config.psycopg2, "connect", connect)
+    return pool
+
+
+def _conn(dbname="db"):
+    from ..tools import DBConnection
+
+    return DBConnection(dbname, "host", 5432, "user", "pwd")
+
+
+def test_connection_pool(pool):
+    from ..tools import _execute_sql
+
+    _execute_sql(_conn(), "select 1")
+    _execute_sql(_conn(), "select 2", notransaction=True)
+    _execute_sql(_conn("other"), "select 3")
+    assert [x.executed for x in pool.connections] == [
+        ["select 1", "select 2"],
+        ["select 3"],
+    ]
+
+    # nested cursors need two connections, both are kept afterwards
+    with _conn().cursor() as cr1, _conn().cursor() as cr2:
+        assert cr1.connection is not cr2.connection
+    assert len(pool.connections) == 3
+    assert len(pool.idle[("host", 5432, "user", "db")]) == 2
+
+    pool.discard("db")
+    assert not any(x[3] == "db" for x in pool.idle)
+    assert [x.closed for x in pool.connections] == [1, 0, 1]
+
+
+def test_connection_pool_reconnect(pool):
+    from ..tools import _execute_sql
+
+    _execute_sql(_conn(), "select 1")
+    pool.connections[0].dead = True
+    # the first statement on the dead connection runs again on a new one
+    assert _execute_sql(_conn(), "select 2") is None
+    assert [x.executed for x in pool.connections] == [["select 1"], ["select 2"]]
+
+    # errors of statements on living connections are raised
+    with pytest.raises(Exception, match="fails"):
+        _execute_sql(_conn(), "fails")
+    # as on new connections
+    pool.discard()
+    pool.connections.clear()
+    with pytest.raises(Exception, match="fails"):
+        _execute_sql(_conn(), "fails")
+    assert len(pool.connections) == 1
+
+
+def test_discard_before_drop(pool, monkeypatch):
+    from .. import tools
+
+    calls = []
+    monkeypatch.setattr(pool, "discard", lambda dbname=None: calls.append(dbname))
+
+    def execute_sql(connection, sql, **kwargs):
+        calls.append(sql)
+        return [1]
+
+    monkeypatch.setattr(tools, "_execute_sql", execute_sql)
+    rename = tools.__dict__["__rename_db_drop_target"]
+    for call, from_db, to_db, statements in [
+        (
+            tools._copy_db,
+            "from_db",
+            "to_db",
+            [
+                'drop database if exists "to_db"',
+                'create database "to_db" template "from_db"',
+            ],
+        ),
+        (
+            rename,
+            "to_db",
+            "renamed",
+            [
+                "drop database if exists renamed",
+                "alter database to_db rename to renamed;",
+            ],
+        ),
+    ]:
+        calls.clear()
+        call(_conn(), from_db, to_db)
+        for sql in statements:
+            before = calls[: calls.index(sql)]
+            assert from_db in before
+            assert to_db in before
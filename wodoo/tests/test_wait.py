@@ -0,0 +1,37 @@
+import time
+from ..wait import postgres as postgres_wait
+from ..wait.backoff import Backoff
+
+
+def test_backoff():
+    backoff = Backoff(initial=0.1, maximum=0.5)
+    assert [backoff.next() for i in range(4)] == [0.1, 0.2, 0.4, 0.5]
+    assert backoff.next(deadline=time.time()) == 0
+    backoff.reset()
+    assert backoff.next() == 0.1
+
+
+class StartingPostgres(object):
+    host = None
+
+    def __init__(self, refused):
+        self.refused = refused
+
+    def get_psyco_connection(self, db=None):
+        if self.refused:
+            self.refused -= 1
+            raise Exception("the database system is starting up")
+        return self
+
+    def close(self):
+        pass
+
+
+def test_postgres_ready():
+    errors = []
+    conn = StartingPostgres(refused=3)
+    assert postgres_wait.ready(conn, timeout=5, on_error=errors.append)
+    assert len(errors) == 3
+
+    conn = StartingPostgres(refused=1000)
+    assert not postgres_wait.ready(conn, timeout=0.3)
@@ -0,0 +1,62 @@
+import os
+import subprocess
+import pytest
+from .. import lib_db_snapshots_docker_zfs as zfs_snapshots
+
+FAKE_ZFS = """#!/bin/sh
+echo "$@" >> {log}
+case "$*" in
+    "list -oname")
+        printf "pool\\npool/volumes\\npool/volumes/p_odoo_postgres_volume\\n"
+        printf "pool/volumes/p_odoo_postgres_volume.0\\npool/volumes/other\\n"
+        ;;
+    "list -H -p -o name,creation,used,referenced -t snapshot -r pool/volumes")
+        printf "pool/volumes/p_odoo_postgres_volume@first\\t1600000000\\t10\\t20\\n"
+        printf "pool/volumes/p_odoo_postgres_volume.0@second\\t1700000000\\t30\\t40\\n"
+        printf "pool/volumes/other@third\\t1700000000\\t0\\t0\\n"
+        ;;
+    *)
+        exit 1
+        ;;
+esac
+"""
+
+
+class Config(object):
+    ZFS_PATH_VOLUMES = "pool/volumes"
+    project_name = "p"
+
+
+def test_snapshots_listed_with_one_call(tmp_path, monkeypatch):
+    log = tmp_path / "calls"
+    for name, content in [
+        ("zfs", FAKE_ZFS.format(log=log)),
+        ("sudo", '#!/bin/sh\nexec "$@"\n'),
+    ]:
+        (tmp_path / name).write_text(content)
+        (tmp_path / name).chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tmp_path}:{os.environ['PATH']}")
+    monkeypatch.setattr(zfs_snapshots, "zfs", str(tmp_path / "zfs"))
+    monkeypatch.setattr(zfs_snapshots, "_cache", {})
+
+    for i in range(3):
+        snapshots = list(zfs_snapshots._get_snapshots(Config()))
+    assert [x["name"] for x in snapshots] == ["second", "first"]
+    assert snapshots[0]["path"] == "p_odoo_postgres_volume.0@second"
+    assert (snapshots[1]["used"], snapshots[1]["referenced"]) == (10, 20)
+    assert snapshots[1]["date"].year == 2020
+    assert len(log.read_text().splitlines()) == 2
+
+    zfs_snapshots._zfs_changed()
+    list(zfs_snapshots._get_snapshots(Config()))
+    assert len(log.read_text().splitlines()) == 4
+
+
+def test_zfs_errors_are_raised(tmp_path, monkeypatch):
+    (tmp_path / "sudo").write_text("#!/bin/sh\nexit 1\n")
+    (tmp_path / "sudo").chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tmp_path}:{os.environ['PATH']}")
+    monkeypatch.setattr(zfs_snapshots, "zfs", "zfs")
+    monkeypatch.setattr(zfs_snapshots, "_cache", {})
+    with pytest.raises(subprocess.CalledProcessError):
+        zfs_snapshots._list_snapshots("pool/volumes")
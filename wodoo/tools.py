@@ -15,6 +15,7 @@ from pathlib import Path
 import io
 import traceback
 import json
+import pickle
 import pipes
 import tempfile
 from datetime import datetime
@@ -75,18 +76,37 @@ class DBConnection(object):
         )
         return conn
 
+    def cursor(self, db=None, autocommit=False):
+        """
+        Cursor on a pooled connection; commits at the end.
+        """
+        from .odoo_config import get_connection_pool
+
+        return get_connection_pool().cursor(
+            autocommit=autocommit,
+            dbname=db or self.dbname,
+            user=self.user,
+            password=self.pwd,
+            host=self.host,
+            port=self.port or None,
+            connect_timeout=int(os.getenv("PSYCOPG_TIMEOUT", "3")),
+        )
+
     @contextmanager
     def connect(self, db=None):
-        conn = self.get_psyco_connection(db=db)
-        cr = conn.cursor()
+        # connect errors are raised, errors of the body are rolled back
+        # and swallowed
+        cursor = self.cursor(db=db)
+        cr = cursor.__enter__()
         try:
             yield cr
-            conn.commit()
         except Exception:
-            conn.rollback()
-        finally:
-            cr.close()
-            conn.close()
+            cursor.__exit__(*sys.exc_info())
+        except BaseException:
+            cursor.__exit__(*sys.exc_info())
+            raise
+        else:
+            cursor.__exit__(None, None, None)
 
 
 def __assert_file_exists(path, isdir=False):
@@ -162,22 +182,9 @@ def _execute_sql(
     fetchone=False,
     fetchall=False,
     notransaction=False,
-    no_try=False,
     params=None,
     return_columns=False,
 ):
-    @retry(wait_random_min=500, wait_random_max=800, stop_max_delay=30000)
-    def try_connect(connection):
-        try:
-            if hasattr(connection, "clone"):
-                connection = connection.clone(dbname="postgres")
-            _execute_sql(connection, "SELECT * FROM pg_catalog.pg_tables;", no_try=True)
-        except Exception as e:
-            click.secho(str(e), fg="red")
-
-    if not no_try:
-        try_connect(connection)
-
     def _call_cr(cr):
         cr.execute(sql, params)
         if fetchone:
@@ -186,22 +193,12 @@ def _execute_sql(
             return cr.fetchall()
 
     if isinstance(connection, DBConnection):
-        conn = connection.get_psyco_connection()
-        conn.autocommit = notransaction
-        cr = conn.cursor()
-        try:
+        with connection.cursor(autocommit=notransaction) as cr:
             res = _call_cr(cr)
-            conn.commit()
             if return_columns:
                 return [x.name for x in cr.description], res
             else:
                 return res
-        except Exception:
-            conn.rollback()
-            raise
-        finally:
-            cr.close()
-            conn.close()
     else:
         return _call_cr(connection)
 
@@ -232,76 +229,47 @@ def _exists_table(conn, table_name):
 
 
 def _wait_postgres(config, timeout=600):
+    from .wait import postgres as postgres_wait
+
     started = arrow.get()
     if config.run_postgres:
         conn = config.get_odoo_conn().clone(dbname="postgres")
-        container_ids = (
-            subprocess.check_output(
-                [
-                    "docker",
-                    "ps",
-                    "-a",
-                    "-q",
-                    "--no-trunc",
-                    "--filter",
-                    f"name=^/{config.PROJECT_NAME}_postgres$",
-                ],
-                encoding="utf8",
-            )
-            .strip()
-            .splitlines()
-        )
-
-        import docker
+        try:
+            import docker
 
-        client = docker.from_env()
-        postgres_containers = []
-        for container_id in container_ids:
-            if not container_id:
-                continue
-            container = client.containers.get(container_id)
-            if not container:
-                continue
-            if not container.attrs["State"]["Running"]:
-                continue
-            postgres_containers += [container]
+            postgres_containers = docker.from_env().containers.list(
+                filters={"name": f"^/{config.PROJECT_NAME}_postgres$"}
+            )
+        except Exception:
+            postgres_containers = []
 
-        deadline = arrow.get().shift(seconds=timeout)
         last_ex = None
-        while True:
-            if arrow.get() > deadline:
-                # if running containers wait for health state:
-                if not postgres_containers:
-                    abort(
-                        (
-                            "No running postgres container found. "
-                            "Perhaps you have to start it with "
-                            "'odoo up -d postgres' first?"
-                        )
-                    )
 
-                raise Exception(f"Timeout waiting postgres reached: {timeout}seconds")
-            try:
-                _execute_sql(
-                    conn,
-                    sql="""
-                SELECT table_schema,table_name
-                FROM information_schema.tables
-                ORDER BY table_schema,table_name
-                LIMIT 1;
-                """,
+        def on_error(ex):
+            nonlocal last_ex
+            seconds = (arrow.get() - started).total_seconds()
+            if seconds > 5:
+                if str(ex) != str(last_ex):
+                    click.secho(f"Waiting again for postgres. Last error is: {str(ex)}")
+                last_ex = ex
+
+        if not postgres_wait.ready(
+            conn,
+            container=postgres_containers[0] if postgres_containers else None,
+            timeout=timeout,
+            on_error=on_error,
+        ):
+            # if running containers wait for health state:
+            if not postgres_containers:
+                abort(
+                    (
+                        "No running postgres container found. "
+                        "Perhaps you have to start it with "
+                        "'odoo up -d postgres' first?"
+                    )
                 )
-                break
-
-            except Exception as ex:
-                seconds = (arrow.get() - started).total_seconds()
-                if seconds > 5:
-                    if str(ex) != str(last_ex):
-                        click.secho(
-                            f"Waiting again for postgres. Last error is: {str(ex)}"
-                        )
-                    last_ex = ex
-                time.sleep(1)
+
+            raise Exception(f"Timeout waiting postgres reached: {timeout}seconds")
         click.secho("Postgres now available.", fg="green")
 
 
@@ -344,7 +312,10 @@ def _makedirs(path):
 
 
 def _remove_postgres_connections(connection, sql_afterwards=""):
+    from .odoo_config import get_connection_pool
+
     click.echo(f"Removing all current connections from {connection.dbname}")
+    get_connection_pool().discard(connection.dbname)
     if os.getenv("POSTGRES_DONT_DROP_ACTIVITIES", "") != "1":
         if _exists_db(connection):
             SQL = """
@@ -382,6 +353,44 @@ def __rename_db_drop_target(conn, from_db, to_db):
     _remove_postgres_connections(conn.clone(dbname=to_db))
 
 
+def _copy_db(conn, from_db, to_db):
+    """
+    createdb -T: copies the files of the database, much faster than a
+    dump and restore; there must not be connections to from_db.
+    """
+    if to_db in ("postgres", "template1", from_db):
+        raise Exception("Invalid: {}".format(to_db))
+    _remove_postgres_connections(conn.clone(dbname=from_db))
+    _remove_postgres_connections(conn.clone(dbname=to_db))
+    _execute_sql(
+        conn.clone(dbname="postgres"),
+        f'drop database if exists "{to_db}"',
+        notransaction=True,
+    )
+    _execute_sql(
+        conn.clone(dbname="postgres"),
+        f'create database "{to_db}" template "{from_db}"',
+        notransaction=True,
+    )
+
+
+def _copy_filestore(filestores, from_db, to_db):
+    """
+    Replaces the filestore of to_db with a copy of the one of from_db.
+    """
+    dest = filestores / to_db
+    _remove_filestore(filestores, to_db)
+    if (filestores / from_db).exists():
+        shutil.copytree(filestores / from_db, dest, symlinks=True)
+    else:
+        dest.mkdir(parents=True)
+
+
+def _remove_filestore(filestores, db):
+    if (filestores / db).exists():
+        shutil.rmtree(filestores / db)
+
+
 def _merge_env_dict(env):
     res = {}
     for k, v in os.environ.items():
@@ -416,6 +425,13 @@ def __dc_out(config, cmd, env={}):
     return subprocess.check_output(c, env=_merge_env_dict(env))
 
 
+def __dc_popen(config, cmd, env={}, **kwargs):
+    ensure_project_name(config)
+    c = __get_cmd(config) + cmd
+    env = _set_default_envs(env)
+    return subprocess.Popen(c, env=_merge_env_dict(env), **kwargs)
+
+
 def __dcexec(config, cmd, interactive=True, env=None):
     ensure_project_name(config)
     env = _set_default_envs(env)
@@ -1021,9 +1037,12 @@ def exec_file_in_path(filename):
 
 
 def measure_time(method):
+    from .startup_profile import profile
+
     def wrapper(*args, **kwargs):
         started = datetime.now()
-        result = method(*args, **kwargs)
+        with profile.phase(method.__qualname__):
+            result = method(*args, **kwargs)
         ended = datetime.now()
         duration = (ended - started).total_seconds()
         if os.getenv("WODOO_VERBOSE", "") == "1":
@@ -1123,18 +1142,129 @@ def get_hash(text):
     return hashlib.sha1(text).hexdigest()
 
 
+class DirectoryHasher(object):
+    """
+    Computes the same root hash as 'dtreetrawl -N --hash -R <path>': md5 over
+    the sorted md5 digests of all regular files below path; symlinks inside
+    the tree are not followed and names are not part of the hash.
+
+    Digests of files are kept in a persistent cache keyed by
+    (path, size, mtime_ns, inode), so unchanged files are never read again.
+    Files which changed are hashed in parallel by a thread pool.
+    """
+
+    VERSION = 1
+    KEEP_DAYS = 30
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, cache_file=None, workers=None):
+        self.cache_file = cache_file or Path(
+            os.path.expanduser("~/.local/cache/wodoo/filehashes.bin")
+        )
+        self.workers = workers or min(32, (os.cpu_count() or 1) + 4)
+        self._digests = None
+        self._dirty = False
+
+    @property
+    def digests(self):
+        if self._digests is None:
+            self._digests = {}
+            if self.cache_file.exists():
+                try:
+                    data = pickle.loads(self.cache_file.read_bytes())
+                except Exception:
+                    data = {}
+                if data.get("version") == self.VERSION:
+                    self._digests = data["digests"]
+        return self._digests
+
+    def save(self):
+        if not self._dirty:
+            return
+        today = int(time.time() // 86400)
+        digests = {
+            k: v for k, v in self.digests.items() if today - v[4] <= self.KEEP_DAYS
+        }
+        data = {"version": self.VERSION, "digests": digests}
+        self.cache_file.parent.mkdir(exist_ok=True, parents=True)
+        # several odoo processes may hash at the same time
+        tmpfile = self.cache_file.parent / f"{self.cache_file.name}.{os.getpid()}"
+        tmpfile.write_bytes(pickle.dumps(data))
+        os.replace(tmpfile, self.cache_file)
+        self._dirty = False
+
+    def _walk(self, path):
+        """
+        Yields (path, stat) of all regular files below path.
+        """
+        st = os.stat(path)
+        if stat.S_ISREG(st.st_mode):
+            yield path, st
+            return
+        todo = [path]
+        while todo:
+            with os.scandir(todo.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        todo.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry.path, entry.stat(follow_symlinks=False)
+
+    def _hash_file(self, path):
+        md5 = hashlib.md5()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(self.CHUNK_SIZE), b""):
+                md5.update(chunk)
+        return md5.hexdigest()
+
+    def hash(self, path):
+        from concurrent.futures import ThreadPoolExecutor
+
+        path = os.path.realpath(path)
+        digests = self.digests
+        today = int(time.time() // 86400)
+        result, todo = [], []
+        for filepath, st in self._walk(path):
+            key = (st.st_size, st.st_mtime_ns, st.st_ino)
+            cached = digests.get(filepath)
+            if cached and cached[:3] == key:
+                result.append(cached[3])
+                if cached[4] != today:
+                    digests[filepath] = key + (cached[3], today)
+                    self._dirty = True
+            else:
+                todo.append((filepath, key))
+
+        if todo:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                hashes = executor.map(self._hash_file, [x[0] for x in todo])
+                for (filepath, key), digest in zip(todo, hashes):
+                    digests[filepath] = key + (digest, today)
+                    result.append(digest)
+            self._dirty = True
+
+        root = hashlib.md5()
+        for digest in sorted(result):
+            root.update(digest.encode("ascii"))
+        return root.hexdigest()
+
+
+_directory_hasher = None
+
+
+def get_directory_hasher():
+    global _directory_hasher
+    if _directory_hasher is None:
+        import atexit
+
+        _directory_hasher = DirectoryHasher()
+        atexit.register(_directory_hasher.save)
+    return _directory_hasher
+
+
 def get_directory_hash(path):
     click.secho(f"Calculating hash for {path}", fg="yellow")
-    # "-N required because absolute path is used"
-    hex = (
-        subprocess.check_output(
-            ["dtreetrawl", "-N", "--hash", "-R", path], encoding="utf8"
-        )
-        .strip()
-        .split(" ")[0]
-        .strip()
-    )
-    return hex
+    return get_directory_hasher().hash(path)
 
 
 def git_diff_files(path, commit1, commit2):
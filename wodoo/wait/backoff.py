@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+
+import time
+
+
+class Backoff(object):
+    """
+    Delays between two checks: short at first, doubled up to maximum.
+    """
+
+    def __init__(self, initial=0.05, maximum=1.0, factor=2):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.delay = initial
+
+    def next(self, deadline=None):
+        delay = self.delay
+        self.delay = min(self.delay * self.factor, self.maximum)
+        if deadline:
+            delay = max(min(delay, deadline - time.time()), 0)
+        return delay
+
+    def reset(self):
+        self.delay = self.initial
+
+    def sleep(self, deadline=None):
+        time.sleep(self.next(deadline))
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
@@ -2,6 +2,8 @@
 
 import time
 
+from .backoff import Backoff
+
 
 def timeout(func):
     def _timeout(*args, **kwargs):
@@ -11,12 +13,14 @@ def timeout(func):
             TIMEOUT = kwargs['timeout']
 
         start = time.time()
+        deadline = start + TIMEOUT if TIMEOUT else None
+        backoff = Backoff()
 
         while True:
             if func(*args, **kwargs):
                 return True
 
-            time.sleep(1)
+            backoff.sleep(deadline)
 
             if TIMEOUT:
                 if time.time() - start > TIMEOUT:
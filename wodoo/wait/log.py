@@ -6,6 +6,7 @@ import re
 import time
 
 from . import decorator
+from .backoff import Backoff
 
 
 def size(path):
@@ -22,6 +23,7 @@ def tail(path, seek=None):
             seek = size(path)
 
         f.seek(seek)
+        backoff = Backoff()
 
         while True:
             where = f.tell()
@@ -30,10 +32,11 @@ def tail(path, seek=None):
             if not line:
                 # Reset position if line was empty
                 f.seek(where)
-                time.sleep(1)
+                backoff.sleep()
                 yield None
 
             else:
+                backoff.reset()
                 yield line
 
 
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+"""
+Waits until postgres accepts connections.
+
+The server is probed with exponential backoff; the health check of the
+container turning healthy or the ready line in its log wake the probe up
+at once.
+"""
+
+import socket
+import threading
+import time
+
+from .backoff import Backoff
+
+READY = b"database system is ready to accept connections"
+
+
+def probe(conn):
+    """
+    Raises, while the server does not accept connections.
+    """
+    if conn.host and not str(conn.host).startswith("/"):
+        # cheap check first; connect_timeout of libpq is much longer
+        socket.create_connection((conn.host, int(conn.port or 5432)), 3).close()
+    conn.get_psyco_connection(db="postgres").close()
+
+
+def _follow(stream, matches, wake):
+    try:
+        for item in stream:
+            if matches(item):
+                wake.set()
+    except Exception:
+        # closed at the end of waiting; the probes go on anyway
+        pass
+
+
+def watch_container(container, wake):
+    """
+    Sets wake on health status events and ready lines in the log of the
+    container; returns the streams to close afterwards.
+    """
+    import docker
+
+    since = int(time.time())
+    events = docker.from_env().events(
+        filters={"container": container.id, "event": "health_status"},
+        since=since,
+        decode=True,
+    )
+    logs = container.logs(stream=True, follow=True, since=since)
+    for stream, matches in [
+        (events, lambda event: event.get("status") == "health_status: healthy"),
+        (logs, lambda chunk: READY in chunk),
+    ]:
+        threading.Thread(
+            target=_follow, args=(stream, matches, wake), daemon=True
+        ).start()
+    return [events, logs]
+
+
+def ready(conn, container=None, timeout=600, on_error=None):
+    """
+    Returns True as soon as the server accepts connections, False after
+    timeout seconds; on_error is called with the error of every failed
+    probe.
+    """
+    deadline = time.time() + timeout
+    wake = threading.Event()
+    streams = []
+    if container:
+        try:
+            streams = watch_container(container, wake)
+        except Exception:
+            pass
+    # refused connections are cheap to probe
+    backoff = Backoff(maximum=0.25)
+    try:
+        while True:
+            try:
+                probe(conn)
+                return True
+            except Exception as ex:
+                if on_error:
+                    on_error(ex)
+            if time.time() >= deadline:
+                return False
+            if wake.wait(backoff.next(deadline)):
+                wake.clear()
+                backoff.reset()
+    finally:
+        for stream in streams:
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4